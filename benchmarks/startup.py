@@ -0,0 +1,123 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+"""Startup time of the tool: import time per module and time to first frame.
+
+    pixi run bench-startup                      # report only
+    pixi run bench-startup --record startup.jsonl   # also append the result
+
+Imports are measured with `python -X importtime -c "import waynon.main"`, the
+first frame by starting main.py with WAYNON_EXIT_AFTER_FIRST_FRAME set, which
+exits after printing "First frame after <s> s". Each measurement is repeated
+and the median is reported.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / "src" / "waynon" / "main.py"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+FIRST_FRAME_LINE = re.compile(r"First frame after ([0-9.]+) s")
+
+
+def measure_imports() -> tuple[float, dict[str, float], dict[str, float]]:
+    """Total import time of waynon.main, self time per top level package and
+    cumulative time per waynon module, all in seconds"""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import waynon.main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if res.returncode != 0:
+        print(res.stderr[-2000:])
+        raise RuntimeError("Importing waynon.main failed")
+    total = 0.0
+    packages = defaultdict(float)
+    modules = {}
+    for line in res.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+        if name.startswith("waynon"):
+            modules[name] = int(cumulative_us) / 1e6
+        if len(indent) == 1:
+            total += int(cumulative_us) / 1e6
+    return total, dict(packages), modules
+
+
+def measure_first_frame(timeout: float) -> tuple[float, float]:
+    """Time to first frame as reported by main.py and as seen from outside, which includes interpreter startup"""
+    env = dict(os.environ, WAYNON_EXIT_AFTER_FIRST_FRAME="1")
+    start = time.perf_counter()
+    res = subprocess.run(
+        [sys.executable, str(MAIN)], cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    wall = time.perf_counter() - start
+    match = FIRST_FRAME_LINE.search(res.stdout)
+    if match is None:
+        print(res.stdout[-2000:])
+        print(res.stderr[-2000:])
+        raise RuntimeError("main.py did not report a first frame")
+    return float(match.group(1)), wall
+
+
+def git_commit() -> str:
+    res = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return res.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of packages and modules to list")
+    parser.add_argument("--no-window", action="store_true", help="only measure imports")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--record", type=Path, help="append the result as a json line")
+    args = parser.parse_args()
+
+    runs = [measure_imports() for _ in range(args.repeat)]
+    import_total = statistics.median(r[0] for r in runs)
+    packages = {name: statistics.median(r[1].get(name, 0.0) for r in runs) for name in runs[0][1]}
+    modules = {name: statistics.median(r[2].get(name, 0.0) for r in runs) for name in runs[0][2]}
+
+    print(f"Import of waynon.main: {import_total:.3f} s (median of {args.repeat})")
+    print("\nSelf time per package:")
+    for name, t in sorted(packages.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"  {t:8.3f} s  {name}")
+    print("\nCumulative time per waynon module:")
+    for name, t in sorted(modules.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"  {t:8.3f} s  {name}")
+
+    result = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "import_s": round(import_total, 4),
+        "packages_s": {name: round(t, 4) for name, t in packages.items() if t >= 0.005},
+    }
+    if not args.no_window:
+        frames = [measure_first_frame(args.timeout) for _ in range(args.repeat)]
+        first_frame = statistics.median(f[0] for f in frames)
+        wall = statistics.median(f[1] for f in frames)
+        print(f"\nFirst frame: {first_frame:.3f} s after main.py started, {wall:.3f} s after launch")
+        result["first_frame_s"] = round(first_frame, 4)
+        result["first_frame_wall_s"] = round(wall, 4)
+
+    if args.record is not None:
+        with open(args.record, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        print(f"Recorded in {args.record}")
+
+
+if __name__ == "__main__":
+    main()
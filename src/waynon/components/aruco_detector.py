@@ -1,14 +1,12 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
-import cv2.aruco as aruco
-
 from imgui_bundle import imgui
 
 from waynon.components.simple import Detector
 from waynon.detectors.measurement_processor import MeasurementProcessor
 
 class ArucoDetector(Detector):
-    marker_dict: int = aruco.DICT_4X4_50
+    marker_dict: int = 0  # cv2.aruco.DICT_4X4_50
 
     def get_processor(self) -> MeasurementProcessor:
         from waynon.detectors.aruco_processor import ARUCO_PROCESSOR
@@ -1,6 +1,5 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
-import cv2.aruco as aruco
 import numpy as np
 from imgui_bundle import imgui
 
@@ -36,41 +35,19 @@ aruco_dict_names = [
     "ARUCO_MIP_36h12",
     "ARUCO_MIP_36H12",
 ]
-aruco_dict_values = [
-    aruco.DICT_4X4_50,
-    aruco.DICT_4X4_100,
-    aruco.DICT_4X4_250,
-    aruco.DICT_4X4_1000,
-    aruco.DICT_5X5_50,
-    aruco.DICT_5X5_100,
-    aruco.DICT_5X5_250,
-    aruco.DICT_5X5_1000,
-    aruco.DICT_6X6_50,
-    aruco.DICT_6X6_100,
-    aruco.DICT_6X6_250,
-    aruco.DICT_6X6_1000,
-    aruco.DICT_7X7_50,
-    aruco.DICT_7X7_100,
-    aruco.DICT_7X7_250,
-    aruco.DICT_7X7_1000,
-    aruco.DICT_ARUCO_ORIGINAL,
-    aruco.DICT_APRILTAG_16h5,
-    aruco.DICT_APRILTAG_16H5,
-    aruco.DICT_APRILTAG_25h9,
-    aruco.DICT_APRILTAG_25H9,
-    aruco.DICT_APRILTAG_36h10,
-    aruco.DICT_APRILTAG_36H10,
-    aruco.DICT_APRILTAG_36h11,
-    aruco.DICT_APRILTAG_36H11,
-    aruco.DICT_ARUCO_MIP_36h12,
-    aruco.DICT_ARUCO_MIP_36H12,
-]
+
+
+def get_aruco_dict_values() -> list[int]:
+    """cv2.aruco ids of `aruco_dict_names`, cv2 is only imported when needed"""
+    import cv2.aruco as aruco
+
+    return [getattr(aruco, f"DICT_{name}") for name in aruco_dict_names]
 
 
 class ArucoMarker(Component):
     id: int = 1
     marker_length: float = 0.07
-    marker_dict: int = aruco.DICT_4X4_50
+    marker_dict: int = 0  # cv2.aruco.DICT_4X4_50
 
     def get_texture(self):
         return ARUCO_TEXTURES.get_texture(self.id, self.marker_dict)
@@ -88,6 +65,7 @@ class ArucoMarker(Component):
         self.id = min(max(0, self.id), 100)
         _, self.marker_length = imgui.input_float("Marker Length", self.marker_length)
 
+        aruco_dict_values = get_aruco_dict_values()
         current_item = aruco_dict_values.index(self.marker_dict)
         if imgui.begin_combo("Dict", aruco_dict_names[current_item]):
             for i, (name, value) in enumerate(zip(aruco_dict_names, aruco_dict_values)):
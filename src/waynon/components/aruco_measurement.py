@@ -1,57 +1,160 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
-import cv2.aruco as aruco
+import numpy as np
 
-import esper
-
-from imgui_bundle import imgui
-
-from waynon.components.component import Component, ValidityResult
+from waynon.components.component import ValidityResult
 from waynon.components.camera import PinholeCamera
 from waynon.components.tree_utils import try_component
 from waynon.components.aruco_marker import ArucoMarker
+from waynon.components.journal import JOURNAL
+
+
+class ArucoDetectionTable:
+    """Columnar storage for every ArUco detection.
+
+    One row per detection: the detector, camera and marker entity ids, the
+    marker id and dictionary, and the four corners in `pixels` (N, 4, 2).
+    This is the only copy of a detection. The `ImageMeasurement` a detection
+    was found in owns its rows, `ArucoDetection` is a view of one of them and
+    the solver reads the columns directly.
+    """
+
+    COLUMNS = ("detector_entity_id", "camera_entity_id", "marker_entity_id", "marker_id", "marker_dict")
+
+    def __init__(self, capacity: int = 1024):
+        self.detector_entity_id = np.full(capacity, -1, dtype=np.int64)
+        self.camera_entity_id = np.full(capacity, -1, dtype=np.int64)
+        self.marker_entity_id = np.full(capacity, -1, dtype=np.int64)
+        self.marker_id = np.full(capacity, -1, dtype=np.int64)
+        self.marker_dict = np.full(capacity, -1, dtype=np.int64)
+        self.pixels = np.zeros((capacity, 4, 2), dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.version = 0  # bumped whenever rows are allocated or released
+        self._free: list[int] = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size - len(self._free)
+
+    def _grow(self):
+        n = len(self.alive)
+        for column in self.COLUMNS:
+            setattr(self, column, np.concatenate([getattr(self, column), np.full(n, -1, dtype=np.int64)]))
+        self.pixels = np.concatenate([self.pixels, np.zeros((n, 4, 2), dtype=np.float64)])
+        self.alive = np.concatenate([self.alive, np.zeros(n, dtype=bool)])
+
+    def allocate(
+        self,
+        detector_entity_id: int,
+        camera_entity_id: int,
+        marker_entity_id: int,
+        marker_id: int,
+        marker_dict: int,
+        pixels,
+    ) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._size == len(self.alive):
+                self._grow()
+            row = self._size
+            self._size += 1
+        self.detector_entity_id[row] = detector_entity_id
+        self.camera_entity_id[row] = camera_entity_id
+        self.marker_entity_id[row] = marker_entity_id
+        self.marker_id[row] = marker_id
+        self.marker_dict[row] = marker_dict
+        self.pixels[row] = np.asarray(pixels, dtype=np.float64).reshape(4, 2)
+        self.alive[row] = True
+        self.version += 1
+        return row
+
+    def allocate_dict(self, detection: dict) -> int:
+        return self.allocate(**{key: detection[key] for key in (*self.COLUMNS, "pixels")})
+
+    def release(self, row: int):
+        if row < 0 or not self.alive[row]:
+            return
+        self.alive[row] = False
+        self._free.append(row)
+        self.version += 1
+
+    def clear(self):
+        self.alive[:] = False
+        self._free = []
+        self._size = 0
+        self.version += 1
+
+    def rows(self) -> np.ndarray:
+        """Indices of the live rows"""
+        return np.flatnonzero(self.alive[: self._size])
+
+    def row_dict(self, row: int) -> dict:
+        res = {column: int(getattr(self, column)[row]) for column in self.COLUMNS}
+        res["pixels"] = self.pixels[row].tolist()
+        return res
+
+
+ARUCO_TABLE = ArucoDetectionTable()
+
 
+class ArucoDetection:
+    """A view of one row of `ARUCO_TABLE`, owned by the image measurement `owner_id`.
 
-class ArucoMeasurement(Component):
-    detector_entity_id: int
-    camera_entity_id: int
-    marker_entity_id: int
+    Views are made on demand and hold no data, they are not entities.
+    """
 
-    marker_id: int
-    marker_dict: int
-    pixels: list[list[float]]
+    __slots__ = ("owner_id", "row")
+
+    def __init__(self, owner_id: int, row: int):
+        self.owner_id = owner_id
+        self.row = row
+
+    @property
+    def detector_entity_id(self) -> int:
+        return int(ARUCO_TABLE.detector_entity_id[self.row])
+
+    @property
+    def camera_entity_id(self) -> int:
+        return int(ARUCO_TABLE.camera_entity_id[self.row])
+
+    @property
+    def marker_entity_id(self) -> int:
+        return int(ARUCO_TABLE.marker_entity_id[self.row])
+
+    @property
+    def marker_id(self) -> int:
+        return int(ARUCO_TABLE.marker_id[self.row])
+
+    @property
+    def marker_dict(self) -> int:
+        return int(ARUCO_TABLE.marker_dict[self.row])
+
+    @property
+    def pixels(self) -> np.ndarray:
+        """The (4, 2) corners, a view into the table. Edit them with `set_corner`."""
+        return ARUCO_TABLE.pixels[self.row]
+
+    def set_corner(self, corner: int, pixel):
+        ARUCO_TABLE.pixels[self.row, corner] = pixel
+        JOURNAL.mark(self.owner_id)
 
     def get_camera(self):
         return try_component(self.camera_entity_id, PinholeCamera)
-    
+
     def get_marker(self):
         return try_component(self.marker_entity_id, ArucoMarker)
-    
+
     def valid(self):
         if self.get_camera() is None:
             return ValidityResult.invalid("Camera not found")
         if self.get_marker() is None:
             return ValidityResult.invalid("Marker not found")
-        
+
         marker = self.get_marker()
         if marker.id != self.marker_id:
             return ValidityResult.invalid("Marker ID does not match")
         if marker.marker_dict != self.marker_dict:
             return ValidityResult.invalid("Marker Dict does not match")
-        
-        return ValidityResult.valid()
-
-    def draw_property(self, nursery, entity_id):
-        imgui.separator()
-        imgui.text(f"Marker ID: {self.marker_id}")
-        imgui.text(f"Dict: {self.marker_dict}")
-        for i, pixel in enumerate(self.pixels):
-            imgui.text(f"Corner {i}: {pixel}")
-
-
-    def _fix_on_load(self, new_to_old_entity_ids):
-        self.detector_entity_id = new_to_old_entity_ids.get(self.detector_entity_id, -1)
-        self.camera_entity_id = new_to_old_entity_ids.get(self.camera_entity_id, -1)
-        self.marker_entity_id = new_to_old_entity_ids.get(self.marker_entity_id, -1)
-
 
+        return ValidityResult.valid()
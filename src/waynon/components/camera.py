@@ -1,5 +1,7 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
+from typing import Callable
+
 import esper
 import marsoom
 import marsoom.texture
@@ -11,7 +13,6 @@ from waynon.components.aruco_detector import ArucoDetector
 from waynon.components.aruco_marker import ArucoMarker
 from waynon.components.simple import Component
 from waynon.components.transform import Transform
-from waynon.detectors.aruco_processor import detect_all_markers_in_image
 from waynon.processors.realsense_manager import RealsenseManager
 
 
@@ -33,18 +34,65 @@ class PinholeCamera(Component):
             dtype=np.float32,
         )
 
-    def get_texture(self):
+    def get_texture(self, create: bool = True):
+        """Get the texture without uploading the latest image. Use `sync_texture` when drawing it.
+
+        The texture is allocated on first use, with `create=False` None is
+        returned until then."""
+        if self._texture is None and create:
+            self._texture = marsoom.texture.Texture(1280, 720, fmt=gl.GL_BGR)
         return self._texture
 
+    def sync_texture(self):
+        """Upload the latest image if it changed since the last upload. Only
+        called by views that actually draw the texture, so cameras nobody is
+        looking at never pay for the copy to the GPU."""
+        texture = self.get_texture()
+        if self._texture_dirty and self._image_u is not None and self._image_current():
+            texture.copy_from_host(self._image_u)
+            self._texture_dirty = False
+        return texture
+
+    def _image_current(self) -> bool:
+        # False once the recycled buffer holding the image was overwritten by a newer frame
+        return self._generation is None or self._generation() == self._identifier
+
+    def has_image(self) -> bool:
+        return self._image_u is not None
 
     def get_image_u(self):
-        """Get the image as uint8 between 0 and 255"""
-        return self._image_u
+        """Get a copy of the image as uint8 between 0 and 255, None if there is
+        no image or the frame it came from was already recycled"""
+        if self._image_u is None or not self._image_current():
+            return None
+        image = self._image_u.copy()
+        if not self._image_current():
+            return None  # overwritten while copying
+        return image
+
+    @staticmethod
+    def frame_key(entity_id: int) -> str | None:
+        """Key of the frame ingest slot that feeds this camera, if any"""
+        from waynon.components.realsense_camera import RealsenseCamera
+        from waynon.components.replay_camera import ReplayCamera
+        from waynon.components.synthetic_camera import SyntheticCamera
+        from waynon.processors.replay_manager import ReplayManager
+        from waynon.processors.synthetic_camera import SyntheticCameraProcessor
+
+        if esper.has_component(entity_id, RealsenseCamera):
+            return esper.component_for_entity(entity_id, RealsenseCamera).serial
+        if esper.has_component(entity_id, ReplayCamera):
+            return ReplayManager.key(entity_id)
+        if esper.has_component(entity_id, SyntheticCamera):
+            return SyntheticCameraProcessor.key(entity_id)
+        return None
 
     def guess_position(self, camera_entity_id: int, marker_entity_id: int, guess_camera: bool = True):
         import cv2
         from scipy.spatial.transform import Rotation as R
 
+        from waynon.detectors.aruco_processor import detect_all_markers_in_image
+
         # get all markers
         assert esper.entity_exists(marker_entity_id)
         assert esper.has_components(marker_entity_id, ArucoMarker, Transform)
@@ -54,12 +102,13 @@ class PinholeCamera(Component):
         marker = esper.component_for_entity(marker_entity_id, ArucoMarker)
         marker_transform = esper.component_for_entity(marker_entity_id, Transform)
         camera_transform = esper.component_for_entity(camera_entity_id, Transform)
-        if self._image_u is None:
+        image = self.get_image_u()
+        if image is None:
             print("No image to detect markers in")
             return
 
         marker_pixels, marker_ids = detect_all_markers_in_image(
-            self._image_u, marker.marker_dict
+            image, marker.marker_dict
         )
         if marker_ids is None:
             print("No markers found")
@@ -109,7 +158,13 @@ class PinholeCamera(Component):
             X_WM = X_WC @ X_CM
             marker_transform.set_X_WT(X_WM)
 
-    def update_image(self, image: np.ndarray, identifier: int = None):
+    def update_image(self, image: np.ndarray, identifier: int = None, generation: Callable[[], float] | None = None):
+        """Show `image`, kept by reference and only uploaded when a view draws it.
+
+        If `image` lives in a buffer the frame reader recycles, `generation`
+        returns the identifier of the frame the buffer holds now, so a frame
+        that has been overwritten since is never uploaded or handed out.
+        """
         assert image.dtype == np.uint8, f"Image must be uint8, got {image.dtype}"
         # if self._image_u == image:
         #     return
@@ -120,16 +175,16 @@ class PinholeCamera(Component):
             self._identifier = identifier
 
         self._image_u = image
-        # image_float = image / 255.0
-        # image_float = image_float.astype("float32")
-        # self._image_f = image_float
-        self._texture.copy_from_host(self._image_u)
+        self._generation = generation
+        self._texture_dirty = True
 
     def model_post_init(self, __context):
-        self._texture = marsoom.texture.Texture(1280, 720, fmt=gl.GL_BGR)
+        self._texture = None
         self._guessing_camera = False
         self._image_u = None
+        self._generation = None
         self._identifier = -1
+        self._texture_dirty = False
         return super().model_post_init(__context)
 
     def draw_property(self, nursery, e: int):
@@ -173,7 +228,12 @@ class DepthCamera(Component):
 
     def model_post_init(self, __context):
         self._depth_image = None
-        self._pc = marsoom.StructuredPointCloud(1280, 720)
+        self._pc = None
+
+    def get_pointcloud(self):
+        if self._pc is None:
+            self._pc = marsoom.StructuredPointCloud(1280, 720)
+        return self._pc
 
     # def draw_property(self, nursery, entity_id):
     #     imgui.separator_text("Depth Camera")
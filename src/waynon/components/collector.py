@@ -9,6 +9,7 @@ from imgui_bundle import imgui
 
 from .tree_utils import *
 from .component import Component
+from .journal import JOURNAL
 from .node import Node
 from .pose_group import PoseGroup
 from .camera import PinholeCamera
@@ -18,11 +19,40 @@ from .factor_graph import FactorGraph
 from waynon.utils.utils import COLORS, Cancellable
 
 class MeasurementGroup(Component):
+    def model_post_init(self, __context):
+        # (sidecar, start, end) while the measurements only exist in the saved scene
+        self._pending = None
+
+    def set_pending(self, sidecar, start: int, end: int):
+        self._pending = (sidecar, start, end)
+
+    def pending(self):
+        return self._pending
+
+    def is_pending(self) -> bool:
+        return self._pending is not None
+
+    def materialize(self, entity_id):
+        """Create the measurement entities that are still only in the sidecar"""
+        if self._pending is None:
+            return
+        sidecar, start, end = self._pending
+        self._pending = None
+        JOURNAL.unpack(entity_id)
+        sidecar.materialize(entity_id, start, end)
+
+    def on_delete(self, entity_id):
+        self._pending = None
+
     def draw_context(self, nursery, entity_id):
         imgui.separator()
         if imgui.menu_item_simple("Clear Data"):
+            if self._pending is not None:
+                self._pending = None
+                JOURNAL.unpack(entity_id)
             delete_children(entity_id)
         if imgui.menu_item_simple("Sort Data"):
+            self.materialize(entity_id)
             sort_children(entity_id)
 
 class DataNode(Component):
@@ -32,6 +62,7 @@ class DataNode(Component):
             delete_children(entity_id)
         if imgui.menu_item_simple("Sort Data"):
             for child_id in find_children_with_component(entity_id, MeasurementGroup):
+                esper.component_for_entity(child_id, MeasurementGroup).materialize(child_id)
                 sort_children(child_id)
 
 
@@ -45,6 +76,10 @@ class Solvers(Component):
 class CollectorData(Component):
     group_blacklist: list[int] = []
     camera_blacklist: list[int] = []    
+    flying: bool = False
+    max_joint_velocity: float = 0.5  # rad/s, tune per robot and camera exposure
+    min_sharpness: float = 50.0
+    frame_interval: float = 0.2
 
     def draw_context(self, nursery, entity_id):
         from waynon.components.scene_utils import create_aruco_detector, create_entity
@@ -100,7 +135,27 @@ class CollectorData(Component):
             imgui.pop_style_color()
             imgui.spacing()
 
-
+            _, collector_data.flying = imgui.checkbox("Continuous Motion", collector_data.flying)
+            imgui.set_item_tooltip("Move through the poses without stopping and capture on the way")
+            if collector_data.flying:
+                _, collector_data.max_joint_velocity = imgui.input_float(
+                    "Max Joint Velocity", collector_data.max_joint_velocity
+                )
+                imgui.set_item_tooltip(
+                    "Drop frames taken while any joint is faster than this (rad/s). "
+                    "Tune it per robot and camera exposure, the robot has to cruise below it."
+                )
+                _, collector_data.min_sharpness = imgui.input_float(
+                    "Min Sharpness", collector_data.min_sharpness
+                )
+                imgui.set_item_tooltip("Drop frames whose Laplacian variance is below this, 0 disables")
+                _, collector_data.frame_interval = imgui.input_float(
+                    "Frame Interval", collector_data.frame_interval
+                )
+                imgui.set_item_tooltip("Keep at most one frame per camera every this many seconds")
+                collector_data.max_joint_velocity = max(collector_data.max_joint_velocity, 0.0)
+                collector_data.min_sharpness = max(collector_data.min_sharpness, 0.0)
+                collector_data.frame_interval = max(collector_data.frame_interval, 0.0)
 
             imgui.spacing()
             imgui.text_wrapped("Select pose groups to use")
@@ -111,10 +166,11 @@ class CollectorData(Component):
                 enabled = group_id not in collector_data.group_blacklist
                 res, _ = imgui.checkbox(node.name, enabled)
                 if res:
+                    # reassigned, not edited in place, so the change is journaled
                     if enabled:
-                        collector_data.group_blacklist.append(group_id)
+                        collector_data.group_blacklist = [*collector_data.group_blacklist, group_id]
                     else:
-                        collector_data.group_blacklist.remove(group_id)
+                        collector_data.group_blacklist = [g for g in collector_data.group_blacklist if g != group_id]
                 imgui.pop_id()
             
             imgui.spacing()
@@ -126,9 +182,9 @@ class CollectorData(Component):
                 res, _ = imgui.checkbox(f"{node.name}", enabled)
                 if res:
                     if enabled:
-                        collector_data.camera_blacklist.append(entity)
+                        collector_data.camera_blacklist = [*collector_data.camera_blacklist, entity]
                     else:
-                        collector_data.camera_blacklist.remove(entity)
+                        collector_data.camera_blacklist = [c for c in collector_data.camera_blacklist if c != entity]
                 imgui.pop_id()
 
 
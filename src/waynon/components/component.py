@@ -5,6 +5,8 @@ from dataclasses import dataclass
 from pydantic import BaseModel
 import trio
 
+from waynon.components.journal import JOURNAL
+
 @dataclass
 class ValidityResult:
     _valid: bool = True
@@ -28,6 +30,13 @@ class ValidityResult:
         return f"ValidityResult({self._valid}, {self._message})"
 
 class Component(BaseModel):
+    def __setattr__(self, name, value):
+        # Field edits of a component on an entity are journaled, wherever they are made
+        entity_id = self.__dict__.get("_journal_id")
+        if entity_id is not None and name in type(self).model_fields and _changed(self.__dict__.get(name), value):
+            JOURNAL.mark(entity_id)
+        super().__setattr__(name, value)
+
     def property_order(self):
         return 10000
 
@@ -55,3 +64,19 @@ class Component(BaseModel):
     def on_load(self, entity_id: int):
         """This is called when the component is initialized. Can be used to make sure everything is in order."""
         pass
+
+    def on_attach(self, entity_id: int):
+        """This is called when the component is added to an entity. Storage owned by the component is allocated here,
+        so temporary copies made during validation never hold any. Overrides must call super()."""
+        self._journal_id = entity_id
+
+    def on_delete(self, entity_id: int):
+        """This is called when the entity is deleted from the tree. Can be used to free storage owned by the component."""
+        pass
+
+
+def _changed(old, value) -> bool:
+    try:
+        return bool(old != value)
+    except ValueError:  # arrays compare element-wise
+        return True
@@ -1,27 +1,92 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
+from pathlib import Path
+from typing import Optional
+
 import esper
 import numpy as np
 import trio
 from imgui_bundle import imgui
 from PIL import Image
+from pydantic import field_serializer
 
+from .aruco_measurement import ARUCO_TABLE, ArucoDetection
 from .camera import PinholeCamera
+from .journal import JOURNAL
 from .component import Component
 from .measurement import Measurement
 from .node import Node
 from .pose_group import PoseGroup
 from .tree_utils import *
+from waynon.utils.image_store import IMAGE_STORE
 
 
 class ImageMeasurement(Component):
     camera_id: int
     image_path: str
+    image_hash: Optional[str] = None  # key in the image store
+    capture_timestamp: Optional[float] = None
+    sync_skew: Optional[float] = None
+    # ArUco detections in the image, only used to (de)serialize. While the
+    # measurement is attached to an entity they are rows of ARUCO_TABLE.
+    aruco_detections: list[dict] = []
 
-    def get_image_u(self):
+    def model_post_init(self, __context):
+        self._entity_id = None
+        self._aruco_rows: list[int] = []
+        return super().model_post_init(__context)
+
+    @field_serializer("aruco_detections")
+    def serialize_aruco_detections(self, aruco_detections: list[dict]):
+        if self._entity_id is None:
+            return aruco_detections
+        return [ARUCO_TABLE.row_dict(row) for row in self._aruco_rows]
+
+    def on_attach(self, entity_id):
+        super().on_attach(entity_id)
+        if self._entity_id is not None:
+            return
+        self._entity_id = entity_id
+        self._aruco_rows = [ARUCO_TABLE.allocate_dict(d) for d in self.aruco_detections]
+        self.aruco_detections = []
+
+    def on_delete(self, entity_id):
+        self.aruco_detections = self.serialize_aruco_detections(self.aruco_detections)
+        for row in self._aruco_rows:
+            ARUCO_TABLE.release(row)
+        self._aruco_rows = []
+        self._entity_id = None
+
+    def aruco_rows(self) -> np.ndarray:
+        """Rows of ARUCO_TABLE holding the detections of this image"""
+        return np.asarray(self._aruco_rows, dtype=np.int64)
+
+    def get_aruco_detections(self) -> list[ArucoDetection]:
+        return [ArucoDetection(self._entity_id, row) for row in self._aruco_rows]
+
+    def set_aruco_detections(self, detections: list[dict]):
+        """Replace the detections, each a dict with the columns of ARUCO_TABLE and `pixels`"""
+        if self._entity_id is None:
+            self.aruco_detections = list(detections)
+            return
+        for row in self._aruco_rows:
+            ARUCO_TABLE.release(row)
+        self._aruco_rows = [ARUCO_TABLE.allocate_dict(d) for d in detections]
+        JOURNAL.mark(self._entity_id)
+
+    def remove_aruco_detection(self, index: int):
+        ARUCO_TABLE.release(self._aruco_rows.pop(index))
+        JOURNAL.mark(self._entity_id)
+
+    def get_image_file(self) -> Path:
         from .scene_utils import DATA_PATH
-        image_path = DATA_PATH / self.image_path
-        return np.array(Image.open(image_path))
+        if self.image_hash and IMAGE_STORE.has(self.image_hash):
+            return IMAGE_STORE.path(self.image_hash)
+        # scenes saved before the image store keep their images in the data folder
+        return DATA_PATH / self.image_path
+
+    def get_image_u(self):
+        return np.array(Image.open(self.get_image_file()))
 
     def property_order(self):
         return 100
@@ -39,6 +104,23 @@ class ImageMeasurement(Component):
             imgui.text(f"Camera: {node.name}")
 
         imgui.text(f"Image Path: {self.image_path}")
+        if self.image_hash:
+            imgui.text(f"Image Hash: {self.image_hash[:12]}")
+        if self.capture_timestamp is not None:
+            imgui.text(f"Captured: {self.capture_timestamp:.4f}")
+        if self.sync_skew is not None:
+            imgui.text(f"Camera Skew: {self.sync_skew * 1000.0:.1f} ms")
+
+        detections = self.get_aruco_detections()
+        if detections:
+            imgui.separator_text("Aruco Detections")
+        for i, detection in enumerate(detections):
+            imgui.text(f"Marker {detection.marker_id} (dict {detection.marker_dict})")
+            imgui.same_line()
+            if imgui.small_button(f"Delete##aruco_{i}"):
+                # one per frame, the indices shift
+                self.remove_aruco_detection(i)
+                break
 
     @staticmethod
     def default_name():
@@ -46,3 +128,7 @@ class ImageMeasurement(Component):
 
     def _fix_on_load(self, new_to_old_entity_ids):
         self.camera_id = new_to_old_entity_ids.get(self.camera_id, self.camera_id)
+        rows = self.aruco_rows()
+        for column in ("detector_entity_id", "camera_entity_id", "marker_entity_id"):
+            ids = getattr(ARUCO_TABLE, column)
+            ids[rows] = [new_to_old_entity_ids.get(int(i), -1) for i in ids[rows]]
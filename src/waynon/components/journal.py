@@ -0,0 +1,207 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import esper
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+class SceneJournal:
+    """Append-only log of the entities changed since the scene was last saved.
+
+    Every line of `journal.jsonl` is one record:
+        {"op": "put", "id": 12, "components": {...}}   the entity as save_scene writes it
+        {"op": "del", "id": 12}                          the entity was deleted
+        {"op": "unpack", "id": 7}                        the measurement group left the sidecar
+        {"op": "order", "id": 3, "children": [5, 4]}     the children of 3 were reordered
+    Changes are marked as they happen and written by `flush`, which only
+    serializes the marked entities. `compact` writes the full scene and
+    empties the journal; `replay` applies it on top of the manifest on load.
+    Entity ids are the ids of the manifest, load_scene keeps them stable.
+    """
+
+    def __init__(self, compact_records: int = 5000, compact_interval: float = 600.0):
+        self.path: Optional[Path] = None
+        self.compact_records = compact_records
+        self.compact_interval = compact_interval
+        self.num_records = 0
+        self._dirty: dict[int, None] = {}
+        self._unpacked: dict[int, None] = {}
+        self._reordered: dict[int, None] = {}
+        self._queue: list[list[str]] = []
+        self._lock = threading.Lock()
+        self._last_compaction = time.monotonic()
+
+    def open(self, scene_path: Path, num_records: int = 0):
+        """Journal changes of the scene saved at `scene_path`, the journal itself
+        is kept. `num_records` is the number of records it already holds, as
+        returned by `replay`."""
+        from .transform import TRANSFORM_STORE
+
+        self.path = Path(scene_path) / JOURNAL_NAME
+        self._dirty.clear()
+        self._unpacked.clear()
+        self._reordered.clear()
+        TRANSFORM_STORE.take_changed()  # the saved scene has them already
+        self._last_compaction = time.monotonic()
+        self.num_records = num_records if self.path.exists() else 0
+
+    def close(self):
+        self.path = None
+        self._dirty.clear()
+        self._unpacked.clear()
+        self._reordered.clear()
+
+    def mark(self, entity_id: int):
+        if self.path is not None:
+            self._dirty[entity_id] = None
+
+    def unpack(self, group_id: int):
+        """The measurements of the group are entities now, the sidecar rows are stale"""
+        if self.path is not None:
+            self._unpacked[group_id] = None
+
+    def reorder(self, parent_id: int):
+        """The children of `parent_id` changed their order"""
+        if self.path is not None:
+            self._reordered[parent_id] = None
+
+    def has_changes(self) -> bool:
+        from .transform import TRANSFORM_STORE
+
+        return bool(self._dirty or self._unpacked or self._reordered or TRANSFORM_STORE.changed)
+
+    def _mark_changed_transforms(self):
+        # Transforms are edited from many places (solver, gizmo, guesses), the store records them all
+        from .transform import TRANSFORM_STORE, Transform
+
+        slots = TRANSFORM_STORE.take_changed()
+        if not slots or self.path is None:
+            return
+        for entity_id, transform in esper.get_component(Transform):
+            if transform._slot in slots:
+                self._dirty[entity_id] = None
+
+    def _collect(self):
+        # Serialize on the calling thread, the components are not thread-safe
+        from .node import Node
+
+        self._mark_changed_transforms()
+        lines = [json.dumps({"op": "unpack", "id": group_id}) for group_id in self._unpacked]
+        for entity_id in self._dirty:
+            if esper.entity_exists(entity_id):
+                components = {c.__class__.__name__: c.model_dump() for c in esper.components_for_entity(entity_id)}
+                lines.append(json.dumps({"op": "put", "id": entity_id, "components": components}))
+            else:
+                lines.append(json.dumps({"op": "del", "id": entity_id}))
+        for parent_id in self._reordered:
+            if esper.entity_exists(parent_id):
+                children = [child.entity_id for child in esper.component_for_entity(parent_id, Node).children]
+                lines.append(json.dumps({"op": "order", "id": parent_id, "children": children}))
+        self._dirty.clear()
+        self._unpacked.clear()
+        self._reordered.clear()
+        if lines:
+            with self._lock:
+                self._queue.append(lines)
+
+    def _write(self, path: Path):
+        with self._lock:
+            if not self._queue:
+                return
+            with open(path, "a") as f:
+                for lines in self._queue:
+                    f.write("\n".join(lines) + "\n")
+                    self.num_records += len(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._queue.clear()
+
+    def flush(self):
+        if self.path is None:
+            return
+        self._collect()
+        self._write(self.path)
+
+    async def flush_async(self):
+        """Like `flush`, with the file write on a worker thread"""
+        import trio
+
+        if self.path is None or not self.has_changes():
+            return
+        path = self.path
+        self._collect()
+        await trio.to_thread.run_sync(self._write, path)
+
+    def needs_compaction(self) -> bool:
+        if self.path is None or self.num_records == 0:
+            return False
+        return (
+            self.num_records >= self.compact_records
+            or time.monotonic() - self._last_compaction >= self.compact_interval
+        )
+
+    def compact(self):
+        """Write the whole scene, which starts an empty journal"""
+        from .scene_utils import save_scene
+
+        if self.path is None:
+            return
+        save_scene(self.path.parent)
+
+    def truncate(self):
+        if self.path is None:
+            return
+        with self._lock:
+            self._queue.clear()
+            tmp = self.path.with_suffix(".tmp")
+            open(tmp, "w").close()
+            os.replace(tmp, self.path)
+            self.num_records = 0
+        self._last_compaction = time.monotonic()
+
+    def replay(self, scene_path: Path, manifest: dict) -> tuple[set[int], int]:
+        """Apply the journal of `scene_path` to the loaded manifest in place.
+
+        Returns the measurement groups whose sidecar rows must be ignored and
+        the number of records. A torn last line, e.g. after a crash during a
+        write, is skipped. Only reads files, so it can run on a worker thread.
+        """
+        path = Path(scene_path) / JOURNAL_NAME
+        unpacked = set()
+        if not path.exists():
+            return unpacked, 0
+        num_records = 0
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping damaged journal record in {path}")
+                    continue
+                num_records += 1
+                key = str(record["id"])
+                if record["op"] == "put":
+                    manifest[key] = record["components"]
+                elif record["op"] == "del":
+                    manifest.pop(key, None)
+                elif record["op"] == "unpack":
+                    unpacked.add(record["id"])
+                elif record["op"] == "order":
+                    # siblings are loaded in manifest order, move them to the end in the new order
+                    for child in record["children"]:
+                        child = str(child)
+                        if child in manifest:
+                            manifest[child] = manifest.pop(child)
+        if num_records:
+            print(f"Replayed {num_records} journal records")
+        return unpacked, num_records
+
+
+JOURNAL = SceneJournal()
@@ -0,0 +1,334 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import esper
+import numpy as np
+
+from .image_measurement import ImageMeasurement
+from .joint_measurement import JointMeasurement
+from .measurement import Measurement
+from .node import Node
+from .simple import Deletable, Selected
+from .tree_utils import EntityBatch, create_entity, get_node
+from waynon.utils.image_store import IMAGE_STORE
+
+# Measurements of the saved scene live next to manifest.json:
+#   measurements.json          group entity id -> [start, end) rows, and the directory
+#   measurements-<id>/*.npy    one file per column, memory-mapped on load
+INDEX_NAME = "measurements.json"
+DIRECTORY_PREFIX = "measurements-"
+
+MEASUREMENT_COLUMNS = (
+    "name",
+    "has_joint",
+    "joint_name",
+    "joint_robot_id",
+    "joint_count",
+    "joint_values",
+    "has_image",
+    "image_name",
+    "image_camera_id",
+    "image_path",
+    "image_hash",
+    "capture_timestamp",
+    "sync_skew",
+    "detection_start",
+    "detection_end",
+)
+DETECTION_COLUMNS = (
+    "detection_name",
+    "detector_entity_id",
+    "camera_entity_id",
+    "marker_entity_id",
+    "marker_id",
+    "marker_dict",
+    "pixels",
+)
+ENTITY_ID_COLUMNS = ("joint_robot_id", "image_camera_id", "detector_entity_id", "camera_entity_id", "marker_entity_id")
+STRING_COLUMNS = ("name", "joint_name", "image_name", "image_path", "image_hash", "detection_name")
+DTYPES = {
+    "has_joint": bool,
+    "joint_robot_id": np.int64,
+    "joint_count": np.int64,
+    "has_image": bool,
+    "image_camera_id": np.int64,
+    "capture_timestamp": np.float64,
+    "sync_skew": np.float64,
+    "detection_start": np.int64,
+    "detection_end": np.int64,
+    "detector_entity_id": np.int64,
+    "camera_entity_id": np.int64,
+    "marker_entity_id": np.int64,
+    "marker_id": np.int64,
+    "marker_dict": np.int64,
+}
+
+
+def _types(entity_id: int) -> set:
+    return {type(c) for c in esper.components_for_entity(entity_id)} - {Node, Selected}
+
+
+def _pack_measurement(measurement_id: int, rows: dict, detections: dict) -> bool:
+    """Append the measurement to the columns, False if it does not have the usual shape"""
+    if _types(measurement_id) != {Measurement, Deletable}:
+        return False
+    joint_node = image_node = None
+    for child in get_node(measurement_id).children:
+        types = _types(child.entity_id)
+        if types == {JointMeasurement} and joint_node is None and not child.children:
+            joint_node = child
+        elif types == {ImageMeasurement} and image_node is None and not child.children:
+            image_node = child
+        else:
+            return False
+
+    rows["name"].append(get_node(measurement_id).name)
+    rows["has_joint"].append(joint_node is not None)
+    if joint_node is not None:
+        joint = esper.component_for_entity(joint_node.entity_id, JointMeasurement)
+        rows["joint_name"].append(joint_node.name)
+        rows["joint_robot_id"].append(joint.robot_id)
+        rows["joint_count"].append(len(joint.joint_values))
+        rows["joint_values"].append(np.asarray(joint.joint_values, dtype=np.float64))
+    else:
+        rows["joint_name"].append("")
+        rows["joint_robot_id"].append(-1)
+        rows["joint_count"].append(0)
+        rows["joint_values"].append(np.zeros(0))
+
+    rows["has_image"].append(image_node is not None)
+    start = len(detections["detection_name"])
+    if image_node is not None:
+        image = esper.component_for_entity(image_node.entity_id, ImageMeasurement)
+        rows["image_name"].append(image_node.name)
+        rows["image_camera_id"].append(image.camera_id)
+        rows["image_path"].append(image.image_path)
+        rows["image_hash"].append(image.image_hash or "")
+        rows["capture_timestamp"].append(np.nan if image.capture_timestamp is None else image.capture_timestamp)
+        rows["sync_skew"].append(np.nan if image.sync_skew is None else image.sync_skew)
+        for aruco in image.get_aruco_detections():
+            detections["detection_name"].append(f"Aruco {aruco.marker_id}")
+            for column in DETECTION_COLUMNS[1:]:
+                detections[column].append(getattr(aruco, column))
+    else:
+        rows["image_name"].append("")
+        rows["image_camera_id"].append(-1)
+        rows["image_path"].append("")
+        rows["image_hash"].append("")
+        rows["capture_timestamp"].append(np.nan)
+        rows["sync_skew"].append(np.nan)
+    rows["detection_start"].append(start)
+    rows["detection_end"].append(len(detections["detection_name"]))
+    return True
+
+
+def _column_array(column: str, values) -> np.ndarray:
+    if column == "joint_values":
+        width = max((len(v) for v in values), default=0)
+        res = np.full((len(values), width), np.nan)
+        for i, v in enumerate(values):
+            res[i, : len(v)] = v
+        return res
+    if column == "pixels":
+        return np.asarray(values, dtype=np.float64).reshape(-1, 4, 2)
+    if column in STRING_COLUMNS:
+        return np.asarray(values, dtype=str)
+    return np.asarray(values, dtype=DTYPES[column])
+
+
+class MeasurementSidecar:
+    """Memory-mapped measurement columns of a saved scene.
+
+    Entity ids in the columns are the ids of the saved manifest, `old_to_new`
+    maps them to the entities created when the scene was loaded.
+    """
+
+    def __init__(self, directory: Path, groups: Dict[int, tuple[int, int]], old_to_new: Dict[int, int]):
+        self.directory = Path(directory)
+        self.groups = groups
+        self.old_to_new = old_to_new
+        self.columns = {}
+        for column in (*MEASUREMENT_COLUMNS, *DETECTION_COLUMNS):
+            file = self.directory / f"{column}.npy"
+            if file.exists():
+                self.columns[column] = np.load(file, mmap_mode="r")
+        if "image_hash" not in self.columns:
+            # written before images went to the image store
+            self.columns["image_hash"] = np.full(len(self.columns["name"]), "", dtype=str)
+
+    @staticmethod
+    def open(path: Path, old_to_new: Dict[int, int]) -> Optional["MeasurementSidecar"]:
+        index = Path(path) / INDEX_NAME
+        if not index.exists():
+            return None
+        with open(index, "r") as f:
+            res = json.load(f)
+        groups = {int(k): (int(v[0]), int(v[1])) for k, v in res["groups"].items()}
+        return MeasurementSidecar(Path(path) / res["directory"], groups, old_to_new)
+
+    def _remap(self, ids: np.ndarray) -> np.ndarray:
+        unique, inverse = np.unique(ids, return_inverse=True)
+        new_ids = np.array([self.old_to_new.get(int(i), -1) for i in unique], dtype=np.int64)
+        return new_ids[inverse.reshape(-1)]
+
+    def slice(self, start: int, end: int) -> tuple[dict, dict]:
+        """Rows [start, end) and their detections, with entity ids of the current scene"""
+        c = self.columns
+        rows = {column: np.array(c[column][start:end]) for column in MEASUREMENT_COLUMNS}
+        d0 = int(c["detection_start"][start]) if end > start else 0
+        d1 = int(c["detection_end"][end - 1]) if end > start else 0
+        detections = {column: np.array(c[column][d0:d1]) for column in DETECTION_COLUMNS}
+        rows["detection_start"] -= d0
+        rows["detection_end"] -= d0
+        for columns in (rows, detections):
+            for column in ENTITY_ID_COLUMNS:
+                if column in columns:
+                    columns[column] = self._remap(columns[column])
+        return rows, detections
+
+    def materialize(self, group_id: int, start: int, end: int):
+        """Create the measurement entities of rows [start, end) under `group_id`"""
+        rows, detections = self.slice(start, end)
+        with EntityBatch():
+            for i in range(end - start):
+                measurement_id, _ = create_entity(str(rows["name"][i]), group_id, Measurement(), Deletable())
+                if rows["has_joint"][i]:
+                    joint_values = rows["joint_values"][i, : rows["joint_count"][i]]
+                    create_entity(
+                        str(rows["joint_name"][i]),
+                        measurement_id,
+                        JointMeasurement(robot_id=int(rows["joint_robot_id"][i]), joint_values=joint_values.tolist()),
+                    )
+                if rows["has_image"][i]:
+                    capture_timestamp = float(rows["capture_timestamp"][i])
+                    sync_skew = float(rows["sync_skew"][i])
+                    aruco_detections = [
+                        {
+                            **{column: int(detections[column][d]) for column in DETECTION_COLUMNS[1:-1]},
+                            "pixels": detections["pixels"][d].tolist(),
+                        }
+                        for d in range(rows["detection_start"][i], rows["detection_end"][i])
+                    ]
+                    create_entity(
+                        str(rows["image_name"][i]),
+                        measurement_id,
+                        ImageMeasurement(
+                            camera_id=int(rows["image_camera_id"][i]),
+                            image_path=str(rows["image_path"][i]),
+                            image_hash=str(rows["image_hash"][i]) or None,
+                            capture_timestamp=None if np.isnan(capture_timestamp) else capture_timestamp,
+                            sync_skew=None if np.isnan(sync_skew) else sync_skew,
+                            aruco_detections=aruco_detections,
+                        ),
+                    )
+
+
+def _import_images(rows: dict, data_path: Path):
+    # Rows that still refer to an image file in the old data folder
+    hashes = rows["image_hash"].tolist()
+    for i, (has_image, image_path) in enumerate(zip(rows["has_image"], rows["image_path"])):
+        file = data_path / str(image_path)
+        if has_image and not hashes[i] and file.exists():
+            hashes[i] = IMAGE_STORE.put_file(file)
+    rows["image_hash"] = np.asarray(hashes, dtype=str)
+
+
+def save_measurements(path: Path, group_ids: list[int], import_images_from: Optional[Path] = None) -> set[int]:
+    """Write the measurements of `group_ids` next to the manifest.
+
+    Groups whose measurements all have the usual shape (joints, an image and
+    its ArUco detections) are written as columns; the returned entity ids are
+    the descendants of those groups, which the manifest can leave out. Groups
+    that were never expanded are copied straight from their sidecar, images
+    they still keep in `import_images_from` are added to the image store.
+    """
+    path = Path(path)
+    chunks = []
+    groups = {}
+    packed = set()
+    num_rows = 0
+    for group_id in group_ids:
+        group = esper.component_for_entity(group_id, _measurement_group_type())
+        if group.is_pending():
+            sidecar, start, end = group.pending()
+            rows, detections = sidecar.slice(start, end)
+            if import_images_from is not None:
+                _import_images(rows, import_images_from)
+        else:
+            rows = {column: [] for column in MEASUREMENT_COLUMNS}
+            detections = {column: [] for column in DETECTION_COLUMNS}
+            children = get_node(group_id).children
+            if not all(_pack_measurement(child.entity_id, rows, detections) for child in children):
+                continue
+            rows = {column: _column_array(column, values) for column, values in rows.items()}
+            detections = {column: _column_array(column, values) for column, values in detections.items()}
+            packed.update(d.entity_id for d in get_node(group_id).descendants)
+        count = len(rows["name"])
+        groups[str(group_id)] = [num_rows, num_rows + count]
+        num_rows += count
+        chunks.append((rows, detections))
+
+    directory = path / f"{DIRECTORY_PREFIX}{uuid.uuid4().hex[:8]}"
+    directory.mkdir()
+    num_detections = 0
+    for rows, detections in chunks:
+        rows["detection_start"] = rows["detection_start"] + num_detections
+        rows["detection_end"] = rows["detection_end"] + num_detections
+        num_detections += len(detections["detection_name"])
+    for columns, names in ((0, MEASUREMENT_COLUMNS), (1, DETECTION_COLUMNS)):
+        for column in names:
+            parts = [chunk[columns][column] for chunk in chunks]
+            if column == "joint_values":
+                width = max((p.shape[1] for p in parts), default=0)
+                parts = [np.pad(p, ((0, 0), (0, width - p.shape[1])), constant_values=np.nan) for p in parts]
+            array = np.concatenate(parts) if parts else _column_array(column, [])
+            np.save(directory / f"{column}.npy", array)
+
+    # Swap the index atomically; the previous directory may still be mapped
+    # by groups that were loaded from it, removing it only unlinks the files
+    index = path / INDEX_NAME
+    tmp = path / f"{INDEX_NAME}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps({"directory": directory.name, "groups": groups}))
+    os.replace(tmp, index)
+    for old in path.glob(f"{DIRECTORY_PREFIX}*"):
+        if old != directory:
+            shutil.rmtree(old, ignore_errors=True)
+    return packed
+
+
+def _measurement_group_type():
+    from .collector import MeasurementGroup
+
+    return MeasurementGroup
+
+
+def attach_sidecar(path: Path, old_to_new: Dict[int, int], skip: Optional[set[int]] = None):
+    """Mark the loaded groups of the sidecar as pending, they are materialized on use.
+
+    Groups in `skip` have their measurements in the manifest already.
+    """
+    sidecar = MeasurementSidecar.open(path, old_to_new)
+    if sidecar is None:
+        return
+    MeasurementGroup = _measurement_group_type()
+    for old_id, (start, end) in sidecar.groups.items():
+        if skip and old_id in skip:
+            continue
+        group_id = old_to_new.get(old_id)
+        if group_id is None or not esper.has_component(group_id, MeasurementGroup):
+            continue
+        esper.component_for_entity(group_id, MeasurementGroup).set_pending(sidecar, start, end)
+
+
+def materialize_measurements():
+    """Create the entities of every pending group, before the whole dataset is used"""
+    MeasurementGroup = _measurement_group_type()
+    for group_id, group in list(esper.get_component(MeasurementGroup)):
+        group.materialize(group_id)
@@ -1,5 +1,6 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
+from collections import Counter
 from dataclasses import dataclass
 from typing import Optional 
 import esper
@@ -10,7 +11,17 @@ from imgui_bundle import imgui
 from waynon.components.component import Component   
 
 
-    
+_tree_version = 0
+
+
+def tree_version() -> int:
+    """Changes whenever any node is attached to or detached from a parent"""
+    return _tree_version
+
+
+def _bump_tree_version():
+    global _tree_version
+    _tree_version += 1
 
 
 class Node(Component, NodeMixin):
@@ -20,6 +31,10 @@ class Node(Component, NodeMixin):
     opened: bool = False
 
     def model_post_init(self, __context):
+        # Component types of this entity, and how many entities in this subtree
+        # (itself included) have each type. Lets tree queries skip subtrees.
+        self._own_types: Optional[set] = None
+        self._subtree_counts = Counter()
         return super().model_post_init(__context)
 
     @property
@@ -34,6 +49,37 @@ class Node(Component, NodeMixin):
     def refresh(self):
         if self.parent_entity_id is not None:
             self.parent = esper.component_for_entity(self.parent_entity_id, Node)
+
+    def _post_attach(self, parent):
+        _bump_tree_version()
+        if self._own_types is None and self.entity_id is not None and esper.entity_exists(self.entity_id):
+            self._own_types = {
+                type(c) for c in esper.components_for_entity(self.entity_id) if not isinstance(c, Node)
+            }
+            self._subtree_counts.update(self._own_types)
+        for node in (parent, *parent.ancestors):
+            node._subtree_counts.update(self._subtree_counts)
+
+    def _post_detach(self, parent):
+        _bump_tree_version()
+        for node in (parent, *parent.ancestors):
+            node._subtree_counts.subtract(self._subtree_counts)
+
+    def _change_own_type(self, component_type, added: bool):
+        if self._own_types is None:
+            self._own_types = set()
+        if added == (component_type in self._own_types):
+            return
+        if added:
+            self._own_types.add(component_type)
+        else:
+            self._own_types.remove(component_type)
+        for node in (self, *self.ancestors):
+            node._subtree_counts[component_type] += 1 if added else -1
+
+    def subtree_has(self, component_type) -> bool:
+        """Whether this node or any descendant may have a component of this type"""
+        return self._subtree_counts[component_type] > 0
     
     def draw_property(self, nursery, entity_id:int):
         imgui.separator_text("Node")
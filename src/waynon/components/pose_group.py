@@ -1,6 +1,7 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
 from typing import Optional 
+import numpy as np
 import trio
 
 import esper
@@ -15,6 +16,7 @@ from waynon.components.simple import Pose
 
 class PoseGroup(Component):
     color: list[float] = [1.0, 1.0, 1.0]
+    show_poses: bool = False
 
 
     def model_post_init(self, __context):
@@ -22,6 +24,7 @@ class PoseGroup(Component):
         self._moving = False
         self._progress = 0
         self._total= 0
+        self._ghosts = None
 
 
     def get_robot_manager(self, entity_id):
@@ -39,6 +42,21 @@ class PoseGroup(Component):
             qs.append(pose.q)
         return qs
     
+    def draw_poses(self, entity_id):
+        # Every pose of the group as a ghost robot
+        from waynon.components.transform import Transform
+        from waynon.utils.draw_utils import RobotGhosts
+
+        robot_id = find_nearest_ancestor_with_component(entity_id, Robot)
+        if robot_id is None:
+            return
+        X_WB = np.eye(4)
+        if esper.has_component(robot_id, Transform):
+            X_WB = esper.component_for_entity(robot_id, Transform).get_X_WT()
+        if self._ghosts is None:
+            self._ghosts = RobotGhosts()
+        self._ghosts.draw(self.get_poses(entity_id), X_WB, (*COLORS["PURPLE"][:3], 0.3))
+
     async def cycle(self, entity_id):
         self._cancel_context.cancel()   
         self._cancel_context = trio.CancelScope()
@@ -66,6 +84,8 @@ class PoseGroup(Component):
         # _, group.color = imgui.color_edit3(f"##color", group.color, flags=flag) 
         imgui.text_wrapped("Press 'circle' on the robot to add a pose and 'cross' to delete the last pose added in this group.")
         imgui.spacing()
+        _, self.show_poses = imgui.checkbox("Show All Poses", self.show_poses)
+        imgui.spacing()
         robot = self.get_robot_manager(e)
 
         disabled = not robot.ready_to_move()
@@ -97,6 +117,13 @@ class PoseGroup(Component):
         
     def on_selected(self, nursery, entity_id, just_selected):
         from waynon.components.scene_utils import create_motion
+
+        if not self.show_poses:
+            # Already drawn by the viewer otherwise
+            esper.dispatch_event(
+                "3d_draw_callback", entity_id, lambda: self.draw_poses(entity_id)
+            )
+
         node = esper.component_for_entity(entity_id, Node)
         robot_id = find_nearest_ancestor_with_component(entity_id, Robot)
         if robot_id is None:
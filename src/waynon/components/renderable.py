@@ -22,16 +22,40 @@ from .camera import PinholeCamera
 from .measurement import Measurement
 from .transform import Transform
 
+from waynon.pyglet.model import InstancedMesh
 from waynon.utils.aruco_textures import ARUCO_TEXTURES
-from waynon.utils.utils import COLORS
+from waynon.utils.utils import ASSET_PATH, COLORS
 
 
 class Drawable:
+    """GPU resources are created by `_create_model` on first use, not when the
+    component is constructed, so loading a scene only parses data. Setters
+    update the fields and forward to the model only once it exists."""
+
+    def _init_drawable(self):
+        self._model = None
+        self._matrix = None
+
+    def _create_model(self):
+        raise NotImplementedError("_create_model method not implemented")
+
+    def get_model(self):
+        if self._model is None:
+            self._model = self._create_model()
+            if self._matrix is not None:
+                self._apply_matrix()
+        return self._model
+
+    def _apply_matrix(self):
+        self._model.matrix = self._matrix
+
     def draw(self):
         raise NotImplementedError("draw method not implemented")
 
     def set_X_WT(self, X_WT: np.ndarray):
-        raise NotImplementedError("set_X_WT method not implemented")
+        self._matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
+        if self._model is not None:
+            self._apply_matrix()
 
 class Mesh(Component, Drawable):
 
@@ -40,28 +64,20 @@ class Mesh(Component, Drawable):
     visible: bool = True
 
     def model_post_init(self, __context):
-        self._batch = pyglet.graphics.Batch()
-        self._model = pyglet.resource.model(self.mesh_path, batch=self._batch)
-        try:
-            self._model.groups[0].color = self.color
-        except:
-            pass
-    
+        # No GPU resources of its own, SCENE_RENDERER draws it as an instance of its file
+        self._init_drawable()
+
     def set_X_WT(self, X_WT: np.ndarray):
-        self._model.matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
+        self._matrix = X_WT
+
+    def get_X_WT(self) -> np.ndarray | None:
+        return self._matrix
     
     def set_color(self, color: tuple[float, float, float, float]):
-        if self.color == color:
-            return
         self.color = color
-        try:
-            self._model.groups[0].color = color
-        except:
-            print(f"Wanted to set color {color} but group does not support it")
     
     def draw(self):
-        if self.visible:
-            self._batch.draw()
+        SCENE_RENDERER.draw_meshes([self])
         
     def draw_property(self, nursery, entity_id):
         imgui.push_id(entity_id)
@@ -71,6 +87,46 @@ class Mesh(Component, Drawable):
     
     def property_order(self):
         return 500
+
+
+class SceneRenderer:
+    """Draws every `Mesh` with one instanced draw call per mesh file.
+
+    The model matrix and color of each mesh go into the instance buffer of
+    the `InstancedMesh` of its file, which shares the vertex data with every
+    other user of the file. Instance data is only uploaded when a matrix or
+    color changed, so a multi-robot scene costs one draw per link mesh.
+    """
+
+    def __init__(self):
+        self._meshes: dict[tuple, InstancedMesh] = {}
+        self._uploaded: dict[tuple, bytes] = {}
+
+    def _get_mesh(self, key: tuple) -> InstancedMesh:
+        if key not in self._meshes:
+            self._meshes[key] = InstancedMesh.from_file(ASSET_PATH / key[1])
+        return self._meshes[key]
+
+    def draw_meshes(self, meshes):
+        groups: dict[str, list[Mesh]] = {}
+        for mesh in meshes:
+            if mesh.visible and mesh.get_X_WT() is not None:
+                groups.setdefault(mesh.mesh_path, []).append(mesh)
+
+        ctx = pyglet.gl.current_context
+        for mesh_path, group in groups.items():
+            key = (ctx, mesh_path)
+            instanced = self._get_mesh(key)
+            matrices = np.stack([mesh.get_X_WT() for mesh in group]).astype(np.float32)
+            colors = np.array([mesh.color for mesh in group], dtype=np.float32)
+            data = matrices.tobytes() + colors.tobytes()
+            if self._uploaded.get(key) != data:
+                instanced.set_instances(matrices, colors)
+                self._uploaded[key] = data
+            instanced.draw()
+
+
+SCENE_RENDERER = SceneRenderer()
         
 
 class ImageQuad(Component, Drawable):
@@ -81,8 +137,12 @@ class ImageQuad(Component, Drawable):
     bot_left: tuple[float, float, float]
 
     def model_post_init(self, __context):
+        self._init_drawable()
+        self._batch = None
+
+    def _create_model(self):
         self._batch = pyglet.graphics.Batch()
-        self._model = marsoom.image_quad.ImageQuad(
+        return marsoom.image_quad.ImageQuad(
             self.texture_id, 
             self.top_left, 
             self.top_right, 
@@ -92,12 +152,12 @@ class ImageQuad(Component, Drawable):
             )
     
     def set_texture(self, texture_id):
-        self._model.tex_id = texture_id
-    
-    def set_X_WT(self, X_WT: np.ndarray):
-        self._model.matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
+        self.texture_id = texture_id
+        if self._model is not None:
+            self._model.tex_id = texture_id
     
     def draw(self):
+        self.get_model()
         self._batch.draw()
 
 class ArucoDrawable(Component, Drawable):
@@ -106,6 +166,10 @@ class ArucoDrawable(Component, Drawable):
     marker_dict: int = 0
 
     def model_post_init(self, __context):
+        self._init_drawable()
+        self._batch = None
+
+    def _create_model(self):
         marker_points = get_single_marker_points(self.marker_size)
         top_left = tuple(marker_points[0].tolist())
         top_right = tuple(marker_points[1].tolist())
@@ -113,7 +177,7 @@ class ArucoDrawable(Component, Drawable):
         bot_left = tuple(marker_points[3].tolist())
         self._batch = pyglet.graphics.Batch()
         self._texture_id = ARUCO_TEXTURES.get_texture(self.marker_id, self.marker_dict).id
-        self._model = marsoom.image_quad.ImageQuad(
+        return marsoom.image_quad.ImageQuad(
             self._texture_id,
             top_left, 
             top_right, 
@@ -126,6 +190,8 @@ class ArucoDrawable(Component, Drawable):
         if self.marker_size == marker_size:
             return
         self.marker_size = marker_size
+        if self._model is None:
+            return
         marker_points = get_single_marker_points(self.marker_size)
         top_left = tuple(marker_points[0].tolist())
         top_right = tuple(marker_points[1].tolist())
@@ -142,6 +208,8 @@ class ArucoDrawable(Component, Drawable):
         if self.marker_id == marker_id:
             return
         self.marker_id = marker_id
+        if self._model is None:
+            return
         self._texture_id = ARUCO_TEXTURES.get_texture(marker_id, self.marker_dict).id
         self._model.tex_id = self._texture_id
     
@@ -149,13 +217,13 @@ class ArucoDrawable(Component, Drawable):
         if self.marker_dict == marker_dict:
             return
         self.marker_dict = marker_dict
+        if self._model is None:
+            return
         self._texture_id = ARUCO_TEXTURES.get_texture(self.marker_id, marker_dict).id
         self._model.tex_id = self._texture_id
-
-    def set_X_WT(self, X_WT: np.ndarray):
-        self._model.matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
     
     def draw(self):
+        self.get_model()
         self._batch.draw()
 
 
@@ -214,33 +282,48 @@ class CameraWireframe(Component, Drawable):
         return 500
 
     def model_post_init(self, __context):
+        self._init_drawable()
+        self._batch = None
+        self._texture_id = None
+
+    def _create_model(self):
         self._batch = pyglet.graphics.Batch()
-        self._model = marsoom.camera_wireframe.CameraWireframeWithImage(
+        K = np.array([[self.fl_x, 0, self.cx],    
+                      [0, self.fl_y, self.cy],
+                      [0, 0, 1]], dtype=np.float32)
+        model = marsoom.camera_wireframe.CameraWireframeWithImage(
             batch=self._batch, 
             z_offset=self.z_offset, 
             alpha=self.alpha, 
             width=self.width, 
             height=self.height,
-            K=np.array([[self.fl_x, 0, self.cx],    
-                        [0, self.fl_y, self.cy],
-                        [0, 0, 1]], dtype=np.float32)
+            K=K
             )
-        self.update_intrinsics(self.fl_x, self.fl_y, self.cx, self.cy, self.width, self.height, force=True)
+        model.update_K(K, self.width, self.height)
+        if self._texture_id is not None:
+            model.set_texture_id(self._texture_id)
+        return model
     
     def set_z_offset(self, z_offset: float):
         if self.z_offset == z_offset:
             return
         self.z_offset = z_offset
-        self._model.update_z_offset(z_offset)
+        if self._model is not None:
+            self._model.update_z_offset(z_offset)
     
     def set_alpha(self, alpha: float):
         if self.alpha == alpha:
             return
         self.alpha = alpha
-        self._model.set_alpha(alpha)
+        if self._model is not None:
+            self._model.set_alpha(alpha)
     
     def set_texture_id(self, texture_id):
-        self._model.set_texture_id(texture_id)
+        if self._texture_id == texture_id:
+            return
+        self._texture_id = texture_id
+        if self._model is not None:
+            self._model.set_texture_id(texture_id)
 
     def update_intrinsics(self, fl_x: float, fl_y: float, cx: float, cy: float, width: int, height: int, force:bool = False):
         if not force:
@@ -254,15 +337,15 @@ class CameraWireframe(Component, Drawable):
         self.width = width
         self.height = height
 
+        if self._model is None:
+            return
         K = np.array([[fl_x, 0, cx],
                       [0, fl_y, cy],
                       [0, 0, 1]], dtype=np.float32)
         self._model.update_K(K, width, height)
     
-    def set_X_WT(self, X_WT: np.ndarray):
-        self._model.matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
-    
     def draw(self):
+        self.get_model()
         self._batch.draw()
 
 
@@ -285,12 +368,21 @@ class StructuredPointCloud(Component, Drawable):
         return 500
 
     def model_post_init(self, __context):
-        self._model = marsoom.StructuredPointCloud(
-            1280, 720)
+        self._init_drawable()
+        self._texture_id = None
         self._identifier = -1   
+
+    def _create_model(self):
+        model = marsoom.StructuredPointCloud(
+            1280, 720)
+        model.update_intrinsics(self.fl_x, self.fl_y, self.cx, self.cy)
+        if self._texture_id is not None:
+            model.color_texture_id = self._texture_id
+        return model
     
     def set_texture_id(self, texture_id):
-        if self._model.color_texture_id is None or self._model.color_texture_id != texture_id:
+        self._texture_id = texture_id
+        if self._model is not None and self._model.color_texture_id != texture_id:
             self._model.color_texture_id = texture_id
     
     def update_depth(self, depth: np.ndarray, depth_scale: float, identifier: int = None):
@@ -298,8 +390,9 @@ class StructuredPointCloud(Component, Drawable):
             if self._identifier == identifier:
                 return
             self._identifier = identifier
-        self._model.depth_scale = depth_scale
-        self._model.update_depth(depth)
+        model = self.get_model()
+        model.depth_scale = depth_scale
+        model.update_depth(depth)
 
     def update_intrinsics(self, fl_x: float, fl_y: float, cx: float, cy: float, width: int, height: int, force:bool = False):
         if not force:
@@ -313,10 +406,8 @@ class StructuredPointCloud(Component, Drawable):
         self.width = width
         self.height = height
 
-        self._model.update_intrinsics(fl_x, fl_y, cx, cy)
-    
-    def set_X_WT(self, X_WT: np.ndarray):
-        self._model.matrix = pyglet.math.Mat4(X_WT.T.flatten().tolist())
+        if self._model is not None:
+            self._model.update_intrinsics(fl_x, fl_y, cx, cy)
     
     def draw(self):
-        self._model.draw()
+        self.get_model().draw()
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import trio
+
+from imgui_bundle import imgui
+from imgui_bundle import icons_fontawesome_6 as icons
+
+from waynon.components.simple import Component
+from waynon.processors.replay_manager import REPLAY_MANAGER
+from waynon.utils.utils import COLORS
+
+
+class ReplayCamera(Component):
+    """Plays back a recorded image sequence as if it were a live camera."""
+
+    path: str = ""
+    fps: float = 30.0
+    speed: float = 1.0
+    max_speed: bool = False
+    loop: bool = True
+
+    def running(self, entity_id: int):
+        return REPLAY_MANAGER.camera_started(entity_id)
+
+    def on_delete(self, entity_id):
+        REPLAY_MANAGER.stop_camera(entity_id)
+
+    def draw_context(self, nursery, entity_id):
+        if self.running(entity_id):
+            if imgui.menu_item_simple(f"{icons.ICON_FA_STOP} Stop"):
+                REPLAY_MANAGER.stop_camera(entity_id)
+        else:
+            if imgui.menu_item_simple(f"{icons.ICON_FA_PLAY} Start"):
+                REPLAY_MANAGER.start_camera(entity_id)
+
+    def draw_property(self, nursery: trio.Nursery, e: int):
+        imgui.separator_text("Replay")
+        running = self.running(e)
+
+        imgui.begin_disabled(running)
+        _, self.path = imgui.input_text("Recording", self.path)
+        imgui.set_item_tooltip("Folder of PNG images or a .npz container")
+        _, self.speed = imgui.input_float("Speed", self.speed)
+        self.speed = max(self.speed, 0.01)
+        _, self.max_speed = imgui.checkbox("Max Speed", self.max_speed)
+        _, self.loop = imgui.checkbox("Loop", self.loop)
+        _, self.fps = imgui.input_float("FPS (no timestamps)", self.fps)
+        self.fps = max(self.fps, 0.01)
+        imgui.end_disabled()
+
+        imgui.spacing()
+        if not running:
+            imgui.push_style_color(imgui.Col_.button, COLORS["GREEN"])
+            if imgui.button("Start", (imgui.get_content_region_avail().x, 40)):
+                REPLAY_MANAGER.start_camera(e)
+            imgui.pop_style_color()
+        else:
+            imgui.push_style_color(imgui.Col_.button, COLORS["RED"])
+            if imgui.button("Stop", (imgui.get_content_region_avail().x, 40)):
+                REPLAY_MANAGER.stop_camera(e)
+            imgui.pop_style_color()
+            player = REPLAY_MANAGER.get_player(e)
+            if player is not None:
+                total = len(player.sequence)
+                imgui.progress_bar(
+                    (player.index + 1) / total,
+                    (imgui.get_content_region_avail().x, 20),
+                    f"{player.index + 1}/{total}",
+                )
+        imgui.spacing()
+
+    @staticmethod
+    def default_name():
+        return "Replay"
+
+    def property_order(self):
+        return 50
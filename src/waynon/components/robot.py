@@ -1,18 +1,18 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
-from typing import Literal
+from pathlib import Path
+from typing import Optional
+
 import trio
 import numpy as np
-import pinocchio as pin
 
 from imgui_bundle import imgui    
-import panda_py
 
 
 from waynon.utils.utils import ASSET_PATH, static, one_at_a_time
 from waynon.components.component import Component
 
-from waynon.processors.robot import FrankaManager, RobotManager
+from waynon.processors.robot import FrankaManager, RobotManager, SimulatedFrankaManager, UrdfRobotManager
 from waynon.utils.utils import COLORS
 
 
@@ -32,6 +32,10 @@ class Franka(Component):
     ip: str = "10.103.1.111"
     username: str = "admin"
     password: str = "Password!"
+    simulated: bool = False
+    speed_factor: float = 0.2
+    sim_speed_factor: float = 0.2
+    sim_joint_noise: float = 0.0
 
     @staticmethod
     def get_robot_links(robot_id):
@@ -39,12 +43,38 @@ class Franka(Component):
 
     def model_post_init(self, __context):
         super().model_post_init(__context)
-        self._manager = FrankaManager(self)
+        # Parsing the URDF is deferred to the first use of the manager
+        self._manager = None
+
+    def _create_manager(self) -> FrankaManager:
+        if self.simulated:
+            return SimulatedFrankaManager(self)
+        return FrankaManager(self)
+
+    def set_simulated(self, simulated: bool):
+        if self.simulated == simulated:
+            return
+        manager = self.get_manager()
+        assert manager.connect_status == FrankaManager.ConnectionStatus.DISCONNECTED
+        offline_q = manager.offline_q
+        self.simulated = simulated
+        self._manager = self._create_manager()
+        self._manager.set_offline_q(offline_q)
 
     def get_manager(self):
+        if self._manager is None:
+            self._manager = self._create_manager()
         return self._manager
     
     def draw_property(self, nursery: trio.Nursery, _):
+        disconnected = self.get_manager().connect_status == FrankaManager.ConnectionStatus.DISCONNECTED
+        imgui.begin_disabled(not disconnected)
+        res, simulated = imgui.checkbox("Simulated", self.simulated)
+        if res:
+            self.set_simulated(simulated)
+        imgui.end_disabled()
+        if self.simulated:
+            return draw_simulated_property(nursery=nursery, robot=self._manager)
         return draw_property(nursery=nursery, robot=self._manager)
     
     def property_order(self):
@@ -54,22 +84,89 @@ class Franka(Component):
     def default_name():
         return "Franka"
 
+class UrdfRobot(Component):
+    """A robot described by any URDF, without a controller.
+
+    The joint values are set by hand (`offline_q`). Every body frame of the
+    URDF is a link entity under the robot's "Links".
+    """
+
+    urdf_path: str = ""
+    offline_q: Optional[list[float]] = None
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        # Parsing the URDF is deferred to the first use of the manager
+        self._manager = None
+        self._load_failed = False
+        self._edit_path = None
+
+    def get_manager(self) -> UrdfRobotManager | None:
+        if self._manager is None and self.urdf_path and not self._load_failed:
+            offline_q = None if self.offline_q is None else np.array(self.offline_q)
+            try:
+                self._manager = UrdfRobotManager(Path(self.urdf_path), offline_q=offline_q)
+            except Exception as e:
+                print(f"Failed to load URDF {self.urdf_path}: {e}")
+                self._load_failed = True
+        return self._manager
+
+    def set_urdf_path(self, entity_id: int, urdf_path: str):
+        from waynon.components.scene_utils import create_urdf_robot_links
+
+        self.urdf_path = urdf_path
+        self.offline_q = None
+        self._manager = None
+        self._load_failed = False
+        create_urdf_robot_links(entity_id)
+
+    def draw_property(self, nursery, entity_id):
+        imgui.separator_text("URDF Robot")
+        if self._edit_path is None:
+            self._edit_path = self.urdf_path
+        _, self._edit_path = imgui.input_text("URDF", self._edit_path)
+        imgui.same_line()
+        if imgui.button("Load"):
+            self.set_urdf_path(entity_id, self._edit_path)
+
+        manager = self.get_manager()
+        if manager is None:
+            imgui.text("No URDF loaded")
+            return
+        q = [float(q_i) for q_i in manager.read_q()]
+        changed = False
+        for i in range(len(q)):
+            res, q[i] = imgui.slider_float(f"q{i}", q[i], -np.pi, np.pi)
+            changed |= res
+        if changed:
+            self.offline_q = q
+            manager.set_offline_q(np.array(q))
+
+    def property_order(self):
+        return 200
+
+    @staticmethod
+    def default_name():
+        return "Robot"
+
+
 class FrankaLinks(Component):
     pass
 
 class FrankaLink(Component):
     robot_id: int
-    link_name: Literal[
-        "panda_link0",
-        "panda_link1",
-        "panda_link2",
-        "panda_link3",
-        "panda_link4",
-        "panda_link5",
-        "panda_link6",
-        "panda_link7",
-        "panda_hand"
-        ] 
+    link_name: str
+
+    def model_post_init(self, __context):
+        self._link_id = None
+        self._link_manager = None
+
+    def get_link_id(self, manager: RobotManager) -> int:
+        # Index of this link in the manager's link table, resolved once per manager
+        if self._link_manager is not manager:
+            self._link_id = manager.link_id(self.link_name)
+            self._link_manager = manager
+        return self._link_id
     
     def _fix_on_load(self, new_to_old_entity_ids):
         self.robot_id = new_to_old_entity_ids[self.robot_id]
@@ -111,6 +208,8 @@ def draw_property(nursery: trio.Nursery, robot: FrankaManager):
     _, settings.ip = imgui.input_text("IP", settings.ip)
     _, settings.username = imgui.input_text("Username", settings.username)
     _, settings.password = imgui.input_text("Password", settings.password, flags=imgui.InputTextFlags_.password)
+    _, settings.speed_factor = imgui.slider_float("Speed Factor", settings.speed_factor, 0.01, 1.0)
+    imgui.set_item_tooltip("Speed of continuous motions as a fraction of the joint velocity limits")
     imgui.label_text("Connection", robot.connect_status.value)
     imgui.label_text("Brakes", robot.brake_status.value)
     imgui.label_text("Mode", robot.operating_mode.value)
@@ -159,3 +258,37 @@ def draw_property(nursery: trio.Nursery, robot: FrankaManager):
         #     for i, q_i in enumerate(q):
         #         imgui.text(f"q{i}: {q_i:.3f}")
     imgui.same_line()
+
+
+@static(busy = False)
+def draw_simulated_property(nursery: trio.Nursery, robot: SimulatedFrankaManager):
+    static = draw_simulated_property
+    settings: Franka = robot.settings
+
+    imgui.separator_text("Simulated Franka")
+
+    @one_at_a_time(static)
+    async def home():
+        await robot.home()
+
+    if robot.connect_status == FrankaManager.ConnectionStatus.DISCONNECTED:
+        imgui.push_style_color(imgui.Col_.button, COLORS["GREEN"])
+        if imgui.button("Connect", size=(imgui.get_content_region_avail().x, 40)):
+            nursery.start_soon(robot.connect_to_ip, nursery, settings.ip, settings.username, settings.password)
+        imgui.pop_style_color()
+    else:
+        imgui.push_style_color(imgui.Col_.button, COLORS["RED"])
+        if imgui.button("Disconnect", size=(imgui.get_content_region_avail().x, 40)):
+            nursery.start_soon(robot.disconnect)
+        imgui.pop_style_color()
+    imgui.spacing()
+
+    _, settings.sim_speed_factor = imgui.slider_float("Speed Factor", settings.sim_speed_factor, 0.01, 1.0)
+    _, settings.sim_joint_noise = imgui.input_float("Joint Noise (rad)", settings.sim_joint_noise, format="%.5f")
+    settings.sim_joint_noise = max(settings.sim_joint_noise, 0.0)
+    imgui.label_text("Connection", robot.connect_status.value)
+
+    if robot.connect_status == FrankaManager.ConnectionStatus.CONNECTED:
+        imgui.separator()
+        if imgui.button("Home"):
+            nursery.start_soon(home)
@@ -7,24 +7,31 @@ from typing import Callable, Type
 import esper
 import numpy as np
 from anytree import RenderTree
-from scipy.spatial.transform import Rotation as R
 
 from .aruco_detector import ArucoDetector
 from .aruco_marker import ArucoMarker
-from .aruco_measurement import ArucoMeasurement
+from .aruco_measurement import ARUCO_TABLE
 from .camera import DepthCamera, PinholeCamera
 from .collector import CollectorData, DataNode, MeasurementGroup, Solvers
 from .component import Component
 from .factor_graph import FactorGraph
 from .image_measurement import ImageMeasurement
+from .journal import JOURNAL
+from waynon.processors.replay_manager import REPLAY_MANAGER
+from waynon.processors.synthetic_camera import SYNTHETIC_CAMERAS
+from waynon.utils.esper_compat import create_entity_with_id
+from waynon.utils.image_store import IMAGE_STORE
 from .joint_measurement import JointMeasurement
 from .measurement import Measurement
+from .measurement_store import attach_sidecar, save_measurements
 from .node import Node
 from .optimizable import Optimizable
 from .pose_group import PoseGroup
 from .realsense_camera import RealsenseCamera
+from .replay_camera import ReplayCamera
+from .synthetic_camera import SyntheticCamera
 from .renderable import ArucoDrawable, CameraWireframe, ImageQuad, Mesh, StructuredPointCloud
-from .robot import Franka, FrankaLink, FrankaLinks, Robot
+from .robot import Franka, FrankaLink, FrankaLinks, Robot, UrdfRobot
 from .simple import (
     Deletable,
     Detector,
@@ -39,7 +46,7 @@ from .simple import (
     Visiblity,
     World,
 )
-from .transform import Transform
+from .transform import Transform, TRANSFORM_INDEX, TRANSFORM_STORE
 from .tree_utils import *
 
 
@@ -71,6 +78,43 @@ def create_realsense_camera(parent_id: int, name: str = None):
     )
 
 
+def create_replay_camera(parent_id: int, name: str = None):
+    if name is None:
+        name = default_name(ReplayCamera)
+
+    return create_entity(
+        name,
+        parent_id,
+        Transform(),
+        PinholeCamera(),
+        ReplayCamera(),
+        Deletable(),
+        Draggable(type="transform"),
+        Nestable(type="transform", target=False),
+        CameraWireframe(),
+        Optimizable(),
+    )
+
+
+def create_synthetic_camera(parent_id: int, name: str = None):
+    if name is None:
+        name = default_name(SyntheticCamera)
+
+    id, node = create_entity(
+        name,
+        parent_id,
+        Transform(),
+        PinholeCamera(),
+        SyntheticCamera(),
+        Deletable(),
+        Draggable(type="transform"),
+        Nestable(type="transform", target=False),
+        CameraWireframe(),
+        Optimizable(),
+    )
+    return id, node
+
+
 def create_aruco_marker(parent_id: int, marker: ArucoMarker = None, name: str = None):
     if name is None:
         name = default_name(ArucoMarker)
@@ -156,6 +200,44 @@ def create_robot(parent_id: int = None, name: str = None):
     return rd, node
 
 
+def create_urdf_robot(parent_id: int, urdf_path: str = "", name: str = None):
+    if name is None:
+        name = default_name(UrdfRobot)
+    rd, node = create_entity(
+        name,
+        parent_id,
+        Transform(modifiable=False),
+        UrdfRobot(urdf_path=urdf_path),
+        Robot(),
+        Deletable(),
+        Draggable(type="transform"),
+        Nestable(type="transform", target=True, source=False),
+    )
+    create_entity("Poses", rd, PoseFolder())
+    create_entity("Links", rd, FrankaLinks())
+    create_urdf_robot_links(rd)
+    return rd, node
+
+
+def create_urdf_robot_links(robot_id: int):
+    """Replace the link entities of a URDF robot with one per link of its URDF"""
+    links_id = find_child_with_component(robot_id, FrankaLinks)
+    assert links_id is not None
+    delete_children(links_id)
+    manager = esper.component_for_entity(robot_id, UrdfRobot).get_manager()
+    if manager is None:
+        return
+    with EntityBatch():
+        for link_name in manager.link_names():
+            create_entity(
+                link_name,
+                links_id,
+                Transform(modifiable=False),
+                Nestable(type="transform", target=True, source=False),
+                FrankaLink(robot_id=robot_id, link_name=link_name),
+            )
+
+
 def create_posegroup(parent_id: int, name: str = None):
     if name is None:
         name = default_name(PoseGroup)
@@ -177,9 +259,10 @@ def create_frame(name: str, parent_id: int, modifiable=True):
 
 
 def create_measurement(name: str, parent_id: int, *measurements: Component):
-    id, node = create_entity(name, parent_id, Measurement(), Deletable())
-    for measurement in measurements:
-        create_entity(measurement.default_name(), id, measurement)
+    with EntityBatch():
+        id, node = create_entity(name, parent_id, Measurement(), Deletable())
+        for measurement in measurements:
+            create_entity(measurement.default_name(), id, measurement)
     return id, node
 
 
@@ -203,9 +286,20 @@ def create_root():
     return create_entity("root", None, Root())
 
 
-def create_empty_scene():
+def clear_scene():
+    # Players would keep feeding entities of the next scene, which reuses ids
+    REPLAY_MANAGER.stop_all_cameras_sync()
+    SYNTHETIC_CAMERAS.stop_all_cameras_sync()
     esper.clear_database()
     esper.clear_cache()
+    TRANSFORM_STORE.clear()
+    ARUCO_TABLE.clear()
+    TRANSFORM_INDEX.invalidate()
+
+
+def create_empty_scene():
+    clear_scene()
+    JOURNAL.close()
     root_id, _ = create_root()
     world_id, _ = create_world()
     create_collector(root_id)
@@ -238,17 +332,29 @@ def save_scene(path: Path):
     data_path = path / "data"
 
     global DATA_PATH
+    import_images_from = None
     if data_path != DATA_PATH:
-        print(f"Copying data from {DATA_PATH} to {data_path}")
-        import shutil
-        shutil.copytree(DATA_PATH, data_path)
+        # Images are shared through the image store, nothing is copied. Images
+        # from before the store are added to it (linked where possible) first.
+        import_images_from = DATA_PATH
+        import_images(DATA_PATH)
         DATA_PATH = data_path
+        DATA_PATH.mkdir(exist_ok=True)
+        if IMAGE_STORE.link_mode != "none":
+            materialize_images(DATA_PATH)
+
+    # Measurements go to the binary sidecar, the manifest keeps the scene graph
+    packed = save_measurements(
+        path, [e for e, _ in esper.get_component(MeasurementGroup)], import_images_from=import_images_from
+    )
 
     res = {}
     root_node = get_root_node()
     nodes = [root_node, *root_node.descendants]
     for node in nodes:
         entity_id = node.entity_id
+        if entity_id in packed:
+            continue
         components = esper.components_for_entity(entity_id)
         res[entity_id] = {}
         for component in components:
@@ -262,33 +368,104 @@ def save_scene(path: Path):
     with open(manifest, "w") as f:
         f.write(json.dumps(res, indent=4))
 
+    # everything is in the manifest now, start journaling from here
+    JOURNAL.open(path)
+    JOURNAL.truncate()
+
 def get_data_path():
     return DATA_PATH
 
-def load_scene(path: Path):
+
+def import_images(data_path: Path):
+    """Add the images that only exist in `data_path` to the image store"""
+    for entity_id, image_measurement in esper.get_component(ImageMeasurement):
+        file = data_path / image_measurement.image_path
+        if not image_measurement.image_hash and file.exists():
+            image_measurement.image_hash = IMAGE_STORE.put_file(file)
+            JOURNAL.mark(entity_id)
+
+
+def materialize_images(data_path: Path, mode: str | None = None):
+    """Give every stored image a file at its `image_path` in `data_path`, e.g. to share a scene"""
+    for entity_id, image_measurement in esper.get_component(ImageMeasurement):
+        if IMAGE_STORE.has(image_measurement.image_hash):
+            IMAGE_STORE.materialize(image_measurement.image_hash, data_path / image_measurement.image_path, mode)
+
+def read_scene(path: Path):
+    """Data phase of `load_scene`: parse the manifest and replay the journal.
+
+    Only reads files and touches no scene state, so large manifests can be
+    parsed on a worker thread. Returns None if there is no scene at `path`.
+    """
+    print(f"Loading from {path}")
+    if not path.exists() or not path.is_dir():
+        print(f"Directory {path} does not exist")
+        return None
+
+    manifest = path / "manifest.json"
+    if not manifest.exists():
+        print(f"Manifest {manifest} does not exist")
+        return None
+
+    with open(manifest, "r") as f:
+        res = json.load(f)
+    # changes made after the last save, e.g. before a crash
+    unpacked, num_records = JOURNAL.replay(path, res)
+    _migrate_aruco_measurements(res)
+    return res, unpacked, num_records
+
+
+def _migrate_aruco_measurements(res: dict):
+    """Fold the detection entities of older manifests into their image measurement"""
+    legacy = [k for k, components in res.items() if "ArucoMeasurement" in components]
+    for entity_id in legacy:
+        components = res.pop(entity_id)
+        parent = res.get(str(components.get("Node", {}).get("parent_entity_id")))
+        if parent is None or "ImageMeasurement" not in parent:
+            continue
+        detection = components["ArucoMeasurement"]
+        parent["ImageMeasurement"].setdefault("aruco_detections", []).append(
+            {key: detection[key] for key in (*ARUCO_TABLE.COLUMNS, "pixels")}
+        )
+
+
+async def load_scene_async(path: Path):
+    """`load_scene` with the manifest parsed on a worker thread"""
+    import trio
+
     try:
-        print(f"Loading from {path}")
-        if not path.exists() or not path.is_dir():
-            print(f"Directory {path} does not exist")
-            return
+        scene = await trio.to_thread.run_sync(read_scene, path)
+    except Exception as e:
+        print(e)
+        print("Failed to read scene")
+        return
+    if scene is not None:
+        load_scene(path, scene)
+
+
+def load_scene(path: Path, scene=None):
+    """Replace the current scene with the one saved at `path`.
+
+    `scene` is the result of `read_scene` if it was already read. Components
+    only parse their data here, GPU resources (textures, meshes, point clouds)
+    and robot models are created on first draw or use.
+    """
+    try:
+        if scene is None:
+            scene = read_scene(path)
+            if scene is None:
+                return
+        res, unpacked, num_records = scene
 
-        manifest = path / "manifest.json"
         global DATA_PATH
         DATA_PATH = path / "data"
         DATA_PATH.mkdir(exist_ok=True)
-        if not manifest.exists():
-            print(f"Manifest {manifest} does not exist")
-            return
 
-        with open(manifest, "r") as f:
-            res = json.load(f)
-
-        esper.clear_database()
-        esper.clear_cache()
+        clear_scene()
         old_id_to_new_id = {}
         for entity_id, components in res.items():
             entity_id = int(entity_id)
-            entity = esper.create_entity()
+            entity = create_entity_with_id(entity_id)
             old_id_to_new_id[entity_id] = entity
             for class_name, component in components.items():
                 class_name = globals()[class_name]
@@ -296,6 +473,7 @@ def load_scene(path: Path):
                 if isinstance(component, Node):
                     component.entity_id = entity
                 esper.add_component(entity, component)
+                component.on_attach(entity)
 
         for entity, component_dict in esper._entities.items():
             for component_key, component in component_dict.items():
@@ -310,14 +488,24 @@ def load_scene(path: Path):
                 component = component_dict[component_key]
                 component.on_load(entity)
 
-        for entity, component in esper.get_component(Node):
-            component.refresh()
+        # in manifest order, which is the order of the children
+        for entity in old_id_to_new_id.values():
+            node = esper.try_component(entity, Node)
+            if node is not None:
+                node.refresh()
+
+        # measurements stay in the memory-mapped sidecar until a group is used
+        attach_sidecar(path, old_id_to_new_id, skip=unpacked)
+        if all(old == new for old, new in old_id_to_new_id.items()):
+            JOURNAL.open(path, num_records)
+        else:
+            # the journal refers to entities by id, so without stable ids every save is a full save
+            print("Entity ids changed on load, the scene journal is disabled")
+            JOURNAL.close()
 
         if not esper.get_component(CollectorData):
             create_collector(get_root_id())
     except Exception as e:
-        esper.clear_database()
-        esper.clear_cache()
         create_empty_scene()
         print(e)
         print("Failed to load scene")
@@ -369,17 +557,17 @@ def is_selected(entity_id) -> bool:
 
 def deselect_all():
     for entity_id, _ in esper.get_component(Selected):
-        esper.remove_component(entity_id, Selected)
+        remove_component(entity_id, Selected)
 
 
 def deselect(entity_id: int):
     if esper.has_component(entity_id, Selected):
-        esper.remove_component(entity_id, Selected)
+        remove_component(entity_id, Selected)
 
 
 def make_selected(entity_id):
     if not is_selected(entity_id):
-        esper.add_component(entity_id, Selected())
+        add_component(entity_id, Selected())
 
 
 def print_tree(node=None):
@@ -402,6 +590,8 @@ def get_relative_transform_X_TS(source_entity: int, target_entity: int) -> np.nd
 
 
 def rotate_around_x(X_BC_blender: np.ndarray) -> np.ndarray:
+    from scipy.spatial.transform import Rotation as R
+
     rot_x = R.from_rotvec([np.pi, 0, 0]).as_matrix()
     X_x = np.eye(4)
     X_x[:3, :3] = rot_x
@@ -21,12 +21,21 @@ class World(Component):
     def draw_context(self, nursery, entity_id):
         from waynon.components.scene_utils import (create_aruco_marker,
                                                    create_realsense_camera,
-                                                   create_robot)
+                                                   create_replay_camera,
+                                                   create_synthetic_camera,
+                                                   create_robot,
+                                                   create_urdf_robot)
 
         if imgui.menu_item_simple(f"{ICON_FA_ROBOT} Add Franka Robot"):
             create_robot(entity_id)
+        if imgui.menu_item_simple(f"{ICON_FA_ROBOT} Add URDF Robot"):
+            create_urdf_robot(entity_id)
         if imgui.menu_item_simple(f"{ICON_FA_CAMERA} Add Realsense Camera"):
             create_realsense_camera(entity_id)
+        if imgui.menu_item_simple(f"{ICON_FA_FILM} Add Replay Camera"):
+            create_replay_camera(entity_id)
+        if imgui.menu_item_simple(f"{ICON_FA_CUBE} Add Synthetic Camera"):
+            create_synthetic_camera(entity_id)
         if imgui.menu_item_simple(f"{ICON_FA_MARKER} Add Aruco Marker"):
             create_aruco_marker(entity_id)
 
@@ -0,0 +1,135 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+from typing import Optional
+
+import esper
+import numpy as np
+import trio
+
+from imgui_bundle import imgui
+from imgui_bundle import icons_fontawesome_6 as icons
+
+from waynon.components.simple import Component
+from waynon.processors.synthetic_camera import SYNTHETIC_CAMERAS
+from waynon.utils.utils import COLORS
+
+
+class SyntheticCamera(Component):
+    """Renders the scene's aruco markers from a ground truth camera pose.
+
+    `capture_truth` stores the current camera pose and every marker pose
+    (relative to its robot link, or to the world for static markers) as
+    ground truth. Rendering keeps using these even after a solve moves the
+    estimates, so the solution can be compared against them.
+    """
+
+    has_truth: bool = False
+    X_WC: list[float] = np.eye(4).flatten().tolist()
+    marker_truth: dict[int, list[float]] = {}
+    fps: float = 10.0
+    background: int = 128
+    blur_sigma: float = 0.0
+    noise_std: float = 0.0
+
+    def model_post_init(self, __context):
+        self._running = False
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def on_delete(self, entity_id):
+        self._running = False
+        SYNTHETIC_CAMERAS.stop_camera(entity_id)
+
+    def get_X_WC(self, entity_id: int) -> np.ndarray:
+        """Ground truth camera pose, or the current estimate if none was captured"""
+        from waynon.components.transform import Transform
+
+        if not self.has_truth:
+            return esper.component_for_entity(entity_id, Transform).get_X_WT()
+        return np.asarray(self.X_WC).reshape(4, 4)
+
+    def get_marker_truth(self, marker_entity_id: int) -> Optional[np.ndarray]:
+        if marker_entity_id not in self.marker_truth:
+            return None
+        return np.asarray(self.marker_truth[marker_entity_id]).reshape(4, 4)
+
+    def capture_truth(self, entity_id: int):
+        from waynon.components.aruco_marker import ArucoMarker
+        from waynon.components.robot import FrankaLink
+        from waynon.components.transform import Transform
+        from waynon.components.tree_utils import find_nearest_ancestor_with_component
+
+        self.X_WC = esper.component_for_entity(entity_id, Transform).get_X_WT().flatten().tolist()
+        self.has_truth = True
+        self.marker_truth = {}
+        for marker_id, (_, transform) in esper.get_components(ArucoMarker, Transform):
+            X_WM = transform.get_X_WT()
+            link_id = find_nearest_ancestor_with_component(marker_id, FrankaLink)
+            if link_id is not None:
+                X_WL = esper.component_for_entity(link_id, Transform).get_X_WT()
+                X_WM = np.linalg.inv(X_WL) @ X_WM
+            self.marker_truth[marker_id] = X_WM.flatten().tolist()
+
+    def camera_error(self, entity_id: int) -> tuple[float, float]:
+        """Translation (m) and rotation (deg) between the estimated and true camera pose"""
+        from waynon.components.transform import Transform
+
+        X_WC = esper.component_for_entity(entity_id, Transform).get_X_WT()
+        X_err = np.linalg.inv(self.get_X_WC(entity_id)) @ X_WC
+        translation = float(np.linalg.norm(X_err[:3, 3]))
+        cos = np.clip((np.trace(X_err[:3, :3]) - 1.0) / 2.0, -1.0, 1.0)
+        return translation, float(np.degrees(np.arccos(cos)))
+
+    def draw_context(self, nursery, entity_id):
+        if self._running:
+            if imgui.menu_item_simple(f"{icons.ICON_FA_STOP} Stop"):
+                self._running = False
+        else:
+            if imgui.menu_item_simple(f"{icons.ICON_FA_PLAY} Start"):
+                self._running = True
+
+    def draw_property(self, nursery: trio.Nursery, e: int):
+        imgui.separator_text("Synthetic Camera")
+        if not self._running:
+            imgui.push_style_color(imgui.Col_.button, COLORS["GREEN"])
+            if imgui.button("Start", (imgui.get_content_region_avail().x, 40)):
+                self._running = True
+            imgui.pop_style_color()
+        else:
+            imgui.push_style_color(imgui.Col_.button, COLORS["RED"])
+            if imgui.button("Stop", (imgui.get_content_region_avail().x, 40)):
+                self._running = False
+            imgui.pop_style_color()
+
+        imgui.push_style_color(imgui.Col_.button, COLORS["BLUE"])
+        if imgui.button("Capture Ground Truth", (imgui.get_content_region_avail().x, 20)):
+            self.capture_truth(e)
+        imgui.set_item_tooltip("Use the current camera and marker poses as ground truth")
+        imgui.pop_style_color()
+        imgui.spacing()
+
+        _, self.fps = imgui.slider_float("FPS", self.fps, 1.0, 60.0)
+        _, self.background = imgui.slider_int("Background", self.background, 0, 255)
+        _, self.blur_sigma = imgui.slider_float("Blur Sigma", self.blur_sigma, 0.0, 5.0)
+        _, self.noise_std = imgui.slider_float("Noise Std", self.noise_std, 0.0, 20.0)
+
+        if self.has_truth:
+            imgui.spacing()
+            translation, rotation = self.camera_error(e)
+            imgui.label_text("Translation Error", f"{translation * 1000.0:.2f} mm")
+            imgui.label_text("Rotation Error", f"{rotation:.3f} deg")
+
+    def _fix_on_load(self, old_to_new_entity_ids):
+        self.marker_truth = {
+            old_to_new_entity_ids[k]: v
+            for k, v in self.marker_truth.items()
+            if k in old_to_new_entity_ids
+        }
+
+    @staticmethod
+    def default_name():
+        return "Synthetic"
+
+    def property_order(self):
+        return 50
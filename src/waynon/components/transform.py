@@ -2,6 +2,7 @@
 
 import numpy as np
 import esper
+from pydantic import field_serializer
 
 from imgui_bundle import imgui
 
@@ -9,6 +10,243 @@ from waynon.components.component import Component
 from waynon.components.node import Node
 
 
+class TransformStore:
+    """Contiguous storage for the local and world matrices of every `Transform`.
+
+    Each transform owns a slot in (N, 4, 4) arrays. `parent` holds the slot of
+    the nearest transform ancestor (-1 for roots) and `levels` groups the slots
+    by depth, parents before children. `update` only recomputes dirty slots
+    and their descendants, one batched matmul per depth level.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.X_PT = np.tile(np.eye(4), (capacity, 1, 1))
+        self.X_WT = np.tile(np.eye(4), (capacity, 1, 1))
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.levels: list[np.ndarray] = []
+        self.version = 0  # bumped whenever slots are allocated or released
+        self.changed: set[int] = set()  # slots edited since the journal last looked, see `take_changed`
+        self._free: list[int] = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size - len(self._free)
+
+    def _grow(self):
+        capacity = 2 * len(self.X_PT)
+        n = len(self.X_PT)
+        self.X_PT = np.concatenate([self.X_PT, np.tile(np.eye(4), (capacity - n, 1, 1))])
+        self.X_WT = np.concatenate([self.X_WT, np.tile(np.eye(4), (capacity - n, 1, 1))])
+        self.parent = np.concatenate([self.parent, np.full(capacity - n, -1, dtype=np.int64)])
+        self.dirty = np.concatenate([self.dirty, np.zeros(capacity - n, dtype=bool)])
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - n, dtype=bool)])
+
+    def allocate(self, X_PT: np.ndarray) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self.X_PT):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        self.X_PT[slot] = X_PT
+        self.X_WT[slot] = X_PT
+        self.parent[slot] = -1
+        self.dirty[slot] = True
+        self.alive[slot] = True
+        self.version += 1
+        return slot
+
+    def release(self, slot: int):
+        if not self.alive[slot]:
+            return
+        self.alive[slot] = False
+        self.dirty[slot] = False
+        self.parent[slot] = -1
+        self.changed.discard(slot)
+        self._free.append(slot)
+        self.version += 1
+
+    def clear(self):
+        self.alive[:] = False
+        self.dirty[:] = False
+        self.parent[:] = -1
+        self.levels = []
+        self.changed = set()
+        self._free = []
+        self._size = 0
+        self.version += 1
+
+    def take_changed(self) -> set[int]:
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def set_hierarchy(self, order: list[int], parents: list[int]):
+        """`order` lists slots so that parents come before children, `parents`
+        the parent slot of each (-1 for roots). Live slots that are not listed
+        are treated as roots."""
+        self.parent[: self._size] = -1
+        depth = np.zeros(self._size, dtype=np.int64)
+        for slot, parent in zip(order, parents):
+            self.parent[slot] = parent
+            depth[slot] = depth[parent] + 1 if parent >= 0 else 0
+        listed = np.zeros(self._size, dtype=bool)
+        listed[order] = True
+        roots = np.flatnonzero(self.alive[: self._size] & ~listed)
+        slots = np.concatenate([np.asarray(order, dtype=np.int64), roots])
+        depths = depth[slots]
+        sorted_slots = slots[np.argsort(depths, kind="stable")]
+        boundaries = np.flatnonzero(np.diff(np.sort(depths))) + 1
+        self.levels = np.split(sorted_slots, boundaries) if len(slots) else []
+        # Parents may have changed, recompute everything once
+        self.dirty[slots] = True
+
+    def update(self):
+        if not self.dirty[: self._size].any():
+            return
+        for level in self.levels:
+            parent = self.parent[level]
+            has_parent = parent >= 0
+            safe_parent = np.where(has_parent, parent, 0)
+            dirty = self.dirty[level] | (has_parent & self.dirty[safe_parent])
+            self.dirty[level] = dirty
+            if not dirty.any():
+                continue
+            slots = level[dirty]
+            X_WP = self.X_WT[safe_parent[dirty]]
+            roots = ~has_parent[dirty]
+            X_WP[roots] = np.eye(4)
+            self.X_WT[slots] = X_WP @ self.X_PT[slots]
+        self.dirty[: self._size] = False
+
+
+TRANSFORM_STORE = TransformStore()
+
+
+class TransformIndex:
+    """Entities with a `Transform` and their nearest ancestor that has one.
+
+    Kept up to date by `create_entity`, `delete_entity`, `add_component`,
+    `remove_component` and the reparenting functions in tree_utils, so the transform hierarchy can be traversed
+    without visiting nodes that are not spatial (poses, measurements, ...).
+    `invalidate` forces a rebuild from the tree, e.g. after loading a scene.
+    """
+
+    def __init__(self):
+        self.parent: dict[int, int | None] = {}
+        self.children: dict[int | None, dict[int, None]] = {None: {}}
+        self.valid = False
+        self.version = 0
+
+    def invalidate(self):
+        self.valid = False
+        self.version += 1
+
+    def rebuild(self, root_id: int):
+        self.parent = {}
+        self.children = {None: {}}
+        for entity_id in self._top_transforms(root_id):
+            self._add_subtree(entity_id, None)
+        self.valid = True
+        self.version += 1
+
+    def _add_subtree(self, entity_id: int, parent_id: int | None):
+        self._link(entity_id, parent_id)
+        for child in esper.component_for_entity(entity_id, Node).children:
+            for top in self._top_transforms(child.entity_id):
+                self._add_subtree(top, entity_id)
+
+    def _top_transforms(self, entity_id: int) -> list[int]:
+        # Highest entities with a transform in the subtree of entity_id (itself included)
+        if entity_id in self.parent or esper.has_component(entity_id, Transform):
+            return [entity_id]
+        res = []
+        for child in esper.component_for_entity(entity_id, Node).children:
+            res.extend(self._top_transforms(child.entity_id))
+        return res
+
+    def _link(self, entity_id: int, parent_id: int | None):
+        self.parent[entity_id] = parent_id
+        self.children.setdefault(parent_id, {})[entity_id] = None
+        self.children.setdefault(entity_id, {})
+
+    def _unlink(self, entity_id: int):
+        parent_id = self.parent.pop(entity_id)
+        self.children.get(parent_id, {}).pop(entity_id, None)
+
+    def nearest_transform_ancestor(self, entity_id: int) -> int | None:
+        for node in reversed(esper.component_for_entity(entity_id, Node).ancestors):
+            if node.entity_id in self.parent:
+                return node.entity_id
+        return None
+
+    def add(self, entity_id: int):
+        """`entity_id` got a transform, the transforms below it now hang from it"""
+        if not self.valid:
+            return
+        parent_id = self.nearest_transform_ancestor(entity_id)
+        for child in esper.component_for_entity(entity_id, Node).children:
+            for top in self._top_transforms(child.entity_id):
+                self._unlink(top)
+                self._link(top, entity_id)
+        self._link(entity_id, parent_id)
+        self.version += 1
+
+    def remove(self, entity_id: int):
+        """`entity_id` lost its transform, the transforms below it move up to its parent"""
+        if not self.valid or entity_id not in self.parent:
+            return
+        parent_id = self.parent[entity_id]
+        for child in self.children.pop(entity_id, {}):
+            self._link(child, parent_id)
+        self._unlink(entity_id)
+        self.version += 1
+
+    def remove_subtree(self, entity_id: int):
+        """Forget every transform in the subtree of `entity_id`, before it is deleted"""
+        if not self.valid:
+            return
+        tops = self._top_transforms(entity_id)
+        for top in tops:
+            stack = [top]
+            while stack:
+                e = stack.pop()
+                stack.extend(self.children.pop(e, {}))
+                if e in self.parent:
+                    self._unlink(e)
+        if tops:
+            self.version += 1
+
+    def reparent_subtree(self, entity_id: int):
+        """The subtree of `entity_id` moved to a new parent"""
+        if not self.valid:
+            return
+        tops = self._top_transforms(entity_id)
+        if not tops:
+            return
+        parent_id = self.nearest_transform_ancestor(entity_id)
+        for top in tops:
+            self._unlink(top)
+            self._link(top, parent_id)
+        self.version += 1
+
+    def hierarchy(self) -> tuple[list[int], list[int | None]]:
+        """Transform entities, parents first, and the transform parent of each"""
+        order, parents = [], []
+        stack = [(e, None) for e in self.children[None]]
+        while stack:
+            entity_id, parent_id = stack.pop()
+            order.append(entity_id)
+            parents.append(parent_id)
+            stack.extend((c, entity_id) for c in self.children.get(entity_id, {}))
+        return order, parents
+
+
+TRANSFORM_INDEX = TransformIndex()
+
+
 class Transform(Component):
     X_PT: list[float] = [
         1.0,
@@ -33,37 +271,54 @@ class Transform(Component):
     modifiable: bool = True
 
     def model_post_init(self, __context):
-        self._X_WT = [
-            1.0,
-            0.0,
-            0.0,
-            0.0,
-            0.0,
-            1.0,
-            0.0,
-            0.0,
-            0.0,
-            0.0,
-            1.0,
-            0.0,
-            0.0,
-            0.0,
-            0.0,
-            1.0,
-        ]
-        self._dirty = True
-        self._parent_id: int = -1
+        # While attached to an entity the matrices live in TRANSFORM_STORE and
+        # X_PT is only used to (de)serialize. Temporary copies never get a slot.
+        self._slot = -1
         return super().model_post_init(__context)
 
+    @field_serializer("X_PT")
+    def serialize_X_PT(self, X_PT: list[float]):
+        return self.get_X_PT().flatten().tolist()
+
+    def on_attach(self, entity_id):
+        super().on_attach(entity_id)
+        if self._slot < 0:
+            self._slot = TRANSFORM_STORE.allocate(np.asarray(self.X_PT, dtype=np.float64).reshape(4, 4))
+
+    def release(self):
+        if self._slot < 0:
+            return
+        self.X_PT = self.get_X_PT().flatten().tolist()
+        TRANSFORM_STORE.release(self._slot)
+        self._slot = -1
+
+    def on_delete(self, entity_id):
+        self.release()
+
+    def is_dirty(self) -> bool:
+        return self._slot >= 0 and bool(TRANSFORM_STORE.dirty[self._slot])
+
     def get_X_PT(self) -> np.ndarray:
-        return np.asarray(self.X_PT).reshape(4, 4)
+        if self._slot < 0:
+            return np.asarray(self.X_PT, dtype=np.float64).reshape(4, 4)
+        return TRANSFORM_STORE.X_PT[self._slot].copy()
 
-    def set_X_PT(self, X_PT: np.ndarray):
-        self.X_PT = X_PT.flatten().tolist()
-        self._dirty = True
+    def set_X_PT(self, X_PT: np.ndarray, journal: bool = True):
+        """`journal=False` for poses that are derived every frame, e.g. robot links"""
+        if self._slot < 0:
+            self.X_PT = np.asarray(X_PT, dtype=np.float64).flatten().tolist()
+            return
+        if np.array_equal(TRANSFORM_STORE.X_PT[self._slot], X_PT):
+            return  # e.g. links of an idle robot, keep the subtree clean
+        TRANSFORM_STORE.X_PT[self._slot] = X_PT
+        TRANSFORM_STORE.dirty[self._slot] = True
+        if journal:
+            TRANSFORM_STORE.changed.add(self._slot)
 
     def get_X_WT(self) -> np.ndarray:
-        return np.asarray(self._X_WT).reshape(4, 4)
+        if self._slot < 0:
+            return self.get_X_PT()
+        return TRANSFORM_STORE.X_WT[self._slot].copy()
 
     def set_X_WT(self, X_WT: np.ndarray):
         X_WP = self.get_parent_X_WT()
@@ -72,11 +327,12 @@ class Transform(Component):
         self.set_X_PT(X_PT)
 
     def get_parent_X_WT(self) -> np.ndarray:
-        if self._parent_id == -1:
-            return np.eye(4, dtype=np.float32)
-        assert esper.has_component(self._parent_id, Transform)
-        transform = esper.component_for_entity(self._parent_id, Transform)
-        return transform.get_X_WT()
+        if self._slot < 0:
+            return np.eye(4)
+        parent = TRANSFORM_STORE.parent[self._slot]
+        if parent == -1:
+            return np.eye(4)
+        return TRANSFORM_STORE.X_WT[parent].copy()
 
     def property_order(self):
         return 600
@@ -5,7 +5,10 @@ from typing import Type, TypeVar
 
 import esper
 
-from .node import Node
+from .journal import JOURNAL
+from .node import Node, _bump_tree_version, tree_version
+from .transform import TRANSFORM_INDEX, Transform
+from waynon.utils.esper_compat import add_components_deferred
 
 T = TypeVar("T")
 
@@ -20,6 +23,8 @@ def find_child_with_component(
     predicate: Callable[[int, T], bool] | None = None,
 ) -> int | None:
     node = get_node(entity_id)
+    if not node.subtree_has(component_type):
+        return None
     for child in node.children:
         if esper.has_component(child.entity_id, component_type):
             component = esper.component_for_entity(child.entity_id, component_type)
@@ -28,17 +33,25 @@ def find_child_with_component(
     return None
 
 
+def _descendants_with_component(node: Node, component_type: Type[T]):
+    # Preorder like node.descendants, but only enters subtrees that have the type
+    for child in node.children:
+        if not child.subtree_has(component_type):
+            continue
+        if esper.has_component(child.entity_id, component_type):
+            yield child.entity_id, esper.component_for_entity(child.entity_id, component_type)
+        yield from _descendants_with_component(child, component_type)
+
+
 def find_descendant_with_component(
     entity_id,
     component_type: Type[T],
     predicate: Callable[[int, T], bool] | None = None,
 ) -> int | None:
     node = get_node(entity_id)
-    for child in node.descendants:
-        if esper.has_component(child.entity_id, component_type):
-            component = esper.component_for_entity(child.entity_id, component)
-            if predicate is None or predicate(child.entity_id, component):
-                return child.entity_id
+    for child_id, component in _descendants_with_component(node, component_type):
+        if predicate is None or predicate(child_id, component):
+            return child_id
     return None
 
 
@@ -49,6 +62,8 @@ def find_children_with_component(
 ) -> list[int]:
     node = get_node(entity_id)
     children = []
+    if not node.subtree_has(component_type):
+        return children
     for child in node.children:
         if esper.has_component(child.entity_id, component_type):
             component = esper.component_for_entity(child.entity_id, component_type)
@@ -64,54 +79,123 @@ def find_descendants_with_component(
 ) -> list[int]:
     node = get_node(entity_id)
     children = []
-    for child in node.descendants:
-        if esper.has_component(child.entity_id, component_type):
-            component = esper.component_for_entity(child.entity_id, component_type)
-            if predicate is None or predicate(child.entity_id, component):
-                children.append(child.entity_id)
+    for child_id, component in _descendants_with_component(node, component_type):
+        if predicate is None or predicate(child_id, component):
+            children.append(child_id)
     return children
 
 
+_ancestor_cache: dict[tuple[int, type], int | None] = {}
+_ancestor_cache_version = None
+
+
 def find_nearest_ancestor_with_component(
     entity_id: int,
     component_type: Type[T],
     predicate: Callable[[int, T], bool] | None = None,
 ) -> int | None:
+    global _ancestor_cache_version
+    # Memoized while the tree keeps its shape; predicates are not cached
+    if predicate is None:
+        if _ancestor_cache_version != tree_version():
+            _ancestor_cache.clear()
+            _ancestor_cache_version = tree_version()
+        key = (entity_id, component_type)
+        if key in _ancestor_cache:
+            res = _ancestor_cache[key]
+            if res is None or esper.has_component(res, component_type):
+                return res
+
     node = get_node(entity_id)
+    res = None
     for parent_node in node.ancestors:
         if esper.has_component(parent_node.entity_id, component_type):
             component = esper.component_for_entity(
                 parent_node.entity_id, component_type
             )
             if predicate is None or predicate(parent_node.entity_id, component):
-                return parent_node.entity_id
-    return None
+                res = parent_node.entity_id
+                break
+    if predicate is None:
+        _ancestor_cache[(entity_id, component_type)] = res
+    return res
+
+
+def add_component(entity_id: int, component):
+    """esper.add_component that keeps the subtree component index up to date"""
+    esper.add_component(entity_id, component)
+    component.on_attach(entity_id)
+    if esper.has_component(entity_id, Node):
+        get_node(entity_id)._change_own_type(type(component), added=True)
+        if isinstance(component, Transform):
+            TRANSFORM_INDEX.add(entity_id)
+    _bump_tree_version()
+    JOURNAL.mark(entity_id)
+
+
+def remove_component(entity_id: int, component_type: type):
+    component = esper.remove_component(entity_id, component_type)
+    component.on_delete(entity_id)
+    if esper.has_component(entity_id, Node):
+        get_node(entity_id)._change_own_type(component_type, added=False)
+        if issubclass(component_type, Transform):
+            TRANSFORM_INDEX.remove(entity_id)
+    _bump_tree_version()
+    JOURNAL.mark(entity_id)
 
 
 def delete_entity(entity_id, predicate: Callable[[int, Node], bool] | None = None):
+    if predicate is None:
+        delete_entities([entity_id])
+        return
+    TRANSFORM_INDEX.remove_subtree(entity_id)
+    _delete_subtree(entity_id, predicate)
+
+
+def _delete_subtree(entity_id, predicate: Callable[[int, Node], bool] | None = None):
     node = get_node(entity_id)
     node.parent = None
     for child_node in node.children:
         if predicate is None or predicate(child_node.entity_id, child_node):
-            delete_entity(child_node.entity_id)
+            _delete_subtree(child_node.entity_id)
+    _on_delete(entity_id)
     esper.delete_entity(entity_id)
 
 
+def _on_delete(entity_id: int):
+    for component in esper.components_for_entity(entity_id):
+        component.on_delete(entity_id)
+    JOURNAL.mark(entity_id)
+
+
 def delete_children(entity_id, predicate: Callable[[int, Node], bool] | None = None):
     node = get_node(entity_id)
+    if predicate is None:
+        delete_entities([child_node.entity_id for child_node in node.children])
+        return
     for child_node in node.children:
         delete_entity(child_node.entity_id, predicate)
 
+
+def delete_entities(entity_ids: list[int]):
+    """Delete the subtrees of `entity_ids`, sharing one tree update per subtree"""
+    with EntityBatch() as batch:
+        for entity_id in entity_ids:
+            batch.delete_entity(entity_id)
+
 def sort_children(entity_id, predicate: Callable[[int, Node], bool] | None = None):
     node = get_node(entity_id)
     children = list(node.children)
     children.sort(key=lambda child: child.name)
     node.children = tuple(children)
+    JOURNAL.reorder(entity_id)
 
 
 def parent_entity_to(entity_id: int, parent_id: int):
     node = get_node(entity_id)
     node.parent_id = parent_id
+    TRANSFORM_INDEX.reparent_subtree(entity_id)
+    JOURNAL.mark(entity_id)
     # make first child
     move_entity_over(entity_id, node.parent.children[0].entity_id)
 
@@ -125,6 +209,8 @@ def move_entity_over(moving_entity_id, target_entity_id):
     # if parents are different, we need to update both
     if moving_node.parent != target_node.parent:
         moving_node.parent_id = target_node.parent_id
+        TRANSFORM_INDEX.reparent_subtree(moving_entity_id)
+        JOURNAL.mark(moving_entity_id)
 
     source_position_in_parent = moving_node.parent.children.index(moving_node)
     new_children = list(moving_node.parent.children)
@@ -132,6 +218,7 @@ def move_entity_over(moving_entity_id, target_entity_id):
     target_position_in_parent = target_node.parent.children.index(target_node)
     new_children.insert(target_position_in_parent, moving_node)
     moving_node.parent.children = tuple(new_children)
+    JOURNAL.reorder(moving_node.parent_id)
 
 
 def get_components(
@@ -149,13 +236,111 @@ def get_components(
 
 
 def create_entity(name: str, parent_id: int, *components):
+    if EntityBatch.active is not None:
+        return EntityBatch.active.create_entity(name, parent_id, *components)
     id = esper.create_entity(*components)
+    for component in components:
+        component.on_attach(id)
     node = Node(name=name, parent_entity_id=parent_id, entity_id=id)
     node.refresh()
     esper.add_component(id, node)
+    node.on_attach(id)
+    if any(isinstance(c, Transform) for c in components):
+        TRANSFORM_INDEX.add(id)
+    JOURNAL.mark(id)
     return id, node
 
 
+class EntityBatch:
+    """Create and delete many entities with one esper cache clear.
+
+    Usage:
+        with EntityBatch() as batch:
+            id, _ = batch.create_entity("Measurement", parent_id, Measurement())
+            batch.create_entity("Joints", id, JointMeasurement(...))
+            batch.delete_entity(old_id)
+
+    Components are registered with esper right away but the cache is only
+    cleared when the batch ends, so `esper.get_component(s)` does not see new
+    entities before that. New nodes are linked to their parents and indexed
+    when the batch ends: subtrees built inside the batch are attached to the
+    scene once, and deleted subtrees are detached once instead of node by node.
+
+    If the block raises, the created entities are removed again and the
+    queued deletions are dropped. Nested batches join the outer one, and
+    `create_entity` / `delete_entities` use the active batch.
+    """
+
+    active: "EntityBatch | None" = None
+
+    def __init__(self):
+        self._outer = None
+        self._created: list[tuple[int, Node, bool]] = []
+        self._deleted: list[int] = []
+
+    def __enter__(self):
+        if EntityBatch.active is not None:
+            self._outer = EntityBatch.active
+            return self._outer
+        EntityBatch.active = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._outer is not None:
+            return False
+        EntityBatch.active = None
+        if exc_type is None:
+            self._commit()
+        else:
+            self._rollback()
+        return False
+
+    def create_entity(self, name: str, parent_id: int, *components):
+        # no components, so esper does not clear its cache
+        id = esper.create_entity()
+        node = Node(name=name, parent_entity_id=parent_id, entity_id=id)
+        add_components_deferred(id, *components, node)
+        for component in (*components, node):
+            component.on_attach(id)
+        has_transform = any(isinstance(c, Transform) for c in components)
+        self._created.append((id, node, has_transform))
+        return id, node
+
+    def delete_entity(self, entity_id: int):
+        self._deleted.append(entity_id)
+
+    def _commit(self):
+        created = {id for id, _, _ in self._created}
+        # build the new subtrees first, then hang each of them into the scene
+        for id, node, _ in self._created:
+            if node.parent_entity_id in created:
+                node.refresh()
+        for id, node, _ in self._created:
+            if node.parent_entity_id not in created:
+                node.refresh()
+        for id, node, has_transform in self._created:
+            if has_transform:
+                TRANSFORM_INDEX.add(id)
+            JOURNAL.mark(id)
+
+        for entity_id in self._deleted:
+            if not esper.entity_exists(entity_id):
+                continue  # already deleted with an ancestor
+            TRANSFORM_INDEX.remove_subtree(entity_id)
+            node = get_node(entity_id)
+            node.parent = None
+            for subtree_node in (node, *node.descendants):
+                _on_delete(subtree_node.entity_id)
+                esper.delete_entity(subtree_node.entity_id)
+        esper.clear_cache()
+
+    def _rollback(self):
+        for id, node, _ in reversed(self._created):
+            _on_delete(id)
+            esper.delete_entity(id, immediate=True)
+        esper.clear_cache()
+
+
 def component_for_entity_with_instance(
     entity_id: int, component_type: Type[T]
 ) -> T | None:
@@ -1,7 +1,6 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
 from typing import Tuple
-import cv2.aruco as aruco
 import numpy as np
 import esper
 import trio
@@ -14,12 +13,10 @@ from .measurement_processor import MeasurementProcessor
 class ArucoProcessor(MeasurementProcessor):
     async def run(self, detector_id: int, measurement_id: int):
         from waynon.components.aruco_detector import ArucoDetector
-        from waynon.components.aruco_measurement import ArucoMeasurement
         from waynon.components.measurement import Measurement
         from waynon.components.image_measurement import ImageMeasurement
         from waynon.components.joint_measurement import JointMeasurement
         from waynon.components.aruco_marker import ArucoMarker
-        from waynon.components.simple import Deletable
 
         assert esper.entity_exists(detector_id)
         assert esper.entity_exists(measurement_id)
@@ -30,8 +27,6 @@ class ArucoProcessor(MeasurementProcessor):
         iid = find_child_with_component(measurement_id, ImageMeasurement)
         assert iid is not None, "Measurement must have an ImageMeasurement"
 
-        delete_children(iid, lambda id, c: isinstance(c, ArucoMeasurement))
-
         detector = esper.component_for_entity(detector_id, ArucoDetector)
         image_measurement = esper.component_for_entity(iid, ImageMeasurement)
 
@@ -42,6 +37,7 @@ class ArucoProcessor(MeasurementProcessor):
         for marker_entity_id, marker in esper.get_component(ArucoMarker):
             markers_in_system[marker.id] = marker_entity_id
 
+        detections = []
         if res:
             pixels, ids_found = res
             if ids_found is not None:
@@ -55,18 +51,20 @@ class ArucoProcessor(MeasurementProcessor):
                     if num_repeats != 1:
                         print(f"Warning: Found {num_repeats} markers with id {marker_id}")
                     for j in range(num_repeats):
-                        aruco_measurement = ArucoMeasurement(
-                            camera_entity_id=image_measurement.camera_id,
-                            marker_entity_id=marker_entity_id,
-                            detector_entity_id=detector_id,
-                            marker_id=marker_id,
-                            marker_dict=detector.marker_dict,
-                            pixels=pixels[i][j].tolist(),
+                        detections.append(
+                            dict(
+                                camera_entity_id=image_measurement.camera_id,
+                                marker_entity_id=marker_entity_id,
+                                detector_entity_id=detector_id,
+                                marker_id=marker_id,
+                                marker_dict=detector.marker_dict,
+                                pixels=pixels[i][j],
+                            )
                         )
-                        create_entity(f"Aruco {marker_id}", iid, aruco_measurement, Deletable())
-
+        # the detections are rows owned by the image, replaced in one go
+        image_measurement.set_aruco_detections(detections)
 
-def detect_all_markers_in_image(img: np.ndarray, marker_dict = aruco.DICT_4X4_50) -> Tuple[np.ndarray, np.ndarray]:   
+def detect_all_markers_in_image(img: np.ndarray, marker_dict = 0) -> Tuple[np.ndarray, np.ndarray]:   
     """
     Example Return:
     ((array([[[459., 160.],
@@ -74,6 +72,8 @@ def detect_all_markers_in_image(img: np.ndarray, marker_dict = aruco.DICT_4X4_50
         [622., 320.],
         [471., 318.]]], dtype=float32),), array([[3]], dtype=int32))
     """
+    import cv2.aruco as aruco
+
     assert img.dtype == np.uint8
 
     aruco_dict = aruco.getPredefinedDictionary(marker_dict)
@@ -1,9 +1,13 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
+import os
+import time
 from pathlib import Path
 from typing import Optional
 import logging
 
+STARTUP_TIME = time.perf_counter()  # before the heavy imports below, see benchmarks/startup.py
+
 import esper
 import imgui_bundle.immapp.icons_fontawesome_6 as font_awesome
 import marsoom
@@ -15,10 +19,14 @@ from imgui_bundle import portable_file_dialogs as pfd
 from pydantic import BaseModel
 
 from waynon.components.camera import PinholeCamera
-from waynon.components.scene_utils import create_empty_scene, load_scene, save_scene, export_calibration
+from waynon.components.journal import JOURNAL
+from waynon.components.scene_utils import create_empty_scene, load_scene_async, save_scene, export_calibration
+from waynon.processors.frame_ingest import FRAME_INGEST
 from waynon.processors.realsense_manager import REALSENSE_MANAGER
+from waynon.processors.replay_manager import REPLAY_MANAGER
 from waynon.processors.render import RenderProcessor
 from waynon.processors.robot import RobotProcessor
+from waynon.processors.synthetic_camera import SyntheticCameraProcessor
 from waynon.processors.transforms import TransformProcessor
 from waynon.viewmodels.property_viewer import PropertyViewModel
 from waynon.viewmodels.scene_viewmodel import SceneViewModel
@@ -67,10 +75,12 @@ class Window(marsoom.Window):
 
         create_empty_scene()
         if settings.path:
-            load_scene(self.settings.path)
+            # the window shows the empty scene until the manifest is parsed
+            self.nursery.start_soon(load_scene_async, self.settings.path)
 
         esper.add_processor(RobotProcessor())
         esper.add_processor(TransformProcessor())
+        esper.add_processor(SyntheticCameraProcessor())
         esper.add_processor(RenderProcessor())
         # esper.add_processor(REALSENSE_MANAGER)
 
@@ -123,7 +133,10 @@ class Window(marsoom.Window):
 
 
     def _save_scene(self):
-        if self.settings.path is not None and self.settings.path.exists():
+        if JOURNAL.path is not None:
+            # only the changes since the last save, the journal is compacted in the background
+            JOURNAL.flush()
+        elif self.settings.path is not None and self.settings.path.exists():
             save_scene(self.settings.path)
         else:
             default_path = Path.cwd()
@@ -183,7 +196,7 @@ class Window(marsoom.Window):
             result = self._open_dialog.result()
             if result:
                 path = Path(result)
-                load_scene(path)
+                self.nursery.start_soon(load_scene_async, path)
                 self.settings.path = path
                 self.settings.save()
                 self._open_dialog = None
@@ -208,24 +221,42 @@ async def main_async():
 
 
     async def camera_loop():
-        async for _ in periodic(1/30):
+        while True:
+            await FRAME_INGEST.wait()
             REALSENSE_MANAGER.process()
+            REPLAY_MANAGER.process()
 
     
     async def render_loop(window: marsoom.Window):
+        first_frame = True
         async for _ in periodic(1/60):
             if window.should_exit():
                 break
             esper.process()
             window.step()
+            if first_frame:
+                first_frame = False
+                print(f"First frame after {time.perf_counter() - STARTUP_TIME:.3f} s")
+                if os.environ.get("WAYNON_EXIT_AFTER_FIRST_FRAME"):
+                    break
+
+    async def autosave_loop():
+        async for _ in periodic(1.0):
+            await JOURNAL.flush_async()
+            if JOURNAL.needs_compaction():
+                JOURNAL.compact()
 
     async with trio.open_nursery() as nursery:
         window = Window(nursery, settings=settings)
         nursery.start_soon(camera_loop)
+        nursery.start_soon(autosave_loop)
         await render_loop(window)
         nursery.cancel_scope.cancel()
+    # a full save, so changes that were never journaled are not lost either
+    JOURNAL.compact()
 
     REALSENSE_MANAGER.stop_all_cameras_sync()
+    REPLAY_MANAGER.stop_all_cameras_sync()
 
     settings.save()
 
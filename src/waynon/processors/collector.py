@@ -1,9 +1,10 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
+import time
+from pathlib import Path
 from typing import Tuple
 import numpy as np
 
-from PIL import Image
 import esper
 import trio
 
@@ -18,9 +19,9 @@ from waynon.components.collector import CollectorData, MeasurementGroup, DataNod
 from waynon.components.measurement import Measurement
 from waynon.components.image_measurement import ImageMeasurement
 from waynon.components.joint_measurement import JointMeasurement
-from waynon.components.aruco_measurement import ArucoMeasurement
 from waynon.components.transform import Transform
-from waynon.solvers.factor_graph import *
+from waynon.processors.frame_ingest import FRAME_INGEST, capture_timestamp, select_synchronized
+from waynon.utils.image_store import IMAGE_STORE
 
 class Collector:
     _instance = None
@@ -40,6 +41,7 @@ class Collector:
     
 
     async def run_detectors(self, collector_id: int):
+        from waynon.components.measurement_store import materialize_measurements
         from waynon.components.scene_utils import get_detectors
         from waynon.components.simple import Detector
 
@@ -48,6 +50,8 @@ class Collector:
         detectors_ids = get_detectors(collector_id, predicate=lambda id, c: c.enabled)
         print(detectors_ids)
 
+        materialize_measurements()
+
         # get data node
         data_node_id = find_child_with_component(collector_id, DataNode)
         measurement_group_ids = find_children_with_component(data_node_id, MeasurementGroup)
@@ -63,6 +67,57 @@ class Collector:
                 await trio.sleep(0.0)
             await trio.sleep(0.0)
 
+    async def snapshot(
+        self,
+        cameras: list[tuple[int, PinholeCamera]],
+        t_settled: float,
+        timeout: float = 2.0,
+    ) -> tuple[dict[int, tuple[np.ndarray, float | None]], float | None]:
+        """One image per camera, all captured after `t_settled` and as close in time as possible.
+
+        Returns a copy of each image with its capture time, and the skew between
+        the earliest and latest capture. Cameras that are not fed by the frame
+        ingest (or have no new frame before `timeout`) use their current image.
+        """
+        streamed = {}
+        for cam_id, _ in cameras:
+            key = PinholeCamera.frame_key(cam_id)
+            if key is not None and key in FRAME_INGEST.slots:
+                streamed[cam_id] = key
+
+        candidates = {}
+        with trio.move_on_after(timeout):
+            while True:
+                candidates = {
+                    cam_id: FRAME_INGEST.frames_since(key, t_settled)
+                    for cam_id, key in streamed.items()
+                }
+                if all(candidates.values()):
+                    break
+                await trio.sleep(0.005)
+
+        candidates = {cam_id: frames for cam_id, frames in candidates.items() if frames}
+        skew = None
+        frames = {}
+        if candidates:
+            frames, skew = select_synchronized(candidates)
+
+        res = {}
+        for cam_id, cam in cameras:
+            if cam_id in frames:
+                frame = frames[cam_id]
+                # Frames live in recycled buffers, copy before yielding to the event loop
+                res[cam_id] = (frame["color"].copy(), capture_timestamp(frame))
+            else:
+                if cam_id in streamed:
+                    print(f"Camera {cam_id} has no frame after settling, using its last image")
+                image = cam.get_image_u()
+                if image is None:
+                    print(f"Camera {cam_id} has no image")
+                    continue
+                res[cam_id] = (image, None)
+        return res, skew
+
     async def collect(self, collector_id: int):
         from waynon.components.scene_utils import create_measurement
         from waynon.components.scene_utils import DATA_PATH
@@ -75,7 +130,7 @@ class Collector:
         for entity, c in esper.get_component(PinholeCamera):
             if entity in data.camera_blacklist:
                 continue
-            if c.get_image_u() is None:
+            if not c.has_image():
                 print(f"Camera {entity} has no image")
                 return
             cameras.append((entity, c))
@@ -116,34 +171,206 @@ class Collector:
                 print("Robot not ready to move")
                 return
 
+            if data.flying:
+                await self.collect_flying(
+                    data,
+                    cameras,
+                    [pose.q for pose in poses],
+                    robot_id,
+                    robot_manager,
+                    group_node.name,
+                    measurement_group_id,
+                )
+                continue
+
             for pose_id, pose in zip(pose_ids, poses):
                 q = pose.q
                 print(f"Moving to {q}")
                 await robot_manager.move_to(q)
                 await trio.sleep(0.3)
+                t_settled = time.time()
                 q = robot_manager.read_q().tolist()
-                for k, (cam_id, cam) in enumerate(cameras):
-                    # each one of these is one measurement
-                    camera_node = get_node(cam_id)
-                    image = cam.get_image_u()
-                    print(f"Saving image for {cam_id}")
-                    image_name = f"{camera_node.name}_{pose_id}.png"
-                    image_path = image_dir / image_name
-                    image = Image.fromarray(image)
-                    await trio.to_thread.run_sync(
-                        image.save, image_path # This takes a while
-                    )
-                    measurement_name = f"{camera_node.name} {pose_id}"
-
-                    joint_measurement = JointMeasurement(robot_id=robot_id, joint_values=q)
-                    image_measurement = ImageMeasurement(
-                        camera_id=cam_id, 
-                        image_path=f"{group_node.name}/images/{image_name}"
-                        )
-
-                    create_measurement(measurement_name,
-                                    measurement_group_id,
-                                    joint_measurement,
-                                    image_measurement)
-                    await trio.sleep(0.0) # give back control to the event loop
+                images, skew = await self.snapshot(cameras, t_settled)
+                if skew is not None:
+                    print(f"Camera skew {skew * 1000.0:.1f} ms")
+
+                digests = {}
+                async with trio.open_nursery() as nursery:
+                    for cam_id, (image, _) in images.items():
+                        camera_node = get_node(cam_id)
+                        image_path = image_dir / f"{camera_node.name}_{pose_id}.png"
+                        print(f"Saving image for {cam_id}")
+                        nursery.start_soon(store_image, digests, cam_id, image, image_path)  # This takes a while
+
+                with EntityBatch():
+                    for cam_id, (image, timestamp) in images.items():
+                        # each one of these is one measurement
+                        camera_node = get_node(cam_id)
+                        image_name = f"{camera_node.name}_{pose_id}.png"
+                        measurement_name = f"{camera_node.name} {pose_id}"
+
+                        # Joint values when this frame was captured, if the joint log has them
+                        q_frame = robot_manager.q_at(timestamp) if timestamp is not None else None
+                        joint_values = q_frame.tolist() if q_frame is not None else q
+                        joint_measurement = JointMeasurement(robot_id=robot_id, joint_values=joint_values)
+                        image_measurement = ImageMeasurement(
+                            camera_id=cam_id, 
+                            image_path=f"{group_node.name}/images/{image_name}",
+                            image_hash=digests[cam_id],
+                            capture_timestamp=timestamp,
+                            sync_skew=skew,
+                            )
+
+                        create_measurement(measurement_name,
+                                        measurement_group_id,
+                                        joint_measurement,
+                                        image_measurement)
+                await trio.sleep(0.0) # give back control to the event loop
+
+    async def collect_flying(
+        self,
+        data: CollectorData,
+        cameras: list[tuple[int, PinholeCamera]],
+        qs: list[list[float]],
+        robot_id: int,
+        robot_manager,
+        group_name: str,
+        measurement_group_id: int,
+    ):
+        """Move through `qs` without stopping and keep frames from the cameras on the way.
+
+        Every frame is tagged with the joint values interpolated from the joint
+        log at its capture time. Frames taken while any joint moves faster than
+        `data.max_joint_velocity`, or blurrier than `data.min_sharpness`, are
+        dropped, and each camera keeps at most one frame per `data.frame_interval`.
+        """
+        from waynon.components.scene_utils import create_measurement
+        from waynon.components.scene_utils import DATA_PATH
+
+        if not qs:
+            return
+        if robot_manager.joint_log is None:
+            print("Continuous capture needs a connected robot that logs its joint states")
+            return
+
+        streamed = {}
+        for cam_id, _ in cameras:
+            key = PinholeCamera.frame_key(cam_id)
+            if key is None or key not in FRAME_INGEST.slots:
+                print(f"Camera {cam_id} is not streaming, skipping it for continuous capture")
+                continue
+            streamed[cam_id] = key
+        if not streamed:
+            print("No streaming cameras")
+            return
+
+        cruise = robot_manager.cruise_velocity()
+        if cruise is not None and np.max(cruise) > data.max_joint_velocity:
+            print(
+                f"The robot cruises at up to {np.max(cruise):.3f} rad/s, above Max Joint Velocity "
+                f"({data.max_joint_velocity:.3f} rad/s): most frames will be dropped, lower the speed factor"
+            )
+
+        print(f"Moving to the start of {group_name}")
+        await robot_manager.move_to(qs[0])
+        await trio.sleep(0.3)
+
+        joint_log = robot_manager.joint_log
+        last_seen = {cam_id: time.time() for cam_id in streamed}
+        last_kept = {cam_id: -np.inf for cam_id in streamed}
+        pending: list[tuple[int, np.ndarray, float]] = []
+        kept: list[tuple[int, np.ndarray, float, np.ndarray]] = []
+        done = trio.Event()
+
+        def grab():
+            for cam_id, key in streamed.items():
+                for frame in FRAME_INGEST.frames_since(key, last_seen[cam_id]):
+                    t = capture_timestamp(frame)
+                    if t <= last_seen[cam_id]:
+                        continue
+                    last_seen[cam_id] = t
+                    if t - last_kept[cam_id] < data.frame_interval:
+                        continue
+                    # Frames live in recycled buffers, copy before yielding to the event loop
+                    pending.append((cam_id, frame["color"].copy(), t))
+
+            still_pending = []
+            for cam_id, image, t in pending:
+                if t - last_kept[cam_id] < data.frame_interval:
+                    continue
+                velocity = joint_log.velocity(t)
+                if velocity is None:
+                    # The joint log has not caught up with this frame yet
+                    still_pending.append((cam_id, image, t))
+                    continue
+                if np.max(np.abs(velocity)) > data.max_joint_velocity:
+                    continue
+                if data.min_sharpness > 0.0 and image_sharpness(image) < data.min_sharpness:
+                    continue
+                q = joint_log.interpolate(t)
+                if q is None:
+                    continue
+                last_kept[cam_id] = t
+                kept.append((cam_id, image, t, q))
+            pending[:] = still_pending
+
+        async def record():
+            while not done.is_set():
+                grab()
+                await trio.sleep(0.005)
+            # Let the last frames and joint states arrive before the final pass
+            await trio.sleep(0.1)
+            grab()
+
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(record)
+            print(f"Flying through {len(qs)} poses")
+            await robot_manager.move_through(qs[1:])
+            done.set()
+
+        print(f"Kept {len(kept)} frames")
+        image_dir = DATA_PATH / group_name / "images"
+        names = []
+        digests = {}
+        async with trio.open_nursery() as nursery:
+            for k, (cam_id, image, t, q) in enumerate(kept):
+                camera_node = get_node(cam_id)
+                image_name = f"{camera_node.name}_flying_{k}.png"
+                names.append((image_name, f"{camera_node.name} flying {k}"))
+                nursery.start_soon(store_image, digests, k, image, image_dir / image_name)
+
+        with EntityBatch():
+            for k, ((cam_id, image, t, q), (image_name, measurement_name)) in enumerate(zip(kept, names)):
+                joint_measurement = JointMeasurement(robot_id=robot_id, joint_values=q.tolist())
+                image_measurement = ImageMeasurement(
+                    camera_id=cam_id,
+                    image_path=f"{group_name}/images/{image_name}",
+                    image_hash=digests[k],
+                    capture_timestamp=t,
+                )
+                create_measurement(measurement_name,
+                                measurement_group_id,
+                                joint_measurement,
+                                image_measurement)
+
+
+async def store_image(digests: dict, key, image: np.ndarray, image_path: Path):
+    """Put the image in the image store on a worker thread, its hash goes to `digests[key]`.
+
+    `image_path` in the scene data folder only gets a file if the store links images into scenes.
+    """
+    def put():
+        digest = IMAGE_STORE.put_image(image)
+        IMAGE_STORE.materialize(digest, image_path)
+        return digest
+
+    digests[key] = await trio.to_thread.run_sync(put)
+
+
+def image_sharpness(image: np.ndarray) -> float:
+    """Variance of the Laplacian, low for blurry images"""
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
 
@@ -0,0 +1,230 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import trio
+
+
+class FrameSlot:
+    """Holds the most recent frames produced by one camera.
+
+    Producers call `put` from any thread. The consumer calls `take`, which only
+    returns a frame once per `put`, so cameras without new data cost nothing.
+    The last `history` frames are kept so frames of several cameras can be
+    matched by capture time.
+    """
+
+    def __init__(self, history: int = 8):
+        self._lock = threading.Lock()
+        self._frame: Optional[dict] = None
+        self._history: deque[dict] = deque(maxlen=history)
+        self._seq = 0
+        self._taken_seq = 0
+
+    def put(self, frame: dict):
+        with self._lock:
+            self._frame = frame
+            self._history.append(frame)
+            self._seq += 1
+
+    def take(self) -> Optional[dict]:
+        with self._lock:
+            if self._seq == self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            return self._frame
+
+    def latest(self) -> Optional[dict]:
+        with self._lock:
+            return self._frame
+
+    def frames_since(self, t: float) -> list[dict]:
+        """Frames in the history captured at or after `t`, oldest first"""
+        with self._lock:
+            return [f for f in self._history if capture_timestamp(f) >= t]
+
+    def fresh(self) -> bool:
+        return self._seq != self._taken_seq
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._history.clear()
+            self._taken_seq = self._seq
+
+
+class FrameIngest:
+    """Per-camera latest-frame slots plus a signal that any of them has new data."""
+
+    def __init__(self, history: int = 8):
+        self.history = history
+        self.slots: Dict[str, FrameSlot] = {}
+        self._frames_ready = threading.Event()
+
+    def slot(self, key: str) -> FrameSlot:
+        if key not in self.slots:
+            self.slots[key] = FrameSlot(self.history)
+        return self.slots[key]
+
+    def remove(self, key: str):
+        self.slots.pop(key, None)
+
+    def put(self, key: str, frame: dict):
+        self.slot(key).put(frame)
+        self._frames_ready.set()
+
+    def take(self, key: str) -> Optional[dict]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return slot.take()
+
+    def latest(self, key: str) -> Optional[dict]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return slot.latest()
+
+    def frames_since(self, key: str, t: float) -> list[dict]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return []
+        return slot.frames_since(t)
+
+    async def wait(self, timeout: float = 0.5):
+        """Wait until at least one slot received a frame since the last call."""
+        if not self._frames_ready.is_set():
+            await trio.to_thread.run_sync(
+                self._frames_ready.wait, timeout, abandon_on_cancel=True
+            )
+        self._frames_ready.clear()
+
+
+class FrameReader:
+    """Background thread that moves frames from a camera into a `FrameSlot`.
+
+    `read(out)` is called at `rate` Hz. Once the first frame has been seen,
+    `out` is one of `num_buffers` preallocated frames that is reused in turn,
+    so steady-state reading does not allocate. By default there are two more
+    buffers than the slot history, so every frame in the history stays valid;
+    consumers that keep a frame longer than that (e.g. to save it) must copy it.
+
+    A frame is only published when its `step_idx` (or `timestamp`) differs
+    from the previous one. If `peek` is given it returns a cheap id of the
+    camera's newest frame (e.g. its ring buffer counter), and `read` is only
+    called when that id changed, so ticks without a new frame copy nothing.
+    """
+
+    def __init__(
+        self,
+        ingest: FrameIngest,
+        key: str,
+        read: Callable[[Optional[dict]], Optional[dict]],
+        rate: float = 60.0,
+        num_buffers: Optional[int] = None,
+        peek: Optional[Callable[[], Hashable]] = None,
+    ):
+        self.ingest = ingest
+        self.key = key
+        self.read = read
+        self.peek = peek
+        self.period = 1.0 / rate
+        self.num_buffers = num_buffers or ingest.history + 2
+        self._buffers: list[dict] = []
+        self._next_buffer = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"FrameReader-{key}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=1.0)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _read(self) -> Optional[dict]:
+        if not self._buffers:
+            frame = self.read(None)
+            if frame is not None:
+                self._buffers = [
+                    {k: np.empty_like(np.asarray(v)) for k, v in frame.items()}
+                    for _ in range(self.num_buffers)
+                ]
+            return frame
+        return self.read(self._buffers[self._next_buffer])
+
+    def _run(self):
+        last_id = None
+        last_peek = None
+        failing = False  # only changes between failing and reading are printed
+        while not self._stop.is_set():
+            start = time.monotonic()
+            frame = None
+            try:
+                peek = self.peek() if self.peek is not None else None
+                if peek is None or peek != last_peek:
+                    frame = self._read()
+                    if frame is not None:
+                        last_peek = peek
+                if failing:
+                    print(f"Reading frames from {self.key} again")
+                    failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"Failed to read frame from {self.key}: {e}")
+                    failing = True
+            if frame is not None and frame_timestamp(frame) != 0:
+                frame_id = np.asarray(frame.get("step_idx", frame["timestamp"])).item()
+                if frame_id != last_id:
+                    last_id = frame_id
+                    self.ingest.put(self.key, frame)
+                    # Duplicates are read into the same buffer again; only a
+                    # published frame moves on to the next one.
+                    if self._buffers:
+                        self._next_buffer = (self._next_buffer + 1) % self.num_buffers
+            elapsed = time.monotonic() - start
+            self._stop.wait(max(0.0, self.period - elapsed))
+
+
+def frame_timestamp(frame: dict) -> float:
+    return float(np.asarray(frame.get("timestamp", 0)).item())
+
+
+def capture_timestamp(frame: dict) -> float:
+    """When the camera captured the frame, falling back to when it was received"""
+    if "camera_capture_timestamp" in frame:
+        return float(np.asarray(frame["camera_capture_timestamp"]).item())
+    return frame_timestamp(frame)
+
+
+def select_synchronized(candidates: dict[Hashable, list[dict]]) -> tuple[dict[Hashable, dict], float]:
+    """Pick one frame per camera so that the capture times are as close as possible.
+
+    Every frame is tried as the reference; the other cameras contribute their
+    frame nearest to it. Returns the chosen frames and their skew (max - min
+    capture time, seconds).
+    """
+    assert all(candidates.values()), "Every camera needs at least one frame"
+    stamps = {key: np.array([capture_timestamp(f) for f in frames]) for key, frames in candidates.items()}
+    best, best_skew = None, np.inf
+    for ref_stamps in stamps.values():
+        for t_ref in ref_stamps:
+            choice = {key: int(np.argmin(np.abs(s - t_ref))) for key, s in stamps.items()}
+            chosen = [stamps[key][i] for key, i in choice.items()]
+            skew = float(max(chosen) - min(chosen))
+            if skew < best_skew:
+                best, best_skew = choice, skew
+    return {key: candidates[key][i] for key, i in best.items()}, best_skew
+
+
+FRAME_INGEST = FrameIngest()
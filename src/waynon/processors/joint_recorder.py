@@ -0,0 +1,147 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class JointStateLog:
+    """Fixed-size ring buffer of timestamped joint values.
+
+    Timestamps are `time.time()` seconds, the same clock the cameras report
+    capture times in, so joint values can be looked up for any frame.
+    """
+
+    def __init__(self, num_joints: int = 7, capacity: int = 20000):
+        self.capacity = capacity
+        self._t = np.zeros(capacity, dtype=np.float64)
+        self._q = np.zeros((capacity, num_joints), dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def record(self, t: float, q: np.ndarray):
+        with self._lock:
+            self._t[self._head] = t
+            self._q[self._head] = q
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Copies of the recorded times (N,) and joint values (N, J), oldest first"""
+        with self._lock:
+            start = (self._head - self._count) % self.capacity
+            idx = (start + np.arange(self._count)) % self.capacity
+            return self._t[idx], self._q[idx]
+
+    def time_range(self) -> Optional[tuple[float, float]]:
+        with self._lock:
+            if self._count == 0:
+                return None
+            first = (self._head - self._count) % self.capacity
+            last = (self._head - 1) % self.capacity
+            return float(self._t[first]), float(self._t[last])
+
+    def _search(self, t: np.ndarray) -> np.ndarray:
+        """Index (oldest first) of the first sample at or after each `t`. The
+        ring holds at most two sorted runs, each is searched in place."""
+        start = (self._head - self._count) % self.capacity
+        end = start + self._count
+        if end <= self.capacity:
+            return np.searchsorted(self._t[start:end], t)
+        first = self._t[start:]
+        i = np.searchsorted(first, t)
+        return np.where(i < len(first), i, len(first) + np.searchsorted(self._t[: self._head], t))
+
+    def interpolate(self, t: np.ndarray | float, max_gap: float = 0.05) -> Optional[np.ndarray]:
+        """Joint values at time(s) `t`, linearly interpolated.
+
+        Returns None if any `t` falls outside the log by more than `max_gap`
+        seconds, or lands between two samples further apart than that. Only
+        the two samples around each `t` are read.
+        """
+        t = np.asarray(t, dtype=np.float64)
+        with self._lock:
+            if self._count == 0:
+                return None
+            start = (self._head - self._count) % self.capacity
+            t_first = self._t[start]
+            t_last = self._t[(self._head - 1) % self.capacity]
+            if np.any(t < t_first - max_gap) or np.any(t > t_last + max_gap):
+                return None
+            if self._count == 1:
+                return np.broadcast_to(self._q[start], (*t.shape, self._q.shape[1])).copy()
+            i = np.clip(self._search(t), 1, self._count - 1)
+            i0 = (start + i - 1) % self.capacity
+            i1 = (start + i) % self.capacity
+            t0, t1 = self._t[i0], self._t[i1]
+            if np.any(t1 - t0 > max_gap):
+                return None
+            q0, q1 = self._q[i0], self._q[i1]
+        # Clamped at both ends, like np.interp
+        span = t1 - t0
+        w = np.clip(np.divide(t - t0, span, out=np.zeros_like(span), where=span > 0.0), 0.0, 1.0)
+        return q0 + w[..., None] * (q1 - q0)
+
+    def velocity(self, t: np.ndarray | float, dt: float = 0.01) -> Optional[np.ndarray]:
+        """Joint velocities at time(s) `t` by central differences over `dt`"""
+        t = np.asarray(t, dtype=np.float64)
+        q = self.interpolate(np.stack([t - dt / 2, t + dt / 2]))
+        if q is None:
+            return None
+        return (q[1] - q[0]) / dt
+
+
+class JointStateRecorder:
+    """Background thread sampling `read_q` into a `JointStateLog` at `rate` Hz"""
+
+    def __init__(self, log: JointStateLog, read_q: Callable[[], np.ndarray], rate: float = 500.0):
+        self.log = log
+        self.read_q = read_q
+        self.period = 1.0 / rate
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="JointStateRecorder", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=1.0)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        next_t = time.perf_counter()
+        failing = False  # only changes between failing and reading are printed
+        while not self._stop.is_set():
+            try:
+                q = self.read_q()
+                if failing:
+                    print("Reading joint state again")
+                    failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"Failed to read joint state: {e}")
+                    failing = True
+                q = None
+            if q is not None:
+                self.log.record(time.time(), np.asarray(q, dtype=np.float64))
+            next_t += self.period
+            delay = next_t - time.perf_counter()
+            if delay < 0.0:
+                next_t = time.perf_counter()  # fell behind, do not try to catch up
+            else:
+                self._stop.wait(delay)
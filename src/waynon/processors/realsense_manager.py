@@ -10,6 +10,8 @@ import trio
 from multiprocessing.managers import SharedMemoryManager
 from realsense.single_realsense import SingleRealsense
 
+from waynon.processors.frame_ingest import FRAME_INGEST, FrameReader, frame_timestamp
+
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,8 @@ class RealsenseManager:
         self.serials = []
         self.resolution = (1280, 720)
         self.busy = False
+        self.readers: Dict[str, FrameReader] = {}
+        self._camera_info: Dict[str, dict] = {}
 
     def get_intrinsics(self, serial: str):
         return self.get_camera(serial).get_intrinsics()
@@ -50,8 +54,34 @@ class RealsenseManager:
             )
         if not self.cameras[serial].is_alive():
             await trio.to_thread.run_sync(self.cameras[serial].start)
+        self._start_reader(serial)
         self.busy = False
 
+    def _start_reader(self, serial: str):
+        self._stop_reader(serial)
+        camera = self.cameras[serial]
+
+        def read(out):
+            if not camera.is_ready:
+                return None
+            # Copies straight out of the shared-memory ring into a reused buffer
+            return camera.get(out=out)
+
+        def peek():
+            # Number of frames the camera has written, no copy
+            return camera.ring_buffer.count
+
+        reader = FrameReader(FRAME_INGEST, serial, read, peek=peek)
+        self.readers[serial] = reader
+        reader.start()
+
+    def _stop_reader(self, serial: str):
+        reader = self.readers.pop(serial, None)
+        if reader is not None:
+            reader.stop()
+        self._camera_info.pop(serial, None)
+        FRAME_INGEST.remove(serial)
+
     async def delete_camera(self, entity_id: int):
         from waynon.components.realsense_camera import RealsenseCamera
 
@@ -60,6 +90,7 @@ class RealsenseManager:
         realsense_data = esper.component_for_entity(entity_id, RealsenseCamera)
         serial = realsense_data.serial
         if serial in self.serials and serial in self.cameras:
+            self._stop_reader(serial)
             if self.cameras[serial].is_alive():
                 await trio.to_thread.run_sync(self.cameras[serial].stop)
             del self.cameras[serial]
@@ -76,6 +107,7 @@ class RealsenseManager:
         realsense_data = esper.component_for_entity(entity_id, RealsenseCamera)
         serial = realsense_data.serial
         assert serial in self.serials
+        self._stop_reader(serial)
         if serial in self.cameras:
             await trio.to_thread.run_sync(self.cameras[serial].stop)
         self.busy = False
@@ -105,6 +137,8 @@ class RealsenseManager:
         return None
 
     def get_data(self, serial: str):
+        if serial in self.readers:
+            return FRAME_INGEST.latest(serial)
         if serial in self.cameras:
             return self.cameras[serial].get()
         return None
@@ -137,17 +171,35 @@ class RealsenseManager:
         self.busy = False
 
     def stop_all_cameras_sync(self):
+        for serial in list(self.readers):
+            self._stop_reader(serial)
         for serial in self.cameras:
             if self.cameras[serial].is_alive():
                 self.cameras[serial].stop()
 
     def __del__(self):
+        for reader in self.readers.values():
+            reader.stop()
         for serial in self.cameras:
             if self.cameras[serial].is_alive():
                 self.cameras[serial].stop()
         self.shm_manager.shutdown()
 
+    def camera_info(self, serial: str):
+        """Intrinsics, resolution and depth scale do not change while a camera runs,
+        so they are queried once per start instead of once per frame."""
+        if serial not in self._camera_info:
+            camera = self.cameras[serial]
+            info = {
+                "K": camera.get_intrinsics(),
+                "resolution": camera.resolution,
+                "depth_scale": None,
+            }
+            self._camera_info[serial] = info
+        return self._camera_info[serial]
+
     def process(self):
+        """Consume new frames. Cameras whose slot has no fresh frame are skipped."""
         from waynon.components.realsense_camera import RealsenseCamera
         from waynon.components.camera import PinholeCamera
         from waynon.components.renderable import StructuredPointCloud
@@ -155,41 +207,39 @@ class RealsenseManager:
         for entity, (camera, realsense, pc) in esper.get_components(
             PinholeCamera, RealsenseCamera, StructuredPointCloud
         ):
-            if realsense.running():
-                logger.info(f"Processing camera {entity}")
-                data = realsense.get_data()
-                if data["timestamp"] == 0:
-                    return
-
-                K = realsense.intrinsics()
-                camera.fl_x = K[0, 0]
-                camera.fl_y = K[1, 1]
-                camera.cx = K[0, 2]
-                camera.cy = K[1, 2]
-                resolution = realsense.resolution()
-                camera.width = resolution[0]
-                camera.height = resolution[1]
-
-                data = realsense.get_data()
-                rgb = data["color"]
-                identifier = data["timestamp"]
-                camera.update_image(rgb, identifier=identifier)
-                if pc.show_pointcloud and "depth" in data:
-                    depth_scale = realsense.depth_scale()
-                    pc.update_depth(
-                        data["depth"], identifier=identifier, depth_scale=depth_scale
-                    )
-                    pc.update_intrinsics(
-                        camera.fl_x,
-                        camera.fl_y,
-                        camera.cx,
-                        camera.cy,
-                        camera.width,
-                        camera.height,
-                    )
-                    pc.set_texture_id(camera.get_texture().id)
-            else:
-                pass
+            data = FRAME_INGEST.take(realsense.serial)
+            if data is None:
+                continue
+            logger.info(f"Processing camera {entity}")
+
+            info = self.camera_info(realsense.serial)
+            K = info["K"]
+            camera.fl_x = K[0, 0]
+            camera.fl_y = K[1, 1]
+            camera.cx = K[0, 2]
+            camera.cy = K[1, 2]
+            resolution = info["resolution"]
+            camera.width = resolution[0]
+            camera.height = resolution[1]
+
+            rgb = data["color"]
+            identifier = frame_timestamp(data)
+            camera.update_image(rgb, identifier=identifier, generation=lambda data=data: frame_timestamp(data))
+            if pc.show_pointcloud and "depth" in data:
+                if info["depth_scale"] is None:
+                    info["depth_scale"] = self.cameras[realsense.serial].get_depth_scale()
+                pc.update_depth(
+                    data["depth"], identifier=identifier, depth_scale=info["depth_scale"]
+                )
+                pc.update_intrinsics(
+                    camera.fl_x,
+                    camera.fl_y,
+                    camera.cx,
+                    camera.cy,
+                    camera.width,
+                    camera.height,
+                )
+                pc.set_texture_id(camera.get_texture().id)
 
 
 REALSENSE_MANAGER = RealsenseManager()
@@ -23,7 +23,7 @@ class RenderProcessor(esper.Processor):
             matrix = transform.get_X_WT()
             drawable.set_X_WT(matrix)
             drawable.update_intrinsics(camera.fl_x, camera.fl_y, camera.cx, camera.cy, camera.width, camera.height)
-            texture = camera.get_texture()
+            texture = camera.get_texture(create=False)
             if texture is not None:
                 drawable.set_texture_id(texture.id)
 
@@ -0,0 +1,233 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import esper
+import numpy as np
+
+from waynon.processors.frame_ingest import FRAME_INGEST, frame_timestamp
+
+
+class ReplaySequence:
+    """A recorded camera sequence.
+
+    Two layouts are supported:
+      - a folder of images (`*.png`, sorted by name, converted to BGR like
+        the live cameras) with an optional
+        `timestamps.json` (a list, or a dict of file name to seconds) or
+        `timestamps.txt` (one value per line). Without timestamps frames are
+        spaced at `fps`.
+      - a `.npz` container with a BGR `color` array (N, H, W, 3), an optional
+        `timestamp` array (N,) and an optional `depth` array (N, H, W).
+
+    Either layout may carry an `intrinsics.json` (next to the images, or next
+    to the container) with `fl_x`, `fl_y`, `cx`, `cy`, `width` and `height`.
+    """
+
+    def __init__(self, path: Path, fps: float = 30.0):
+        self.path = Path(path)
+        self.intrinsics: Optional[dict] = None
+        self._files: list[Path] = []
+        self._color: Optional[np.ndarray] = None
+        self._depth: Optional[np.ndarray] = None
+
+        if self.path.is_dir():
+            self._files = sorted(self.path.glob("*.png"))
+            self.timestamps = self._read_folder_timestamps(fps)
+            intrinsics_path = self.path / "intrinsics.json"
+        elif self.path.suffix == ".npz":
+            data = np.load(self.path)
+            self._color = data["color"]
+            if "depth" in data:
+                self._depth = data["depth"]
+            if "timestamp" in data:
+                self.timestamps = np.asarray(data["timestamp"], dtype=np.float64)
+            else:
+                self.timestamps = np.arange(len(self._color), dtype=np.float64) / fps
+            intrinsics_path = self.path.with_name("intrinsics.json")
+        else:
+            raise ValueError(f"Unsupported recording {self.path}")
+
+        assert len(self.timestamps) == len(self), "Timestamps do not match the frames"
+        if intrinsics_path.exists():
+            with open(intrinsics_path, "r") as f:
+                self.intrinsics = json.load(f)
+
+    def _read_folder_timestamps(self, fps: float) -> np.ndarray:
+        json_path = self.path / "timestamps.json"
+        txt_path = self.path / "timestamps.txt"
+        if json_path.exists():
+            with open(json_path, "r") as f:
+                res = json.load(f)
+            if isinstance(res, dict):
+                res = [res[f.name] for f in self._files]
+            return np.asarray(res, dtype=np.float64)
+        if txt_path.exists():
+            return np.loadtxt(txt_path, dtype=np.float64, ndmin=1)
+        return np.arange(len(self._files), dtype=np.float64) / fps
+
+    def __len__(self):
+        if self._color is not None:
+            return len(self._color)
+        return len(self._files)
+
+    def frame(self, index: int) -> dict:
+        if self._color is not None:
+            frame = {"color": np.ascontiguousarray(self._color[index])}
+            if self._depth is not None:
+                frame["depth"] = np.ascontiguousarray(self._depth[index])
+        else:
+            from PIL import Image
+
+            rgb = np.asarray(Image.open(self._files[index]).convert("RGB"), dtype=np.uint8)
+            frame = {"color": np.ascontiguousarray(rgb[..., ::-1])}
+        return frame
+
+
+class ReplayPlayer:
+    """Streams a `ReplaySequence` into the frame ingest as if it were a live camera.
+
+    `speed` scales the recorded timing (1.0 is real time, 2.0 twice as fast).
+    With `max_speed` every frame is published as soon as the previous one has
+    been consumed, which is what throughput benchmarks want.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        sequence: ReplaySequence,
+        speed: float = 1.0,
+        max_speed: bool = False,
+        loop: bool = True,
+    ):
+        assert speed > 0.0, "Speed must be positive"
+        self.key = key
+        self.sequence = sequence
+        self.speed = speed
+        self.max_speed = max_speed
+        self.loop = loop
+        self.index = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"ReplayPlayer-{key}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=1.0)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        timestamps = self.sequence.timestamps
+        slot = FRAME_INGEST.slot(self.key)
+        step_idx = 0
+        while not self._stop.is_set():
+            start_wall = time.time()
+            for i in range(len(self.sequence)):
+                if self._stop.is_set():
+                    return
+                self.index = i
+                frame = self.sequence.frame(i)
+                if self.max_speed:
+                    while slot.fresh() and not self._stop.is_set():
+                        self._stop.wait(0.001)
+                    capture_time = time.time()
+                else:
+                    capture_time = start_wall + (timestamps[i] - timestamps[0]) / self.speed
+                    self._stop.wait(max(0.0, capture_time - time.time()))
+                    if self._stop.is_set():
+                        return
+                frame["timestamp"] = time.time()
+                frame["camera_capture_timestamp"] = capture_time
+                frame["camera_receive_timestamp"] = frame["timestamp"]
+                frame["recorded_timestamp"] = float(timestamps[i])
+                frame["step_idx"] = step_idx
+                step_idx += 1
+                FRAME_INGEST.put(self.key, frame)
+            if not self.loop:
+                return
+
+
+class ReplayManager:
+    def __init__(self):
+        self.players: Dict[int, ReplayPlayer] = {}
+
+    @staticmethod
+    def key(entity_id: int):
+        return f"replay_{entity_id}"
+
+    def start_camera(self, entity_id: int):
+        from waynon.components.replay_camera import ReplayCamera
+
+        assert esper.entity_exists(entity_id)
+        assert esper.has_component(entity_id, ReplayCamera)
+        replay = esper.component_for_entity(entity_id, ReplayCamera)
+        self.stop_camera(entity_id)
+        try:
+            sequence = ReplaySequence(Path(replay.path), fps=replay.fps)
+        except Exception as e:
+            print(f"Failed to open recording {replay.path}: {e}")
+            return
+        if len(sequence) == 0:
+            print(f"Recording {replay.path} has no frames")
+            return
+        player = ReplayPlayer(
+            self.key(entity_id),
+            sequence,
+            speed=replay.speed,
+            max_speed=replay.max_speed,
+            loop=replay.loop,
+        )
+        self.players[entity_id] = player
+        player.start()
+
+    def stop_camera(self, entity_id: int):
+        player = self.players.pop(entity_id, None)
+        if player is not None:
+            player.stop()
+        FRAME_INGEST.remove(self.key(entity_id))
+
+    def stop_all_cameras_sync(self):
+        for entity_id in list(self.players):
+            self.stop_camera(entity_id)
+
+    def camera_started(self, entity_id: int):
+        player = self.players.get(entity_id)
+        return player is not None and player.is_alive()
+
+    def get_player(self, entity_id: int) -> Optional[ReplayPlayer]:
+        return self.players.get(entity_id)
+
+    def process(self):
+        from waynon.components.camera import PinholeCamera
+        from waynon.components.replay_camera import ReplayCamera
+
+        for entity, (camera, replay) in esper.get_components(PinholeCamera, ReplayCamera):
+            data = FRAME_INGEST.take(self.key(entity))
+            if data is None:
+                continue
+            player = self.players.get(entity)
+            if player is not None and player.sequence.intrinsics:
+                intrinsics = player.sequence.intrinsics
+                camera.fl_x = intrinsics["fl_x"]
+                camera.fl_y = intrinsics["fl_y"]
+                camera.cx = intrinsics["cx"]
+                camera.cy = intrinsics["cy"]
+                camera.width = intrinsics["width"]
+                camera.height = intrinsics["height"]
+            camera.update_image(
+                data["color"], identifier=frame_timestamp(data), generation=lambda data=data: frame_timestamp(data)
+            )
+
+
+REPLAY_MANAGER = ReplayManager()
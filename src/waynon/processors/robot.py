@@ -1,15 +1,15 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
 import enum
+from pathlib import Path
 from typing import TYPE_CHECKING, Dict, Literal
 
 import esper
 import numpy as np
-import panda_py
-import pinocchio as pin
 import trio
 
-from panda_desk import Desk
+from waynon.processors.joint_recorder import JointStateLog, JointStateRecorder
+from waynon.utils.kinematics import PANDA_FINGER_Q, PANDA_LINKS, PANDA_URDF, Kinematics
 from waynon.utils.utils import ASSET_PATH, COLORS
 
 if TYPE_CHECKING:
@@ -17,6 +17,29 @@ if TYPE_CHECKING:
 
 
 class RobotManager:
+    joint_log: JointStateLog | None = None
+    _joint_recorder: JointStateRecorder | None = None
+
+    def start_joint_recorder(self, read_q, rate: float = 500.0):
+        """Log timestamped joint values in the background so they can be
+        interpolated at camera capture times."""
+        self.stop_joint_recorder()
+        if self.joint_log is None:
+            self.joint_log = JointStateLog()
+        self.joint_log.clear()
+        self._joint_recorder = JointStateRecorder(self.joint_log, read_q, rate)
+        self._joint_recorder.start()
+
+    def stop_joint_recorder(self):
+        if self._joint_recorder is not None:
+            self._joint_recorder.stop()
+            self._joint_recorder = None
+
+    def q_at(self, t: float) -> np.ndarray | None:
+        """Joint values at time `t` (`time.time()` clock) from the joint log, if it covers it"""
+        if self.joint_log is None or self._joint_recorder is None:
+            return None
+        return self.joint_log.interpolate(t)
 
     def read_q(self) -> np.ndarray:
         raise NotImplementedError
@@ -28,14 +51,103 @@ class RobotManager:
         # Returns a dictionary of link names to their transforms in base frame
         raise NotImplementedError
 
+    def link_names(self) -> list[str]:
+        raise NotImplementedError
+
+    def link_id(self, link_name: str) -> int:
+        # Index of a link in link_names(), resolve it once and use link_transform
+        return self.link_names().index(link_name)
+
+    def link_transform(self, link_id: int) -> np.ndarray:
+        # Transform of a link in base frame as of the last tick()
+        raise NotImplementedError
+
+    def tick(self):
+        pass
+
+    def fk_batch(self, qs: np.ndarray) -> np.ndarray:
+        # Link transforms in base frame for each row of qs, (N, L, 4, 4) ordered like link_names()
+        return np.array([[self.fk(q)[link] for link in self.link_names()] for q in qs]).reshape(
+            len(qs), len(self.link_names()), 4, 4
+        )
+
     def ready_to_move(self) -> bool:
         raise NotImplementedError
 
+    def cruise_velocity(self) -> np.ndarray | None:
+        """Joint speeds (rad/s) the robot moves at when it is commanded to move, if known"""
+        return None
+
     async def move_to(self, q: np.ndarray):
         raise NotImplementedError
 
+    async def move_through(self, qs: list[np.ndarray]):
+        """Visit every configuration in `qs` in order without pausing in between.
+
+        Managers that can blend waypoints into one motion should override this,
+        the default simply chains `move_to`.
+        """
+        for q in qs:
+            await self.move_to(q)
+
+
+class UrdfRobotManager(RobotManager):
+    """An offline robot described by any URDF.
+
+    Link index tables are built once from the URDF. `tick` refreshes one
+    (L, 4, 4) array of link transforms and consumers look their link up by
+    id (see `link_id`) instead of by name.
+    """
+
+    def __init__(
+        self,
+        urdf_path: Path,
+        links: list[str] | None = None,
+        fixed_q: tuple[float, ...] = (),
+        offline_q: np.ndarray | None = None,
+    ):
+        self._kinematics = Kinematics(urdf_path, links, fixed_q)
+        if offline_q is None:
+            offline_q = self._kinematics.neutral()
+        self.offline_q = offline_q
+        self.last_link_transforms = self._kinematics.fk_array(self.read_q())
+
+    def link_names(self) -> list[str]:
+        return self._kinematics.links
+
+    def link_id(self, link_name: str) -> int:
+        return self._kinematics.link_index[link_name]
+
+    def fk(self, q: np.ndarray) -> Dict[str, np.ndarray]:
+        return self._kinematics.fk(q)
+
+    def fk_array(self, q: np.ndarray) -> np.ndarray:
+        return self._kinematics.fk_array(q)
+
+    def fk_batch(self, qs: np.ndarray) -> np.ndarray:
+        return self._kinematics.fk_batch(qs)
+
+    def link_transform(self, link_id: int) -> np.ndarray:
+        """Transform of a link in the base frame as of the last `tick`"""
+        return self.last_link_transforms[link_id]
+
+    def tick(self):
+        self.last_link_transforms = self._kinematics.fk_array(self.read_q())
+
+    def set_offline_q(self, q: np.ndarray):
+        self.offline_q = q
+
+    def read_q(self) -> np.ndarray:
+        return self.offline_q
+
+    def ready_to_move(self) -> bool:
+        return False
+
+
+class FrankaManager(UrdfRobotManager):
+    MAX_VELOCITY = np.array([2.175, 2.175, 2.175, 2.175, 2.61, 2.61, 2.61])
+    MAX_ACCELERATION = np.array([15.0, 7.5, 10.0, 12.5, 15.0, 20.0, 20.0])
 
-class FrankaManager(RobotManager):
     class ConnectionStatus(enum.Enum):
         DISCONNECTED = "disconnected"
         CONNECTING = "connecting"
@@ -54,25 +166,22 @@ class FrankaManager(RobotManager):
         PROGRAMMING = "programming"
 
     def __init__(self, settings: "Franka"):
+        from panda_desk import Desk
+
         self.settings = settings
         self.desk = Desk()
         self.panda = None
         self.connect_status = FrankaManager.ConnectionStatus.DISCONNECTED
         self.brake_status = FrankaManager.BrakeStatus.UNKNOWN
         self.operating_mode = FrankaManager.OperatingMode.UNKNOWN
-        self.offline_q = np.array(
-            [0.0, -0.785, 0.0, -2.356, 0.0, 1.571, 0.785], dtype=np.float32
-        )
         self._initialize_buttons()
-        urdf_path = ASSET_PATH / "robots" / "panda" / "panda.urdf"
         assert ASSET_PATH.exists(), f"ASSET_PATH {ASSET_PATH} does not exist"
-        assert urdf_path.exists(), f"urdf_path {urdf_path} does not exist"
-        self._full_model = pin.buildModelFromUrdf(str(urdf_path))
-        # self._reduced_model = pin.buildReducedModel(
-        #     self._full_model, [8, 9], np.zeros(9))
-        self._model_data = self._full_model.createData()
-
-        self.last_transforms = self.fk(self.offline_q)
+        super().__init__(
+            PANDA_URDF,
+            PANDA_LINKS,
+            PANDA_FINGER_Q,
+            offline_q=np.array([0.0, -0.785, 0.0, -2.356, 0.0, 1.571, 0.785], dtype=np.float32),
+        )
 
     async def connect_to_ip(
         self,
@@ -82,6 +191,9 @@ class FrankaManager(RobotManager):
         password: str,
         platform: str = "fr3",
     ):
+        import panda_py
+        from panda_desk import Desk
+
         try:
             self.desk = Desk(ip, platform)
             self.panda = panda_py.Panda(self.settings.ip)
@@ -100,6 +212,8 @@ class FrankaManager(RobotManager):
             return False
 
         self.connect_status = FrankaManager.ConnectionStatus.CONNECTED
+        panda = self.panda
+        self.start_joint_recorder(lambda: panda.q)
 
         nursery.start_soon(self._read_brake_status)
         # nursery.start_soon(self._read_joint_status)
@@ -108,39 +222,15 @@ class FrankaManager(RobotManager):
 
     async def disconnect(self):
         assert self.desk is not None
+        self.stop_joint_recorder()
         await self.desk.logout()
         self.connect_status = FrankaManager.ConnectionStatus.DISCONNECTED
         self.brake_status = FrankaManager.BrakeStatus.UNKNOWN
         self.operating_mode = FrankaManager.OperatingMode.UNKNOWN
 
-    def fk(self, q: np.ndarray, gripper_width=0.0) -> list[np.ndarray]:
+    def fk(self, q: np.ndarray, gripper_width=0.0) -> Dict[str, np.ndarray]:
         assert len(q) == 7
-        q = np.append(q, [0.01, 0.01])
-        pin.forwardKinematics(self._full_model, self._model_data, q)
-        pin.updateFramePlacements(self._full_model, self._model_data)
-
-        links = [
-            "panda_link0",
-            "panda_link1",
-            "panda_link2",
-            "panda_link3",
-            "panda_link4",
-            "panda_link5",
-            "panda_link6",
-            "panda_link7",
-            "panda_hand",
-            "panda_leftfinger",
-            "panda_rightfinger",
-        ]
-        prev_links = [None] + links[:-1]
-
-        d = self._model_data
-        frame_ids = [self._full_model.getFrameId(link) for link in links]
-        oMi = {
-            link: d.oMf[frame_id].homogeneous
-            for link, frame_id in zip(links, frame_ids)
-        }
-        return oMi
+        return self._kinematics.fk(q)
 
     async def _read_brake_status(self):
         async with self.desk.system_status() as status:
@@ -194,7 +284,7 @@ class FrankaManager(RobotManager):
                         self.buttons_down[button]["down"] = e[button]
 
     def tick(self):
-        self.last_transforms = self.fk(self.read_q())
+        super().tick()
         for button in self.buttons_down:
             if self.buttons_down[button]["down"]:
                 self.buttons_down[button]["t"] += 1
@@ -202,9 +292,6 @@ class FrankaManager(RobotManager):
             else:
                 self.buttons_down[button]["t"] = 0
 
-    def set_offline_q(self, q: np.ndarray):
-        self.offline_q = q 
-
     def read_q(self):
         if self.connect_status == FrankaManager.ConnectionStatus.DISCONNECTED:
             return self.offline_q
@@ -230,6 +317,22 @@ class FrankaManager(RobotManager):
         assert self.connect_status == FrankaManager.ConnectionStatus.CONNECTED
         await self.panda.movej(q)
 
+    def cruise_velocity(self) -> np.ndarray:
+        return self.MAX_VELOCITY * max(self.settings.speed_factor, 1e-3)
+
+    async def move_through(self, qs: list[np.ndarray]):
+        """Pass through every configuration in `qs` in one trajectory, without
+        stopping at the waypoints. Scaled by `settings.speed_factor`."""
+        assert self.connect_status == FrankaManager.ConnectionStatus.CONNECTED
+        if not qs:
+            return
+        panda = self.panda
+        waypoints = [np.asarray(q, dtype=np.float64) for q in qs]
+        speed_factor = self.settings.speed_factor
+        await trio.to_thread.run_sync(
+            lambda: panda.move_to_joint_position(waypoints, speed_factor=speed_factor)
+        )
+
     def _initialize_buttons(self):
         self.buttons_down = {
             "circle": {
@@ -263,11 +366,152 @@ class FrankaManager(RobotManager):
         }
 
 
+class SimulatedFrankaManager(FrankaManager):
+    """A Franka that only exists in software.
+
+    Connecting always succeeds with the brakes open, `move_to` follows a
+    synchronized trapezoidal velocity profile in real time so moves take as
+    long as they would on the robot (scaled by `settings.sim_speed_factor`),
+    and `read_q` adds optional gaussian noise (`settings.sim_joint_noise`,
+    radians). Useful to run the collection pipeline without hardware.
+    """
+
+    HOME_Q = np.array([0.0, -0.785, 0.0, -2.356, 0.0, 1.571, 0.785])
+
+    def __init__(self, settings: "Franka", rate: float = 100.0):
+        super().__init__(settings)
+        self.q = np.asarray(self.offline_q, dtype=np.float64).copy()
+        self.rate = rate
+        self._rng = np.random.default_rng()
+
+    async def connect_to_ip(
+        self,
+        nursery: trio.Nursery,
+        ip: str,
+        username: str,
+        password: str,
+        platform: str = "fr3",
+    ):
+        self.q = np.asarray(self.offline_q, dtype=np.float64).copy()
+        self.connect_status = FrankaManager.ConnectionStatus.CONNECTED
+        self.brake_status = FrankaManager.BrakeStatus.OPEN
+        self.operating_mode = FrankaManager.OperatingMode.EXECUTION
+        self.start_joint_recorder(self.read_q)
+        return True
+
+    async def disconnect(self):
+        self.stop_joint_recorder()
+        self.offline_q = self.q.copy()
+        self.connect_status = FrankaManager.ConnectionStatus.DISCONNECTED
+        self.brake_status = FrankaManager.BrakeStatus.UNKNOWN
+        self.operating_mode = FrankaManager.OperatingMode.UNKNOWN
+
+    def set_offline_q(self, q: np.ndarray):
+        super().set_offline_q(q)
+        if self.connect_status == FrankaManager.ConnectionStatus.DISCONNECTED:
+            self.q = np.asarray(q, dtype=np.float64).copy()
+
+    def read_q(self):
+        if self.connect_status == FrankaManager.ConnectionStatus.DISCONNECTED:
+            return self.offline_q
+        q = self.q.copy()
+        if self.settings.sim_joint_noise > 0.0:
+            q += self._rng.normal(0.0, self.settings.sim_joint_noise, size=q.shape)
+        return q
+
+    def motion_profile(self, q_start: np.ndarray, q_goal: np.ndarray) -> tuple[float, float]:
+        """Duration of the slowest joint under its velocity and acceleration
+        limits, and the fraction of it spent accelerating. All joints are
+        scaled onto that profile so they start and stop together."""
+        speed_factor = max(self.settings.sim_speed_factor, 1e-3)
+        v = self.MAX_VELOCITY * speed_factor
+        a = self.MAX_ACCELERATION * speed_factor
+        d = np.abs(np.asarray(q_goal) - np.asarray(q_start))
+        # Joints that reach full speed cruise, the rest follow a triangular profile
+        cruising = d >= v * v / a
+        durations = np.where(cruising, d / v + v / a, 2.0 * np.sqrt(d / a))
+        i = int(np.argmax(durations))
+        duration = float(durations[i])
+        if duration <= 0.0:
+            return 0.0, 0.5
+        ramp = (v[i] / a[i]) / duration if cruising[i] else 0.5
+        return duration, ramp
+
+    def cruise_velocity(self) -> np.ndarray:
+        return self.MAX_VELOCITY * max(self.settings.sim_speed_factor, 1e-3)
+
+    async def home(self):
+        await self.move_to(self.HOME_Q)
+
+    async def move_to(self, q: np.ndarray):
+        assert self.connect_status == FrankaManager.ConnectionStatus.CONNECTED
+        q_start = self.q.copy()
+        q_goal = np.asarray(q, dtype=np.float64)
+        duration, ramp = self.motion_profile(q_start, q_goal)
+        start = trio.current_time()
+        # If cancelled the robot simply stays where it is, like an aborted motion
+        while True:
+            t = trio.current_time() - start
+            if t >= duration:
+                break
+            self.q = q_start + trapezoidal_progress(t, duration, ramp) * (q_goal - q_start)
+            await trio.sleep(1.0 / self.rate)
+        self.q = q_goal.copy()
+
+    async def move_through(self, qs: list[np.ndarray]):
+        """Follow the piecewise linear path through `qs` as one motion.
+
+        The robot only accelerates at the start and decelerates at the end;
+        every segment is traversed at the speed of its slowest joint.
+        """
+        assert self.connect_status == FrankaManager.ConnectionStatus.CONNECTED
+        speed_factor = max(self.settings.sim_speed_factor, 1e-3)
+        v = self.MAX_VELOCITY * speed_factor
+        a = self.MAX_ACCELERATION * speed_factor
+        path = np.vstack([self.q] + [np.asarray(q, dtype=np.float64) for q in qs])
+        # Time each segment takes at cruise speed, the path is parametrized by it
+        segment_times = np.max(np.abs(np.diff(path, axis=0)) / v, axis=1)
+        knots = np.concatenate([[0.0], np.cumsum(segment_times)])
+        cruise_time = float(knots[-1])
+        if cruise_time <= 0.0:
+            return
+        ramp_time = float(np.max(v / a))
+        if cruise_time >= ramp_time:
+            duration = cruise_time + ramp_time
+            ramp = ramp_time / duration
+        else:
+            duration = 2.0 * np.sqrt(cruise_time * ramp_time)
+            ramp = 0.5
+        start = trio.current_time()
+        while True:
+            t = trio.current_time() - start
+            if t >= duration:
+                break
+            s = trapezoidal_progress(t, duration, ramp) * cruise_time
+            self.q = np.array([np.interp(s, knots, path[:, j]) for j in range(path.shape[1])])
+            await trio.sleep(1.0 / self.rate)
+        self.q = path[-1].copy()
+
+
+def trapezoidal_progress(t: float, duration: float, ramp: float) -> float:
+    """Normalized position in [0, 1] along a trapezoidal velocity profile that
+    spends `ramp` of `duration` accelerating and the same decelerating."""
+    if duration <= 0.0:
+        return 1.0
+    s = min(max(t / duration, 0.0), 1.0)
+    peak = 1.0 / (1.0 - ramp)  # normalized cruise velocity
+    if s < ramp:
+        return 0.5 * peak / ramp * s * s
+    if s > 1.0 - ramp:
+        r = 1.0 - s
+        return 1.0 - 0.5 * peak / ramp * r * r
+    return 0.5 * peak * ramp + peak * (s - ramp)
+
+
 class RobotProcessor(esper.Processor):
     def process(self):
-        from waynon.components.node import Node
         from waynon.components.renderable import Mesh
-        from waynon.components.robot import Franka, FrankaLink, Robot
+        from waynon.components.robot import Franka, FrankaLink, Robot, UrdfRobot
         from waynon.components.transform import Transform
 
         for entity, (robot, franka) in esper.get_components(Robot, Franka):
@@ -275,14 +519,24 @@ class RobotProcessor(esper.Processor):
             robot.set_manager(manager)
             manager.tick()
 
-        for entity, (node, link, transform, mesh) in esper.get_components(
-            Node, FrankaLink, Transform, Mesh
-        ):
+        for entity, (robot, urdf_robot) in esper.get_components(Robot, UrdfRobot):
+            manager = urdf_robot.get_manager()
+            robot.set_manager(manager)
+            if manager is not None:
+                manager.tick()
+
+        for entity, (link, transform) in esper.get_components(FrankaLink, Transform):
             robot_manager = esper.component_for_entity(
                 link.robot_id, Robot
             ).get_manager()
-            X_BL = robot_manager.last_transforms[link.link_name]  # All relative to base
-            transform.set_X_PT(X_BL)
+            if robot_manager is None:
+                continue
+            X_BL = robot_manager.link_transform(link.get_link_id(robot_manager))  # All relative to base
+            transform.set_X_PT(X_BL, journal=False)
+            # links of URDF robots are frames without a mesh
+            mesh = esper.try_component(entity, Mesh)
+            if mesh is None:
+                continue
             if robot_manager.ready_to_move():
                 mesh.set_color(COLORS["GREEN"])
             else:
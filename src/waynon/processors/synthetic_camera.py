@@ -0,0 +1,275 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import threading
+import time
+from typing import Dict, Optional
+
+import esper
+import numpy as np
+
+from waynon.processors.frame_ingest import FRAME_INGEST
+
+
+def render_markers(
+    K: np.ndarray,
+    width: int,
+    height: int,
+    X_CW: np.ndarray,
+    markers: list[tuple[np.ndarray, float, np.ndarray]],
+    background: int = 128,
+    blur_sigma: float = 0.0,
+    noise_std: float = 0.0,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Rasterize square markers into a BGR uint8 image.
+
+    `X_CW` is the world to camera transform in the opencv convention and each
+    marker is `(image, marker_length, X_WM)` with the marker image covering the
+    black square of side `marker_length`. A white quiet zone is added around
+    every marker so it can be detected. Markers are drawn far to near.
+    """
+    import cv2
+
+    canvas = np.full((height, width), float(background), dtype=np.float32)
+    drawn = []
+    for marker_image, marker_length, X_WM in markers:
+        n = marker_image.shape[0]
+        pad = n // 4
+        padded = cv2.copyMakeBorder(
+            marker_image, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255
+        )
+        half = 0.5 * marker_length * (n + 2 * pad) / n
+        p_M = np.array(
+            [[-half, half, 0.0], [half, half, 0.0], [half, -half, 0.0], [-half, -half, 0.0]]
+        )
+        X_CM = X_CW @ X_WM
+        p_C = p_M @ X_CM[:3, :3].T + X_CM[:3, 3]
+        if np.any(p_C[:, 2] <= 1e-3):
+            continue  # behind or too close to the camera
+        uv = p_C @ K.T
+        uv = uv[:, :2] / uv[:, 2:]
+        drawn.append((float(p_C[:, 2].mean()), padded, uv))
+
+    drawn.sort(key=lambda d: -d[0])
+    for _, padded, uv in drawn:
+        m = padded.shape[0]
+        # Pixel centers sit at integer coordinates, so the image edges are at -0.5
+        src = np.array(
+            [[-0.5, -0.5], [m - 0.5, -0.5], [m - 0.5, m - 0.5], [-0.5, m - 0.5]],
+            dtype=np.float32,
+        )
+        H = cv2.getPerspectiveTransform(src, uv.astype(np.float32))
+        warped = cv2.warpPerspective(
+            padded.astype(np.float32), H, (width, height), flags=cv2.INTER_LINEAR
+        )
+        alpha = cv2.warpPerspective(
+            np.ones((m, m), dtype=np.float32), H, (width, height), flags=cv2.INTER_LINEAR
+        )
+        canvas = canvas * (1.0 - alpha) + warped * alpha
+
+    if blur_sigma > 0.0:
+        canvas = cv2.GaussianBlur(canvas, (0, 0), blur_sigma)
+    if noise_std > 0.0:
+        rng = rng or np.random.default_rng()
+        canvas = canvas + rng.normal(0.0, noise_std, size=canvas.shape)
+    image = np.clip(canvas + 0.5, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def true_q(manager) -> np.ndarray:
+    from waynon.processors.robot import FrankaManager, SimulatedFrankaManager
+
+    if (
+        isinstance(manager, SimulatedFrankaManager)
+        and manager.connect_status == FrankaManager.ConnectionStatus.CONNECTED
+    ):
+        return manager.q
+    return manager.read_q()
+
+
+class SyntheticPlayer:
+    """Renders the frames of one synthetic camera on a worker thread.
+
+    `submit` hands over everything a frame needs, read from the scene on the
+    main thread. The thread renders the newest submission and publishes it to
+    the frame ingest like a live camera; submissions that arrive while a frame
+    is rendering replace each other, so a slow render drops frames instead of
+    queueing them.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._request: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._rng = np.random.default_rng()
+        self._thread = threading.Thread(
+            target=self._run, name=f"SyntheticPlayer-{key}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=1.0)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, request: dict):
+        with self._lock:
+            self._request = request
+        self._wake.set()
+
+    def _run(self):
+        step_idx = 0
+        failing = False  # only changes between failing and rendering are printed
+        while not self._stop.is_set():
+            self._wake.wait(0.1)
+            self._wake.clear()
+            with self._lock:
+                request, self._request = self._request, None
+            if request is None or self._stop.is_set():
+                continue
+            capture_time = request.pop("capture_time")
+            try:
+                image = render_markers(**request, rng=self._rng)
+            except Exception as e:
+                if not failing:
+                    print(f"Failed to render {self.key}: {e}")
+                    failing = True
+                continue
+            failing = False
+            now = time.time()
+            FRAME_INGEST.put(
+                self.key,
+                {
+                    "color": image,
+                    "timestamp": now,
+                    "camera_capture_timestamp": capture_time,
+                    "camera_receive_timestamp": now,
+                    "step_idx": step_idx,
+                },
+            )
+            step_idx += 1
+
+
+class SyntheticCameraManager:
+    def __init__(self):
+        self.players: Dict[int, SyntheticPlayer] = {}
+
+    @staticmethod
+    def key(entity_id: int):
+        return f"synthetic_{entity_id}"
+
+    def start_camera(self, entity_id: int) -> SyntheticPlayer:
+        self.stop_camera(entity_id)
+        player = SyntheticPlayer(self.key(entity_id))
+        self.players[entity_id] = player
+        player.start()
+        return player
+
+    def stop_camera(self, entity_id: int):
+        player = self.players.pop(entity_id, None)
+        if player is not None:
+            player.stop()
+        FRAME_INGEST.remove(self.key(entity_id))
+
+    def stop_all_cameras_sync(self):
+        for entity_id in list(self.players):
+            self.stop_camera(entity_id)
+
+    def get_player(self, entity_id: int) -> Optional[SyntheticPlayer]:
+        return self.players.get(entity_id)
+
+
+SYNTHETIC_CAMERAS = SyntheticCameraManager()
+
+
+class SyntheticCameraProcessor(esper.Processor):
+    """Renders every running `SyntheticCamera` from its ground truth pose at its frame rate.
+
+    Marker poses come from the ground truth stored on the camera (or the
+    current scene when none was captured). Markers on a robot follow the
+    robot's forward kinematics at its current joint values. The poses are
+    read here, the images are rendered by the camera's `SyntheticPlayer`.
+    """
+
+    def __init__(self):
+        self._last_render: Dict[int, float] = {}
+
+    @staticmethod
+    def key(entity_id: int):
+        return SyntheticCameraManager.key(entity_id)
+
+    def marker_poses(self, synthetic) -> list[tuple[np.ndarray, float, np.ndarray]]:
+        from waynon.components.aruco_marker import ArucoMarker
+        from waynon.components.robot import FrankaLink, Robot
+        from waynon.components.transform import Transform
+        from waynon.components.tree_utils import find_nearest_ancestor_with_component
+        from waynon.utils.aruco_textures import ARUCO_TEXTURES
+
+        link_transforms = {}
+        markers = []
+        for marker_id, (marker, transform) in esper.get_components(ArucoMarker, Transform):
+            image = ARUCO_TEXTURES.get_image(marker.id, marker.marker_dict)
+            link_id = find_nearest_ancestor_with_component(marker_id, FrankaLink)
+            X_PM = synthetic.get_marker_truth(marker_id)
+            if link_id is None:
+                X_WM = X_PM if X_PM is not None else transform.get_X_WT()
+            else:
+                link = esper.component_for_entity(link_id, FrankaLink)
+                if X_PM is None:
+                    X_WL = esper.component_for_entity(link_id, Transform).get_X_WT()
+                    X_PM = np.linalg.inv(X_WL) @ transform.get_X_WT()
+                robot_id = link.robot_id
+                if robot_id not in link_transforms:
+                    manager = esper.component_for_entity(robot_id, Robot).get_manager()
+                    X_WB = esper.component_for_entity(robot_id, Transform).get_X_WT()
+                    link_transforms[robot_id] = (X_WB, manager.fk(true_q(manager)))
+                X_WB, X_BLs = link_transforms[robot_id]
+                X_WM = X_WB @ X_BLs[link.link_name] @ X_PM
+            markers.append((image, marker.marker_length, X_WM))
+        return markers
+
+    def request(self, entity: int, camera, synthetic) -> dict:
+        """Everything `render_markers` needs for a frame of the scene as it is now"""
+        from waynon.components.scene_utils import rotate_around_x
+
+        X_WC = rotate_around_x(synthetic.get_X_WC(entity))  # to opencv
+        return dict(
+            K=camera.K(),
+            width=camera.width,
+            height=camera.height,
+            X_CW=np.linalg.inv(X_WC),
+            markers=self.marker_poses(synthetic),
+            background=synthetic.background,
+            blur_sigma=synthetic.blur_sigma,
+            noise_std=synthetic.noise_std,
+            capture_time=time.time(),
+        )
+
+    def process(self):
+        from waynon.components.camera import PinholeCamera
+        from waynon.components.synthetic_camera import SyntheticCamera
+
+        now = time.monotonic()
+        for entity, (camera, synthetic) in esper.get_components(PinholeCamera, SyntheticCamera):
+            player = SYNTHETIC_CAMERAS.get_player(entity)
+            if not synthetic.is_running():
+                if player is not None:
+                    SYNTHETIC_CAMERAS.stop_camera(entity)
+                continue
+            if player is None:
+                player = SYNTHETIC_CAMERAS.start_camera(entity)
+            data = FRAME_INGEST.take(self.key(entity))
+            if data is not None:
+                camera.update_image(data["color"], identifier=data["step_idx"])
+            if now - self._last_render.get(entity, 0.0) < 1.0 / synthetic.fps:
+                continue
+            self._last_render[entity] = now
+            player.submit(self.request(entity, camera, synthetic))
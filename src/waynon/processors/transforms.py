@@ -1,32 +1,31 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
-import numpy as np
 import esper
 
-from waynon.components.node import Node
-from waynon.components.transform import Transform
+from waynon.components.transform import Transform, TRANSFORM_INDEX, TRANSFORM_STORE
 from waynon.components.scene_utils import get_world_id
 
 class TransformProcessor(esper.Processor):
+    """Keeps the world matrices in TRANSFORM_STORE up to date.
 
-    @staticmethod
-    def refresh_transforms(node_id, X_WT = np.eye(4, dtype=np.float32), transform_parent_id = None, dirty = False):
-        assert esper.has_component(node_id, Node), f"Entity {node_id} does not have a Node component"
-        node = esper.component_for_entity(node_id, Node)
-        if esper.has_component(node_id, Transform):
-            transform = esper.component_for_entity(node_id, Transform)
-            dirty = dirty or transform._dirty
-            if dirty:
-                X_WT = X_WT @ transform.get_X_PT()
-                transform._X_WT = X_WT.flatten().tolist()
-                transform._dirty = False
-                if transform_parent_id is not None:
-                    transform._parent_id = transform_parent_id
-            X_WT = transform.get_X_WT()
-            transform_parent_id = node_id
+    The hierarchy is read from TRANSFORM_INDEX, which only holds entities with
+    a transform, and only when it or the set of transforms changed; otherwise
+    a frame costs one pass over the dirty slots.
+    """
 
-        for n in node.children:
-            TransformProcessor.refresh_transforms(n.entity_id, X_WT, transform_parent_id, dirty)
+    def __init__(self):
+        self._versions = None
 
     def process(self):        
-        TransformProcessor.refresh_transforms(get_world_id())
\ No newline at end of file
+        if not TRANSFORM_INDEX.valid:
+            TRANSFORM_INDEX.rebuild(get_world_id())
+        versions = (TRANSFORM_INDEX.version, TRANSFORM_STORE.version)
+        if versions != self._versions:
+            entity_ids, parent_ids = TRANSFORM_INDEX.hierarchy()
+            slots = {
+                e: esper.component_for_entity(e, Transform)._slot for e in entity_ids
+            }
+            parents = [slots[p] if p is not None else -1 for p in parent_ids]
+            TRANSFORM_STORE.set_hierarchy([slots[e] for e in entity_ids], parents)
+            self._versions = versions
+        TRANSFORM_STORE.update()
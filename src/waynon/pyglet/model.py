@@ -2,22 +2,41 @@
 
 from __future__ import annotations
 
+import ctypes
+import hashlib
+import os
+from functools import lru_cache
 from typing import TYPE_CHECKING
 
+import numpy as np
 import pyglet
 from pyglet import graphics
 from pyglet.math import Mat4
-import trimesh
 from pathlib import Path
 
 if TYPE_CHECKING:
     from pyglet.graphics import Group
     from pyglet.graphics.shader import ShaderProgram
 
+MESH_CACHE_VERSION = 1  # bump when the cached arrays change
+MESH_CACHE_PATH = Path(
+    os.environ.get(
+        "WAYNON_MESH_CACHE",
+        Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "waynon" / "meshes",
+    )
+)
+
+
+_default_shaders: dict = {}
+
 
 def get_default_shader() -> ShaderProgram:
-    return pyglet.gl.current_context.create_program((MaterialGroup.default_vert_src, 'vertex'),
-                                                    (MaterialGroup.default_frag_src, 'fragment'))
+    """The MaterialGroup program, compiled once per GL context"""
+    ctx = pyglet.gl.current_context
+    if ctx not in _default_shaders:
+        _default_shaders[ctx] = ctx.create_program((MaterialGroup.default_vert_src, 'vertex'),
+                                                   (MaterialGroup.default_frag_src, 'fragment'))
+    return _default_shaders[ctx]
 
 
 
@@ -93,15 +112,14 @@ class MaterialGroup(BaseMaterialGroup):
         self.program['model'] = self.matrix
         self.program['color'] = self.color
     
+    # The model matrix and color live in the group and change after it was
+    # added to a batch, so two groups are never interchangeable. Scene meshes
+    # that should share state are drawn with InstancedMesh instead.
     def __hash__(self) -> int:
-        return hash((self.program, self.order, self.parent))
+        return id(self)
 
     def __eq__(self, other) -> bool:
-        return False
-        return (self.__class__ is other.__class__ and
-                self.program == other.program and
-                self.order == other.order and
-                self.parent == other.parent)
+        return self is other
     
 
 def read_stl(
@@ -113,45 +131,251 @@ def read_stl(
     if not batch:
         batch = pyglet.graphics.Batch()
 
-    m = trimesh.load_mesh(filename)
-    faces = []
-    vertices = []
-    normals = []
-    colors = []
-
-    for v in m.vertices:
-        vertices.append(float(v[0]) * scale)
-        vertices.append(float(v[1]) * scale)
-        vertices.append(float(v[2]) * scale)
-        colors.append(float(color[0]))
-        colors.append(float(color[1]))
-        colors.append(float(color[2]))
-        colors.append(float(color[3]))
-
-    for f in m.faces:
-        faces.append(int(f[0]))
-        faces.append(int(f[1]))
-        faces.append(int(f[2]))
-    
-    vertex_normals = trimesh.geometry.mean_vertex_normals(len(m.vertices), m.faces, m.face_normals)
-    
-    for n in vertex_normals:
-        normals.append(float(n[0]))
-        normals.append(float(n[1]))
-        normals.append(float(n[2]))
-
+    vertices, normals, faces = load_mesh_arrays(filename)
+    count = len(vertices)
+    positions = (vertices * np.float32(scale)).ravel().tolist()
+    colors = np.tile(np.asarray(color, dtype=np.float32), count).tolist()
 
     vertex_lists = []
     groups = []
 
     program = get_default_shader()
     matgroup = MaterialGroup(program, parent=group)
-    vertex_lists.append(program.vertex_list_indexed(len(vertices)//3, pyglet.gl.GL_TRIANGLES, batch=batch, group=matgroup,
-                                            indices=faces,
-                                            position=('f', vertices),
-                                            normals=('f', normals),
+    vertex_lists.append(program.vertex_list_indexed(count, pyglet.gl.GL_TRIANGLES, batch=batch, group=matgroup,
+                                            indices=faces.ravel().tolist(),
+                                            position=('f', positions),
+                                            normals=('f', normals.ravel().tolist()),
                                             colors=('f', colors))
                                             )
     groups.append(matgroup)
 
-    return pyglet.model.Model(vertex_lists=vertex_lists, groups=groups, batch=batch)
\ No newline at end of file
+    return pyglet.model.Model(vertex_lists=vertex_lists, groups=groups, batch=batch)
+
+
+def _file_digest(filename: Path | str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _parse_mesh(filename: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    import trimesh
+
+    m = trimesh.load_mesh(filename)
+    vertices = np.asarray(m.vertices, dtype=np.float32)
+    normals = np.asarray(m.vertex_normals, dtype=np.float32)
+    faces = np.asarray(m.faces, dtype=np.uint32)
+    return vertices, normals, faces
+
+
+@lru_cache(maxsize=None)
+def _load_mesh_arrays(filename: str, digest: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    path = MESH_CACHE_PATH / f"{digest}.v{MESH_CACHE_VERSION}.npz"
+    res = None
+    try:
+        with np.load(path) as data:
+            res = data["vertices"], data["normals"], data["faces"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring damaged mesh cache {path}: {e}")
+    if res is None:
+        res = _parse_mesh(filename)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.savez(f, vertices=res[0], normals=res[1], faces=res[2])
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not cache mesh {filename}: {e}")
+    for array in res:
+        array.flags.writeable = False  # shared by every user of the file
+    return res
+
+
+def load_mesh_arrays(filename: Path | str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vertices (V, 3), vertex normals (V, 3) and triangle indices (F, 3) of a mesh file.
+
+    Parsed once, then read from `MESH_CACHE_PATH` where the arrays are stored
+    under the sha256 of the file, so an edited mesh is parsed again.
+    The arrays are read-only.
+    """
+    return _load_mesh_arrays(str(filename), _file_digest(filename))
+
+
+def _create_buffer(target, data: np.ndarray | None, usage):
+    gl = pyglet.gl
+    buffer = gl.GLuint()
+    gl.glGenBuffers(1, ctypes.byref(buffer))
+    gl.glBindBuffer(target, buffer)
+    if data is not None:
+        gl.glBufferData(target, data.nbytes, data.ctypes.data, usage)
+    return buffer
+
+
+class MeshGeometry:
+    """Vertex and index buffers of a mesh, positions and normals interleaved.
+
+    `get` uploads each file once per GL context, every `InstancedMesh` of the
+    file binds the same buffers in its own vertex array.
+    """
+
+    _shared: dict = {}
+
+    def __init__(self, vertices: np.ndarray, normals: np.ndarray, faces: np.ndarray):
+        gl = pyglet.gl
+        self.num_indices = int(np.asarray(faces).size)
+        vertex_data = np.ascontiguousarray(np.hstack([vertices, normals]), dtype=np.float32)
+        self.vertex_buffer = _create_buffer(gl.GL_ARRAY_BUFFER, vertex_data, gl.GL_STATIC_DRAW)
+        index_data = np.ascontiguousarray(faces, dtype=np.uint32)
+        self.index_buffer = _create_buffer(gl.GL_ELEMENT_ARRAY_BUFFER, index_data, gl.GL_STATIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    @classmethod
+    def get(cls, filename: Path | str) -> MeshGeometry:
+        key = (pyglet.gl.current_context, str(Path(filename).resolve()))
+        if key not in cls._shared:
+            cls._shared[key] = cls(*load_mesh_arrays(filename))
+        return cls._shared[key]
+
+    def bind(self):
+        """Attach the buffers to the bound vertex array, position at location 0 and normals at 1"""
+        gl = pyglet.gl
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertex_buffer)
+        stride = 6 * 4
+        for location, offset in ((0, 0), (1, 3 * 4)):
+            gl.glEnableVertexAttribArray(location)
+            gl.glVertexAttribPointer(location, 3, gl.GL_FLOAT, gl.GL_FALSE, stride, ctypes.c_void_p(offset))
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+
+
+class InstancedMesh:
+    """A mesh drawn any number of times with a single instanced draw call.
+
+    Every instance has its own model matrix and color, the color passed to
+    `draw` multiplies them. The vertex data is the shared `MeshGeometry` of
+    the file.
+    """
+
+    vert_src = """#version 330 core
+    layout(location = 0) in vec3 position;
+    layout(location = 1) in vec3 normals;
+    layout(location = 2) in vec4 instance_col0;
+    layout(location = 3) in vec4 instance_col1;
+    layout(location = 4) in vec4 instance_col2;
+    layout(location = 5) in vec4 instance_col3;
+    layout(location = 6) in vec4 instance_color;
+
+    out vec3 vertex_normals;
+    out vec4 vertex_color;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    void main()
+    {
+        mat4 model = mat4(instance_col0, instance_col1, instance_col2, instance_col3);
+        gl_Position = window.projection * window.view * model * vec4(position, 1.0);
+        // instances are rigid transforms, no need for the inverse transpose
+        vertex_normals = mat3(model) * normals;
+        vertex_color = instance_color;
+    }
+    """
+    frag_src = """#version 330 core
+    in vec3 vertex_normals;
+    in vec4 vertex_color;
+    out vec4 final_colors;
+
+    uniform vec4 color;
+
+    void main()
+    {
+        float ambientStrength = 0.3;
+        vec3 lightColor = vec3(1.0, 1.0, 1.0);
+        vec3 ambient = ambientStrength * lightColor;
+
+        vec3 sun_direction = normalize(vec3(1.0, 1.0, 1.0));
+        float diff = max(dot(normalize(vertex_normals), sun_direction), 0.0);
+        vec3 diffuse = diff * lightColor;
+
+        vec4 c = color * vertex_color;
+        vec3 result = (ambient + diffuse) * c.rgb;
+        final_colors = vec4(result, c.a);
+    }
+    """
+
+    _programs: dict = {}
+
+    @classmethod
+    def get_program(cls) -> ShaderProgram:
+        ctx = pyglet.gl.current_context
+        if ctx not in cls._programs:
+            cls._programs[ctx] = ctx.create_program((cls.vert_src, "vertex"), (cls.frag_src, "fragment"))
+        return cls._programs[ctx]
+
+    def __init__(self, geometry: MeshGeometry):
+        gl = pyglet.gl
+        self.geometry = geometry
+        self.program = self.get_program()
+        self.num_indices = geometry.num_indices
+        self.num_instances = 0
+
+        self.vao = gl.GLuint()
+        gl.glGenVertexArrays(1, ctypes.byref(self.vao))
+        gl.glBindVertexArray(self.vao)
+        geometry.bind()
+
+        self._instance_buffer = _create_buffer(gl.GL_ARRAY_BUFFER, None, gl.GL_DYNAMIC_DRAW)
+        # per instance: the 4 columns of the model matrix, then the color
+        stride = 20 * 4
+        for i in range(5):
+            location = 2 + i
+            gl.glEnableVertexAttribArray(location)
+            gl.glVertexAttribPointer(location, 4, gl.GL_FLOAT, gl.GL_FALSE, stride, ctypes.c_void_p(16 * i))
+            gl.glVertexAttribDivisor(location, 1)
+
+        gl.glBindVertexArray(0)
+
+    @classmethod
+    def from_file(cls, filename: Path | str) -> InstancedMesh:
+        return cls(MeshGeometry.get(filename))
+
+    def set_instances(self, matrices: np.ndarray, colors: np.ndarray | None = None):
+        """Upload one (4, 4) model matrix per instance, shape (N, 4, 4), and
+        optionally one rgba color per instance, shape (N, 4)"""
+        gl = pyglet.gl
+        matrices = np.asarray(matrices)
+        data = np.ones((len(matrices), 20), dtype=np.float32)
+        # opengl wants the columns contiguous
+        data[:, :16] = np.transpose(matrices, (0, 2, 1)).reshape(len(matrices), 16)
+        if colors is not None:
+            data[:, 16:] = colors
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instance_buffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, data.ctypes.data if data.nbytes else None, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self.num_instances = len(data)
+
+    def draw(self, color: tuple[float, float, float, float] = (1.0, 1.0, 1.0, 1.0)):
+        if self.num_instances == 0:
+            return
+        gl = pyglet.gl
+        self.program.use()
+        self.program["color"] = color
+        gl.glBindVertexArray(self.vao)
+        gl.glDrawElementsInstanced(
+            gl.GL_TRIANGLES, self.num_indices, gl.GL_UNSIGNED_INT, None, self.num_instances
+        )
+        gl.glBindVertexArray(0)
+        self.program.stop()
+
+    def delete(self):
+        """Free the instance buffer, the geometry stays shared"""
+        gl = pyglet.gl
+        gl.glDeleteBuffers(1, ctypes.byref(self._instance_buffer))
+        gl.glDeleteVertexArrays(1, ctypes.byref(self.vao))
@@ -72,11 +72,13 @@ class FactorGraphSolver:
         self.factors = []
 
     async def run(self, factor_graph_id: int):
-        from waynon.components.aruco_measurement import ArucoMeasurement
+        from waynon.components.aruco_measurement import ARUCO_TABLE, ArucoDetection
         from waynon.components.camera import PinholeCamera
         from waynon.components.factor_graph import FactorGraph
+        from waynon.components.image_measurement import ImageMeasurement
         from waynon.components.joint_measurement import JointMeasurement
         from waynon.components.measurement import Measurement
+        from waynon.components.measurement_store import materialize_measurements
         from waynon.components.optimizable import Optimizable
         from waynon.components.robot import FrankaLink, Robot
         from waynon.components.transform import Transform
@@ -84,20 +86,45 @@ class FactorGraphSolver:
         assert esper.entity_exists(factor_graph_id)
         assert esper.has_component(factor_graph_id, FactorGraph)
         factor_graph = esper.component_for_entity(factor_graph_id, FactorGraph)
+        materialize_measurements()
 
         initial_values = Values(epsilon=sf.numeric_epsilon)
         optimized_keys_to_entity_id = {}
 
-        factors = []
-        num_measurements = 0
-        for aruco_measurement_id, aruco_measurement in esper.get_component(
-            ArucoMeasurement
-        ):
-            # go up the graph to find holding measurement
-            measurement_id = find_nearest_ancestor_with_component(
-                aruco_measurement_id, Measurement
+        # Forward kinematics of every joint measurement in one batch per robot,
+        # measurements that share joint values are only computed once
+        joint_measurements_by_robot = {}
+        for joint_measurement_id, joint_measurement in esper.get_component(JointMeasurement):
+            joint_measurements_by_robot.setdefault(joint_measurement.robot_id, []).append(
+                (joint_measurement_id, joint_measurement.joint_values)
             )
+        link_transforms = {}
+        for robot_id, entries in joint_measurements_by_robot.items():
+            if not esper.entity_exists(robot_id) or not esper.has_component(robot_id, Robot):
+                continue
+            manager = esper.component_for_entity(robot_id, Robot).get_manager()
+            link_names = manager.link_names()
+            X_BLs = manager.fk_batch(np.array([q for _, q in entries]))
+            for (joint_measurement_id, _), X_BL in zip(entries, X_BLs):
+                link_transforms[joint_measurement_id] = dict(zip(link_names, X_BL))
+
+        # Detections are rows of the detection table owned by their image, the
+        # corners of an image are read in one slice
+        detections = []
+        for image_id, image_measurement in esper.get_component(ImageMeasurement):
+            rows = image_measurement.aruco_rows()
+            if len(rows) == 0:
+                continue
+            # go up the graph to find holding measurement
+            measurement_id = find_nearest_ancestor_with_component(image_id, Measurement)
             assert measurement_id is not None
+            pixels = ARUCO_TABLE.pixels[rows].tolist()
+            for row, corners in zip(rows.tolist(), pixels):
+                detections.append((measurement_id, row, ArucoDetection(image_id, row), corners))
+
+        factors = []
+        num_measurements = 0
+        for measurement_id, row, aruco_measurement, corners in detections:
             name = get_node(measurement_id).name
             # if name != "Left Camera 32" and name != "Left Camera 33":
             #     continue
@@ -120,8 +147,6 @@ class FactorGraphSolver:
                 robot_id = find_nearest_ancestor_with_component(marker_entity_id, Robot)
                 assert robot_id is not None
 
-                robot = esper.component_for_entity(robot_id, Robot)
-
                 # Check we have a joint measurement associated with this robot
                 joint_measurement_id = find_child_with_component(
                     measurement_id,
@@ -197,8 +222,7 @@ class FactorGraphSolver:
                 link = esper.component_for_entity(link_id, FrankaLink)
                 link_key = link.link_name
                 robot_pose_key = f"X_W{link_key}_{joint_measurement_id}"
-                q = joint_measurement.joint_values
-                X_WR = robot.get_manager().fk(q)[link_key]
+                X_WR = link_transforms[joint_measurement_id][link_key]
                 initial_values[robot_pose_key] = to_sym_pose(X_WR)
 
                 # Now do every corner
@@ -211,10 +235,9 @@ class FactorGraphSolver:
 
                     # Pixel Measurment (2D)
                     pixel_measurement_key = (
-                        f"pixel_{measurement_id}_{aruco_measurement_id}_{i}"
+                        f"pixel_{measurement_id}_{row}_{i}"
                     )
-                    point = aruco_measurement.pixels[i]
-                    initial_values[pixel_measurement_key] = sf.V2(point)
+                    initial_values[pixel_measurement_key] = sf.V2(corners[i])
 
                     factor = Factor(
                         residual=eye_to_hand_residual,
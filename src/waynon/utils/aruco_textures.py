@@ -1,20 +1,30 @@
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
 from typing import Dict
-import cv2
-import cv2.aruco as aruco
 import marsoom.texture
+import numpy as np
 
 class ArucoTextures:
     
     def __init__(self):
         self.textures: Dict[int, marsoom.texture.Texture] = {}
+        self.images: Dict[int, np.ndarray] = {}
+
+    def get_image(self, marker_id: int, aruco_dict: int) -> np.ndarray:
+        """Marker image as a (256, 256) uint8 array, generated once per id and dict"""
+        if (marker_id, aruco_dict) not in self.images:
+            import cv2.aruco as aruco
+
+            dictionary = aruco.getPredefinedDictionary(aruco_dict)
+            self.images[(marker_id, aruco_dict)] = aruco.generateImageMarker(dictionary, int(marker_id), 256)
+        return self.images[(marker_id, aruco_dict)]
     
     def get_texture(self, marker_id: int, aruco_dict: int):
         if (marker_id, aruco_dict) not in self.textures:
+            import cv2
+
             texture = marsoom.texture.Texture(1280, 720)
-            dictionary = aruco.getPredefinedDictionary(aruco_dict)
-            marker_img = aruco.generateImageMarker(dictionary, int(marker_id), 256)
+            marker_img = self.get_image(marker_id, aruco_dict)
             marker_img = cv2.cvtColor(marker_img, cv2.COLOR_GRAY2RGB)
             marker_img = marker_img.astype("float32") / 255.0
             texture.copy_from_host(marker_img)
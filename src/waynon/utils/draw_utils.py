@@ -2,62 +2,84 @@ import pyglet
 # Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
 
 import numpy as np
-import pinocchio as pin
 
 import marsoom
 
 from waynon.utils.utils import static, one_at_a_time, COLORS, ASSET_PATH
+from waynon.utils.kinematics import PANDA_LINKS, panda_kinematics
+from waynon.pyglet.model import InstancedMesh
+
+@static(kinematics = None)
+def get_kinematics():
+    static = get_kinematics
+    if static.kinematics is None:
+        static.kinematics = panda_kinematics()
+    return static.kinematics
 
-@static(model = None, data = None, last_q = None)
 def fk(q: np.ndarray, gripper_width = 0.0) -> list[np.ndarray]: 
     assert len(q) == 7
+    res = get_kinematics().fk(q)
+    return [res[link] for link in PANDA_LINKS]
 
-    static = fk
-    if static.model is None:
-        urdf_path = ASSET_PATH / "robots" / "panda" / "panda.urdf"
-        static.model = pin.buildModelFromUrdf(str(urdf_path))
-        static.data = static.model.createData()
-
-    q = np.append(q, [0.01, 0.01])
-    d = static.data
-    m = static.model
+def fk_batch(qs: np.ndarray) -> np.ndarray:
+    # (N, 7) -> (N, L, 4, 4), links ordered like PANDA_LINKS
+    return get_kinematics().fk_batch(qs)
 
-    if static.last_q is None or not np.allclose(static.last_q, q):
-        pin.forwardKinematics(m, d, q)
-        pin.updateFramePlacements(m, d)
-        static.last_q = q
-
-    res = [d.oMf[i].homogeneous for i in [
-        m.getFrameId("panda_link0"),
-        m.getFrameId("panda_link1"),
-        m.getFrameId("panda_link2"),
-        m.getFrameId("panda_link3"),
-        m.getFrameId("panda_link4"),
-        m.getFrameId("panda_link5"),
-        m.getFrameId("panda_link6"),
-        m.getFrameId("panda_link7"),
-        m.getFrameId("panda_hand"),
-        m.getFrameId("panda_leftfinger"),
-        m.getFrameId("panda_rightfinger")]]
-    return res
-
-@static(models = None, batch = None)
-def draw_robot(q, color=COLORS["PURPLE"]):
-    static = draw_robot
+@static(meshes = None)
+def draw_link_transforms(res, color=COLORS["PURPLE"]):
+    # res holds one list of link transforms (ordered like PANDA_LINKS) per robot to draw
+    static = draw_link_transforms
     names = ["link0", "link1", "link2", "link3", "link4", "link5", "link6", "link7", "hand"]#, "finger", "finger"]
-    if static.models is None:
-        static.models = {}
-        batch = pyglet.graphics.Batch()    
-        for name in names:
-            static.models[name] = pyglet.resource.model(f"robots/panda/meshes/{name}.stl", batch=batch)
-        static.batch = batch
-
-    batch = static.batch
-    res = fk(q)
+    if static.meshes is None:
+        static.meshes = {
+            name: InstancedMesh.from_file(ASSET_PATH / "robots" / "panda" / "meshes" / f"{name}.stl")
+            for name in names
+        }
+
+    if len(res) == 0:
+        return
+    # one instanced draw per link for all robots
+    transforms = np.asarray(res, dtype=np.float64).reshape(len(res), -1, 4, 4)
     for i, name in enumerate(names):
-        static.models[name].matrix = pyglet.math.Mat4(res[i].T.flatten().tolist())
-        static.models[name].color = color
-    batch.draw()
+        static.meshes[name].set_instances(transforms[:, i])
+        static.meshes[name].draw(color)
+
+def draw_robot(q, color=COLORS["PURPLE"]):
+    draw_link_transforms([fk(q)], color)
+
+class RobotGhosts:
+    """Draws many configurations of the robot with one instanced draw per link mesh.
+
+    Link transforms come from batched FK and are only recomputed and uploaded
+    when the configurations or the base transform change.
+    """
+    names = ["link0", "link1", "link2", "link3", "link4", "link5", "link6", "link7", "hand"]
+
+    def __init__(self):
+        self.meshes = None
+        self._key = None
+
+    def update(self, qs, X_WB: np.ndarray):
+        qs = np.asarray(qs, dtype=np.float64).reshape(len(qs), -1)
+        X_WB = np.asarray(X_WB, dtype=np.float64)
+        key = (qs.tobytes(), X_WB.tobytes())
+        if key == self._key:
+            return
+        self._key = key
+        X_BLs = fk_batch(qs)
+        X_WLs = X_WB @ X_BLs
+        for i, name in enumerate(self.names):
+            self.meshes[name].set_instances(X_WLs[:, i])
+
+    def draw(self, qs, X_WB: np.ndarray = np.eye(4), color=COLORS["PURPLE"]):
+        if self.meshes is None:
+            self.meshes = {
+                name: InstancedMesh.from_file(ASSET_PATH / "robots" / "panda" / "meshes" / f"{name}.stl")
+                for name in self.names
+            }
+        self.update(qs, X_WB)
+        for mesh in self.meshes.values():
+            mesh.draw(color)
 
 @static(model = None, batch = None, shape=None)
 def draw_axis(matrix):
@@ -0,0 +1,52 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+"""The one place that relies on esper internals.
+
+Keeping entity ids stable across save and load needs to hand out a chosen
+id, and building many entities at once should clear esper's query cache
+only once; esper has no public API for either. The shim is checked against
+the esper 3.x module layout (`_entities`, `_components`, `_dead_entities`,
+`_entity_count`); on any other version both fall back to the public API:
+`create_entity_with_id` hands out a fresh id, which the caller can see,
+and `add_components_deferred` clears the cache per component.
+"""
+
+import itertools
+from importlib.metadata import PackageNotFoundError, version
+
+import esper
+
+try:
+    ESPER_VERSION = version("esper")
+except PackageNotFoundError:
+    ESPER_VERSION = "unknown"
+
+INTERNALS_SUPPORTED = ESPER_VERSION.split(".")[0] == "3" and all(
+    hasattr(esper, name) for name in ("_entities", "_components", "_dead_entities", "_entity_count")
+)
+
+
+def create_entity_with_id(entity_id: int) -> int:
+    """An empty entity with the given id if possible, otherwise a new one.
+
+    Ids handed out by esper afterwards continue after the largest one.
+    """
+    if not INTERNALS_SUPPORTED or esper.entity_exists(entity_id):
+        return esper.create_entity()
+    esper._entities[entity_id] = {}
+    esper._dead_entities.discard(entity_id)
+    esper._entity_count = itertools.count(max(entity_id + 1, next(esper._entity_count)))
+    return entity_id
+
+
+def add_components_deferred(entity_id: int, *components):
+    """`esper.add_component` for each component without clearing the query
+    cache, the caller clears it once with `esper.clear_cache()`."""
+    if not INTERNALS_SUPPORTED:
+        for component in components:
+            esper.add_component(entity_id, component)
+        return
+    for component in components:
+        component_type = type(component)
+        esper._components.setdefault(component_type, set()).add(entity_id)
+        esper._entities[entity_id][component_type] = component
@@ -0,0 +1,106 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import errno
+import hashlib
+import io
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FICLONE = 0x40049409  # linux ioctl to share the blocks of a file (btrfs, xfs, ...)
+
+
+class ImageStore:
+    """Content-addressed image files shared by every scene.
+
+    Images are stored once as `<root>/<ab>/<sha256>.png`, keyed by the hash
+    of the encoded file, and scenes only keep the hash. Saving a scene under
+    a new name copies nothing and identical captures are stored once.
+    `link_mode` controls how scenes also get a file at their own
+    `data/<image_path>`, so a scene folder stays self-contained: "hardlink"
+    (copied across file systems), "reflink", "copy" or "none".
+    """
+
+    def __init__(self, root: Path, link_mode: str = "hardlink"):
+        self.root = Path(root).expanduser().resolve()
+        self.link_mode = link_mode
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.png"
+
+    def has(self, digest: str) -> bool:
+        return bool(digest) and self.path(digest).exists()
+
+    def _put_bytes(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return digest
+
+    def put_image(self, image: np.ndarray) -> str:
+        """Encode `image` as png and store it, returns its hash. Blocking, call from a worker thread."""
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format="png")
+        return self._put_bytes(buffer.getvalue())
+
+    def put_file(self, file: Path) -> str:
+        """Add an existing png, linked instead of copied where possible"""
+        file = Path(file)
+        h = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            link_file(file, path, "hardlink")
+        return digest
+
+    def materialize(self, digest: str, dest: Path, mode: str | None = None):
+        """Give the stored image a path of its own at `dest`"""
+        mode = self.link_mode if mode is None else mode
+        dest = Path(dest)
+        if mode == "none" or dest.exists():
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        link_file(self.path(digest), dest, mode)
+
+
+def link_file(src: Path, dest: Path, mode: str):
+    """Hardlink, reflink or copy `src` to `dest`, falling back to a copy"""
+    tmp = Path(f"{dest}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        if mode == "hardlink":
+            os.link(src, tmp)
+        elif mode == "reflink":
+            import fcntl
+
+            with open(src, "rb") as s, open(tmp, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        else:
+            shutil.copyfile(src, tmp)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL, errno.EPERM, errno.ENOTTY, errno.EMLINK):
+            raise
+        # other file system, or no support for links there
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+IMAGE_STORE_PATH = Path(
+    os.environ.get(
+        "WAYNON_IMAGE_STORE",
+        Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "waynon" / "images",
+    )
+)
+IMAGE_STORE = ImageStore(IMAGE_STORE_PATH, os.environ.get("WAYNON_IMAGE_LINK_MODE", "hardlink"))
@@ -0,0 +1,170 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict
+
+import numpy as np
+
+from waynon.utils.utils import ASSET_PATH
+
+if TYPE_CHECKING:
+    import pinocchio as pin
+
+PANDA_URDF = ASSET_PATH / "robots" / "panda" / "panda.urdf"
+PANDA_LINKS = [
+    "panda_link0",
+    "panda_link1",
+    "panda_link2",
+    "panda_link3",
+    "panda_link4",
+    "panda_link5",
+    "panda_link6",
+    "panda_link7",
+    "panda_hand",
+    "panda_leftfinger",
+    "panda_rightfinger",
+]
+PANDA_FINGER_Q = (0.01, 0.01)
+
+class ModelRegistry:
+    """Process-wide cache of parsed URDF models.
+
+    Models are keyed by the resolved path and the sha256 of the file, so all
+    robots of one type share a model while an edited URDF is parsed again.
+    Models are read-only once parsed; every user creates its own `pin.Data`.
+    """
+
+    def __init__(self):
+        self._models: Dict[tuple[str, str], pin.Model] = {}
+        self._digests: Dict[str, tuple[float, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, urdf_path: Path) -> str:
+        """sha256 of the file, only recomputed when its mtime or size changes"""
+        path = Path(urdf_path).resolve()
+        stat = path.stat()
+        cached = self._digests.get(str(path))
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._digests[str(path)] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    def get(self, urdf_path: Path) -> "pin.Model":
+        import pinocchio as pin
+
+        path = Path(urdf_path).resolve()
+        assert path.exists(), f"urdf_path {path} does not exist"
+        with self._lock:
+            key = (str(path), self.digest(path))
+            if key not in self._models:
+                self._models[key] = pin.buildModelFromUrdf(str(path))
+            return self._models[key]
+
+    def create_data(self, urdf_path: Path) -> "pin.Data":
+        return self.get(urdf_path).createData()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._digests.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def load_model(urdf_path: Path) -> "pin.Model":
+    """The pinocchio model of `urdf_path`, parsed once per process"""
+    return MODEL_REGISTRY.get(urdf_path)
+
+
+class Kinematics:
+    """Forward kinematics for a fixed list of links.
+
+    The model is shared, the pinocchio data is per instance. Frame ids and the
+    link index table are resolved once and the last result is reused while `q`
+    stays within `tolerance` of the last configuration. Without `links` every
+    body frame of the URDF is used.
+    """
+
+    def __init__(
+        self,
+        urdf_path: Path,
+        links: list[str] | None = None,
+        fixed_q: tuple[float, ...] = (),
+        tolerance: float = 1e-6,
+    ):
+        import pinocchio as pin
+
+        self.model = load_model(urdf_path)
+        self.data = self.model.createData()
+        if links is None:
+            links = [f.name for f in self.model.frames if f.type == pin.FrameType.BODY]
+        self.links = list(links)
+        self.link_index = {link: i for i, link in enumerate(self.links)}
+        self.frame_ids = [self.model.getFrameId(link) for link in self.links]
+        self.fixed_q = np.asarray(fixed_q, dtype=np.float64)
+        self.nq = self.model.nq - len(self.fixed_q)
+        self.tolerance = tolerance
+        self._last_q = None
+        self._last_array = None
+        self._last_transforms = None
+
+    def neutral(self) -> np.ndarray:
+        import pinocchio as pin
+
+        return pin.neutral(self.model)[: self.nq]
+
+    def fk_array(self, q) -> np.ndarray:
+        """Link transforms in the base frame, (L, 4, 4) ordered like `self.links`. Do not modify the result."""
+        import pinocchio as pin
+
+        q = np.asarray(q, dtype=np.float64)
+        if self._last_q is not None and np.max(np.abs(q - self._last_q)) <= self.tolerance:
+            return self._last_array
+        pin.forwardKinematics(self.model, self.data, np.concatenate([q, self.fixed_q]))
+        pin.updateFramePlacements(self.model, self.data)
+        oMf = self.data.oMf
+        res = np.empty((len(self.links), 4, 4))
+        for j, frame_id in enumerate(self.frame_ids):
+            res[j] = oMf[frame_id].homogeneous
+        self._last_array = res
+        self._last_transforms = None
+        self._last_q = q.copy()
+        return res
+
+    def fk(self, q) -> Dict[str, np.ndarray]:
+        """Link name to its transform in the base frame. Do not modify the result."""
+        res = self.fk_array(q)
+        if self._last_transforms is None:
+            self._last_transforms = dict(zip(self.links, res))
+        return self._last_transforms
+
+    def fk_batch(self, qs) -> np.ndarray:
+        """Link transforms for every row of `qs` (N, nq), shape (N, L, 4, 4).
+
+        Links are ordered like `self.links`. Identical rows are only computed once.
+        """
+        import pinocchio as pin
+
+        qs = np.asarray(qs, dtype=np.float64)
+        qs = qs.reshape(len(qs), -1)
+        res = np.empty((len(qs), len(self.links), 4, 4))
+        if len(qs) == 0:
+            return res
+        unique, inverse = np.unique(qs, axis=0, return_inverse=True)
+        transforms = np.empty((len(unique), len(self.links), 4, 4))
+        oMf = self.data.oMf
+        for i, q in enumerate(unique):
+            pin.forwardKinematics(self.model, self.data, np.concatenate([q, self.fixed_q]))
+            pin.updateFramePlacements(self.model, self.data)
+            for j, frame_id in enumerate(self.frame_ids):
+                transforms[i, j] = oMf[frame_id].homogeneous
+        res[:] = transforms[inverse.reshape(-1)]
+        return res
+
+
+def panda_kinematics() -> Kinematics:
+    return Kinematics(PANDA_URDF, PANDA_LINKS, PANDA_FINGER_Q)
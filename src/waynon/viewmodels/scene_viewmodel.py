@@ -5,6 +5,7 @@ import trio
 from imgui_bundle import icons_fontawesome_6 as icons
 from imgui_bundle import imgui
 
+from waynon.components.collector import MeasurementGroup
 from waynon.components.component import Component
 from waynon.components.node import Node
 from waynon.components.scene_utils import (deselect_all, get_collector_id,
@@ -62,7 +63,8 @@ class SceneViewModel:
     def traverse_tree(self, entity_id: int):
 
         node = esper.component_for_entity(entity_id, Node)
-        is_leaf = not node.children
+        group = esper.try_component(entity_id, MeasurementGroup)
+        is_leaf = not node.children and not (group and group.is_pending())
         selected = is_selected(entity_id)
         flags = (
             imgui.TreeNodeFlags_.open_on_arrow.value
@@ -103,6 +105,8 @@ class SceneViewModel:
                 component.draw_context(self.nursery, entity_id)
             imgui.end_popup()
         if node.opened:
+            if group:
+                group.materialize(entity_id)
             self.render_node(entity_id)
             for child in node.children:
                 self.traverse_tree(child.entity_id)
@@ -12,11 +12,10 @@ from PIL import Image
 import pyglet
 
 from waynon.components.aruco_marker import ArucoMarker
-from waynon.components.aruco_measurement import ArucoMeasurement
 from waynon.components.camera import PinholeCamera
 from waynon.components.image_measurement import ImageMeasurement
 from waynon.components.measurement import Measurement
-from waynon.components.scene_utils import get_relative_transform_X_TS, rotate_around_x, get_data_path
+from waynon.components.scene_utils import get_relative_transform_X_TS, rotate_around_x
 from waynon.components.transform import Transform
 from waynon.components.tree_utils import *
 
@@ -33,11 +32,20 @@ class Viewer2DViewModel:
     def draw(self):
 
         imgui.begin("2D Viewer")
+        self._sync_camera_texture()
         # set texture to not repeat
         self.viewer_2d.draw()
         self._draw_image_measurement()
         imgui.end()
 
+    def _sync_camera_texture(self):
+        if self.current_entity_id is None or not esper.entity_exists(
+            self.current_entity_id
+        ):
+            return
+        if esper.has_component(self.current_entity_id, PinholeCamera):
+            esper.component_for_entity(self.current_entity_id, PinholeCamera).sync_texture()
+
     def _on_image_viewer(self, entity_id):
         if esper.entity_exists(entity_id):
             if esper.has_component(entity_id, PinholeCamera):
@@ -52,8 +60,7 @@ class Viewer2DViewModel:
                 raw_measurement = esper.component_for_entity(
                     entity_id, ImageMeasurement
                 )
-                print(get_data_path())
-                image_path = get_data_path() / raw_measurement.image_path
+                image_path = raw_measurement.get_image_file()
                 print(image_path)
                 if Path(image_path).exists():
                     image = Image.open(image_path)
@@ -73,22 +80,15 @@ class Viewer2DViewModel:
         image_measurement = esper.component_for_entity(
             self.current_entity_id, ImageMeasurement
         )
-        aruco_measurement_ids = find_children_with_component(
-            self.current_entity_id, ArucoMeasurement
-        )
         v = self.viewer_2d
-        for aruco_measurement_id in aruco_measurement_ids:
-            aruco_measurement = esper.component_for_entity(
-                aruco_measurement_id, ArucoMeasurement
-            )
-            pixels = aruco_measurement.pixels
-            v.polyline([*pixels, pixels[0]], color=(1, 0, 0, 1), thickness=2)
-            for i, corner in enumerate(pixels):
+        for aruco_measurement in image_measurement.get_aruco_detections():
+            corners = aruco_measurement.pixels.tolist()
+            v.polyline([*corners, corners[0]], color=(1, 0, 0, 1), thickness=2)
+            for i, corner in enumerate(corners):
                 if v.circle(corner, color=(0, 1, 0, 1), thickness=1):
                     if imgui.is_mouse_down(0):
                         new_pos = v.get_mouse_position()
-                        pixels[i][0] = float(new_pos[0])
-                        pixels[i][1] = float(new_pos[1])
+                        aruco_measurement.set_corner(i, (float(new_pos[0]), float(new_pos[1])))
 
             marker_entity_id = aruco_measurement.marker_entity_id
             camera_entity_id = aruco_measurement.camera_entity_id
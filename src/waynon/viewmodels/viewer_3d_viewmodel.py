@@ -18,8 +18,11 @@ from waynon.components.renderable import (
     CameraWireframe,
     ArucoDrawable,
     StructuredPointCloud,
+    SCENE_RENDERER,
 )
 from waynon.components.aruco_marker import ArucoMarker
+from waynon.components.camera import PinholeCamera
+from waynon.components.pose_group import PoseGroup
 from waynon.utils.draw_utils import draw_axis, draw_robot
 
 
@@ -33,6 +36,7 @@ class Viewer3DViewModel:
         self.guizmo_frame = guizmo.MODE.local
         self.viewer_3d = self.window.create_3D_viewer()
         self.modifiable_transform = None
+        self._modifiable_entity_id = None
         self._draw_callbacks = []
 
         esper.set_handler("modify_transform", self._handle_transform_selected)
@@ -90,6 +94,7 @@ class Viewer3DViewModel:
         assert esper.has_component(entity_id, Transform)
         transform = esper.component_for_entity(entity_id, Transform)
         self.modifiable_transform = transform
+        self._modifiable_entity_id = entity_id
 
     def _go_to_view(self, view):
         X_WV, fl_x, fl_y, cx, cy, width, height = view
@@ -98,16 +103,18 @@ class Viewer3DViewModel:
     def _draw_guizmo(self):
         if self.modifiable_transform is not None:
             guizmo.set_id(0)
-            if not self.modifiable_transform._dirty:
+            if not self.modifiable_transform.is_dirty():
                 X_WT = self.modifiable_transform.get_X_WT()
                 changed, X_WT = self.viewer_3d.manipulate(
                     X_WT, self.guizmo_operation, self.guizmo_frame
                 )
-                self.modifiable_transform.set_X_WT(X_WT)
+                if changed:
+                    self.modifiable_transform.set_X_WT(X_WT)
 
     def _draw_everything(self):
-        for entity, (transform, drawable) in esper.get_components(Transform, Mesh):
-            drawable.draw()
+        SCENE_RENDERER.draw_meshes(
+            drawable for entity, (transform, drawable) in esper.get_components(Transform, Mesh)
+        )
         for entity, (transform, drawable) in esper.get_components(Transform, ImageQuad):
             drawable.draw()
         for entity, (transform, drawable) in esper.get_components(
@@ -117,13 +124,20 @@ class Viewer3DViewModel:
         for entity, (transform, drawable) in esper.get_components(
             Transform, CameraWireframe
         ):
+            if drawable.alpha > 0.0 and esper.has_component(entity, PinholeCamera):
+                esper.component_for_entity(entity, PinholeCamera).sync_texture()
             drawable.draw()
         for entity, (transform, drawable) in esper.get_components(
             Transform, StructuredPointCloud
         ):
             if drawable.show_pointcloud:
+                if esper.has_component(entity, PinholeCamera):
+                    esper.component_for_entity(entity, PinholeCamera).sync_texture()
                 pyglet.gl.glPointSize(3)
                 drawable.draw()
+        for entity, group in esper.get_component(PoseGroup):
+            if group.show_poses:
+                group.draw_poses(entity)
 
     def _draw_transforms(self):
         for entity, transform in esper.get_component(Transform):
@@ -0,0 +1,28 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import esper
+import pytest
+
+from waynon.components.aruco_measurement import ARUCO_TABLE
+from waynon.components.journal import JOURNAL
+from waynon.components.transform import TRANSFORM_INDEX, TRANSFORM_STORE
+
+
+def reset_scene():
+    esper.clear_database()
+    esper.clear_cache()
+    TRANSFORM_STORE.clear()
+    ARUCO_TABLE.clear()
+    TRANSFORM_INDEX.invalidate()
+    JOURNAL.close()
+
+
+@pytest.fixture
+def root_id():
+    """An empty scene with only the root node"""
+    from waynon.components.scene_utils import create_root
+
+    reset_scene()
+    root_id, _ = create_root()
+    yield root_id
+    reset_scene()
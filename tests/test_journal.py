@@ -0,0 +1,115 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import json
+
+import esper
+
+from waynon.components.journal import JOURNAL, JOURNAL_NAME, SceneJournal
+from waynon.components.simple import Deletable, Pose
+from waynon.components.tree_utils import create_entity, sort_children
+
+
+def write_records(path, records, tail=""):
+    with open(path / JOURNAL_NAME, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def test_replay_applies_records_in_order(tmp_path):
+    manifest = {"1": {"Node": {"name": "a"}}, "2": {"Node": {"name": "b"}}}
+    write_records(
+        tmp_path,
+        [
+            {"op": "put", "id": 1, "components": {"Node": {"name": "renamed"}}},
+            {"op": "put", "id": 3, "components": {"Node": {"name": "new"}}},
+            {"op": "del", "id": 2},
+            {"op": "unpack", "id": 7},
+            {"op": "del", "id": 3},
+        ],
+    )
+    unpacked, num_records = SceneJournal().replay(tmp_path, manifest)
+    assert manifest == {"1": {"Node": {"name": "renamed"}}}
+    assert unpacked == {7}
+    assert num_records == 5
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    manifest = {}
+    write_records(
+        tmp_path,
+        [{"op": "put", "id": 1, "components": {}}],
+        tail='{"op": "put", "id": 2, "compo',
+    )
+    unpacked, num_records = SceneJournal().replay(tmp_path, manifest)
+    assert manifest == {"1": {}}
+    assert unpacked == set()
+    assert num_records == 1
+
+
+def test_replay_without_journal(tmp_path):
+    manifest = {"1": {}}
+    assert SceneJournal().replay(tmp_path, manifest) == (set(), 0)
+    assert manifest == {"1": {}}
+
+
+def test_flush_then_replay_and_truncate(tmp_path, root_id):
+    journal = SceneJournal()
+    journal.open(tmp_path)
+    kept = esper.create_entity(Deletable())
+    deleted = esper.create_entity(Deletable())
+    journal.mark(kept)
+    journal.mark(deleted)
+    journal.unpack(root_id)
+    esper.delete_entity(deleted, immediate=True)
+    assert journal.has_changes()
+    journal.flush()
+    assert not journal.has_changes()
+    assert journal.num_records == 3
+
+    manifest = {str(deleted): {"Deletable": {}}}
+    unpacked, num_records = SceneJournal().replay(tmp_path, manifest)
+    assert manifest == {str(kept): {"Deletable": {}}}
+    assert unpacked == {root_id}
+    assert num_records == 3
+
+    journal.truncate()
+    assert journal.num_records == 0
+    assert (tmp_path / JOURNAL_NAME).read_text() == ""
+    assert SceneJournal().replay(tmp_path, {}) == (set(), 0)
+
+
+def test_closed_journal_ignores_changes(tmp_path, root_id):
+    journal = SceneJournal()
+    journal.mark(root_id)
+    journal.unpack(root_id)
+    journal.flush()
+    assert not (tmp_path / JOURNAL_NAME).exists()
+    assert journal.num_records == 0
+
+
+def test_replay_reorders_children(tmp_path):
+    manifest = {"1": {}, "2": {}, "3": {}, "4": {}}
+    write_records(tmp_path, [{"op": "order", "id": 1, "children": [3, 2, 5]}])
+    SceneJournal().replay(tmp_path, manifest)
+    assert list(manifest) == ["1", "4", "3", "2"]
+
+
+def test_field_edits_and_reordering_are_journaled(tmp_path, root_id):
+    JOURNAL.open(tmp_path)
+    b, _ = create_entity("b", root_id, Pose())
+    a, _ = create_entity("a", root_id)
+    JOURNAL.flush()
+
+    pose = esper.component_for_entity(b, Pose)
+    pose.q = list(pose.q)  # same value, not an edit
+    assert not JOURNAL.has_changes()
+    pose.q = [0.0] * 7
+    sort_children(root_id)
+    assert JOURNAL.has_changes()
+    JOURNAL.flush()
+
+    manifest = {}
+    SceneJournal().replay(tmp_path, manifest)
+    assert list(manifest) == [str(a), str(b)]
+    assert manifest[str(b)]["Pose"]["q"] == [0.0] * 7
@@ -0,0 +1,102 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import esper
+import numpy as np
+
+from waynon.components.collector import MeasurementGroup
+from waynon.components.image_measurement import ImageMeasurement
+from waynon.components.joint_measurement import JointMeasurement
+from waynon.components.measurement_store import MeasurementSidecar, attach_sidecar, save_measurements
+from waynon.components.scene_utils import create_measurement
+from waynon.components.tree_utils import create_entity, find_child_with_component, get_node
+
+PIXELS = [[10.0, 20.0], [30.0, 20.0], [30.0, 40.0], [10.0, 40.0]]
+
+
+def build_group(root_id):
+    ids = {name: create_entity(name, root_id)[0] for name in ("Robot", "Camera", "Marker", "Detector")}
+    group_id, _ = create_entity("Group", root_id, MeasurementGroup())
+    for i in range(2):
+        aruco_detections = [
+            dict(
+                detector_entity_id=ids["Detector"],
+                camera_entity_id=ids["Camera"],
+                marker_entity_id=ids["Marker"],
+                marker_id=3,
+                marker_dict=0,
+                pixels=(np.asarray(PIXELS) + j).tolist(),
+            )
+            for j in range(i + 1)
+        ]
+        create_measurement(
+            f"m{i}",
+            group_id,
+            JointMeasurement(robot_id=ids["Robot"], joint_values=[0.1 * i] * 7),
+            ImageMeasurement(
+                camera_id=ids["Camera"],
+                image_path=f"Group/images/m{i}.png",
+                image_hash=f"{i:064x}",
+                capture_timestamp=1.5 if i == 0 else None,
+                aruco_detections=aruco_detections,
+            ),
+        )
+    return group_id, ids
+
+
+def test_save_and_slice_round_trip(tmp_path, root_id):
+    group_id, ids = build_group(root_id)
+    descendants = {node.entity_id for node in get_node(group_id).descendants}
+
+    packed = save_measurements(tmp_path, [group_id])
+    assert packed == descendants
+
+    # ids of the saved scene map to the ones of a newly loaded scene
+    old_to_new = {old: 100 + k for k, old in enumerate(ids.values())}
+    sidecar = MeasurementSidecar.open(tmp_path, old_to_new)
+    assert sidecar.groups == {group_id: (0, 2)}
+
+    rows, detections = sidecar.slice(0, 2)
+    assert rows["name"].tolist() == ["m0", "m1"]
+    assert rows["has_joint"].tolist() == [True, True]
+    assert rows["joint_robot_id"].tolist() == [old_to_new[ids["Robot"]]] * 2
+    assert np.allclose(rows["joint_values"][1, : rows["joint_count"][1]], [0.1] * 7)
+    assert rows["image_path"].tolist() == ["Group/images/m0.png", "Group/images/m1.png"]
+    assert rows["image_hash"].tolist() == [f"{0:064x}", f"{1:064x}"]
+    assert rows["capture_timestamp"][0] == 1.5 and np.isnan(rows["capture_timestamp"][1])
+    assert rows["detection_start"].tolist() == [0, 1]
+    assert rows["detection_end"].tolist() == [1, 3]
+    assert detections["camera_entity_id"].tolist() == [old_to_new[ids["Camera"]]] * 3
+    assert detections["marker_id"].tolist() == [3, 3, 3]
+    assert np.allclose(detections["pixels"][2], np.asarray(PIXELS) + 1)
+
+    # a slice of the second row only starts its detections at 0
+    rows, detections = sidecar.slice(1, 2)
+    assert rows["detection_start"].tolist() == [0]
+    assert rows["detection_end"].tolist() == [2]
+    assert len(detections["pixels"]) == 2
+
+
+def test_materialize_recreates_the_measurements(tmp_path, root_id):
+    group_id, ids = build_group(root_id)
+    save_measurements(tmp_path, [group_id])
+    sidecar = MeasurementSidecar.open(tmp_path, {old: old for old in ids.values()})
+
+    copy_id, _ = create_entity("Copy", root_id, MeasurementGroup())
+    sidecar.materialize(copy_id, 0, 2)
+    measurements = get_node(copy_id).children
+    assert [node.name for node in measurements] == ["m0", "m1"]
+    image_id = find_child_with_component(measurements[1].entity_id, ImageMeasurement)
+    detections = esper.component_for_entity(image_id, ImageMeasurement).get_aruco_detections()
+    assert [d.camera_entity_id for d in detections] == [ids["Camera"]] * 2
+    assert np.allclose(detections[1].pixels, np.asarray(PIXELS) + 1)
+
+
+def test_attach_sidecar_skips_unpacked_groups(tmp_path, root_id):
+    group_id, _ = build_group(root_id)
+    other_id, _ = build_group(root_id)
+    save_measurements(tmp_path, [group_id, other_id])
+    identity = {node.entity_id: node.entity_id for node in get_node(root_id).descendants}
+
+    attach_sidecar(tmp_path, identity, skip={other_id})
+    assert esper.component_for_entity(group_id, MeasurementGroup).is_pending()
+    assert not esper.component_for_entity(other_id, MeasurementGroup).is_pending()
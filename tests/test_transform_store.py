@@ -0,0 +1,124 @@
+# Copyright (c) 2025 Robotics and AI Institute LLC dba RAI Institute. All rights reserved.
+
+import numpy as np
+
+from waynon.components.transform import TRANSFORM_INDEX, TRANSFORM_STORE, Transform, TransformStore
+from waynon.components.tree_utils import add_component, create_entity, remove_component
+
+
+def translation(x, y, z):
+    X = np.eye(4)
+    X[:3, 3] = [x, y, z]
+    return X
+
+
+def chain(store: TransformStore):
+    # root -> child -> grandchild, each one metre further along x
+    slots = [store.allocate(translation(1.0, 0.0, 0.0)) for _ in range(3)]
+    store.set_hierarchy(slots, [-1, slots[0], slots[1]])
+    store.update()
+    return slots
+
+
+def test_update_composes_world_matrices():
+    store = TransformStore()
+    root, child, grandchild = chain(store)
+    assert np.allclose(store.X_WT[root], translation(1.0, 0.0, 0.0))
+    assert np.allclose(store.X_WT[child], translation(2.0, 0.0, 0.0))
+    assert np.allclose(store.X_WT[grandchild], translation(3.0, 0.0, 0.0))
+    assert [level.tolist() for level in store.levels] == [[root], [child], [grandchild]]
+    assert not store.dirty.any()
+
+
+def test_dirty_parent_updates_descendants_only():
+    store = TransformStore()
+    root, child, grandchild = chain(store)
+    other = store.allocate(translation(0.0, 5.0, 0.0))
+    store.set_hierarchy([root, child, grandchild], [-1, root, child])
+    store.update()
+    store.X_WT[other] = np.zeros((4, 4))  # would be overwritten if it were recomputed
+
+    store.X_PT[child] = translation(0.0, 0.0, 1.0)
+    store.dirty[child] = True
+    store.update()
+    assert np.allclose(store.X_WT[root], translation(1.0, 0.0, 0.0))
+    assert np.allclose(store.X_WT[child], translation(1.0, 0.0, 1.0))
+    assert np.allclose(store.X_WT[grandchild], translation(2.0, 0.0, 1.0))
+    assert np.allclose(store.X_WT[other], 0.0)
+
+
+def test_release_reuses_slots_and_grows():
+    store = TransformStore(capacity=2)
+    a = store.allocate(np.eye(4))
+    b = store.allocate(np.eye(4))
+    store.release(a)
+    assert len(store) == 1
+    assert store.allocate(translation(1.0, 2.0, 3.0)) == a
+    c = store.allocate(np.eye(4))
+    assert c not in (a, b)
+    assert len(store.X_PT) >= 3
+    assert np.allclose(store.X_PT[a], translation(1.0, 2.0, 3.0))
+
+
+def test_changed_slots_are_taken_once():
+    store = TransformStore()
+    a = store.allocate(np.eye(4))
+    b = store.allocate(np.eye(4))
+    store.changed.update({a, b})
+    store.release(b)
+    assert store.take_changed() == {a}
+    assert store.take_changed() == set()
+
+
+def test_transform_gets_a_slot_when_attached():
+    TRANSFORM_STORE.clear()
+    transform = Transform(X_PT=translation(1.0, 2.0, 3.0).flatten().tolist())
+    Transform.model_validate(transform.model_dump())  # temporary copies hold no slot
+    assert len(TRANSFORM_STORE) == 0
+    assert np.allclose(transform.get_X_WT(), translation(1.0, 2.0, 3.0))
+
+    transform.on_attach(1)
+    assert len(TRANSFORM_STORE) == 1
+    assert np.allclose(TRANSFORM_STORE.X_PT[transform._slot], translation(1.0, 2.0, 3.0))
+
+    # a released transform keeps its pose
+    transform.set_X_PT(translation(0.0, 0.0, 1.0))
+    transform.on_delete(1)
+    assert len(TRANSFORM_STORE) == 0
+    assert np.allclose(transform.get_X_PT(), translation(0.0, 0.0, 1.0))
+    TRANSFORM_STORE.clear()
+
+
+def test_set_X_PT_marks_journaled_edits():
+    TRANSFORM_STORE.clear()
+    edited = Transform()
+    derived = Transform()
+    edited.on_attach(1)
+    derived.on_attach(2)
+
+    edited.set_X_PT(translation(1.0, 0.0, 0.0))
+    derived.set_X_PT(translation(1.0, 0.0, 0.0), journal=False)
+    assert TRANSFORM_STORE.changed == {edited._slot}
+    assert edited.is_dirty() and derived.is_dirty()
+
+    # setting the same pose again is not an edit
+    TRANSFORM_STORE.take_changed()
+    edited.set_X_PT(translation(1.0, 0.0, 0.0))
+    assert TRANSFORM_STORE.changed == set()
+    TRANSFORM_STORE.clear()
+
+
+def test_index_follows_added_and_removed_transforms(root_id):
+    frame_id, _ = create_entity("Frame", root_id)
+    child_id, _ = create_entity("Child", frame_id, Transform())
+    TRANSFORM_INDEX.rebuild(root_id)
+    assert TRANSFORM_INDEX.parent == {child_id: None}
+
+    add_component(frame_id, Transform())
+    assert TRANSFORM_INDEX.parent == {frame_id: None, child_id: frame_id}
+    assert TRANSFORM_INDEX.hierarchy() == ([frame_id, child_id], [None, frame_id])
+
+    remove_component(frame_id, Transform)
+    assert TRANSFORM_INDEX.parent == {child_id: None}
+    assert list(TRANSFORM_INDEX.children[None]) == [child_id]
+    assert len(TRANSFORM_STORE) == 1